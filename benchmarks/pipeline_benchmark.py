@@ -0,0 +1,488 @@
+import os
+import sys
+import json
+import asyncio
+import time
+import shutil
+import logging
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.audio_extractor import AudioExtractor
+from core.audio_transcriber import AudioTranscriber
+from core.audio_generator import AudioGenerator
+from core.audio_replacer import AudioReplacer
+from core.subtitle_burner import SubtitleBurner
+from core.subtitle_cues import CueTable
+from core.tts_backends import TTSBackend
+from core.ffmpeg_service import FFmpegService
+from core.media_info import MediaInfoService
+
+
+class SyntheticMedia:
+    """Generuje syntetyczne pliki wejściowe przy pomocy źródeł lavfi ffmpeg"""
+
+    def __init__(self, ffmpeg_path, output_dir):
+        self.ffmpeg_path = ffmpeg_path
+        self.output_dir = output_dir
+
+    def _run(self, cmd):
+        subprocess.run(
+            cmd,
+            check=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+        )
+
+    def audio(self, duration, name="synthetic_audio.wav", frequency=440, noise_amplitude=0.1):
+        """
+        Ton sinusoidalny zmieszany z różowym szumem
+
+        :param duration: Długość w sekundach
+        :param name: Nazwa pliku wyjściowego
+        :param frequency: Częstotliwość tonu
+        :param noise_amplitude: Amplituda szumu
+        :return: Ścieżka do pliku audio
+        """
+        output_path = os.path.join(self.output_dir, name)
+        self._run([
+            self.ffmpeg_path,
+            '-f', 'lavfi', '-i', f"sine=frequency={frequency}:sample_rate=44100:duration={duration}",
+            '-f', 'lavfi', '-i', f"anoisesrc=d={duration}:c=pink:a={noise_amplitude}:r=44100",
+            '-filter_complex', "amix=inputs=2:duration=shortest",
+            '-ac', '2',
+            '-y', output_path
+        ])
+        return output_path
+
+    def video(self, duration, name="synthetic_video.mp4", size="1280x720", fps=25, color="navy"):
+        """
+        Jednolity kolor wideo z dźwiękiem tonu i szumu
+
+        :param duration: Długość w sekundach
+        :param name: Nazwa pliku wyjściowego
+        :param size: Rozdzielczość (WxH)
+        :param fps: Liczba klatek na sekundę
+        :param color: Kolor tła
+        :return: Ścieżka do pliku wideo
+        """
+        output_path = os.path.join(self.output_dir, name)
+        self._run([
+            self.ffmpeg_path,
+            '-f', 'lavfi', '-i', f"color=c={color}:s={size}:r={fps}:d={duration}",
+            '-f', 'lavfi', '-i', f"sine=frequency=440:sample_rate=44100:duration={duration}",
+            '-f', 'lavfi', '-i', f"anoisesrc=d={duration}:c=pink:a=0.1:r=44100",
+            '-filter_complex', "[1:a][2:a]amix=inputs=2:duration=shortest[a]",
+            '-map', '0:v', '-map', '[a]',
+            '-c:v', 'libx264', '-preset', 'ultrafast', '-pix_fmt', 'yuv420p',
+            '-c:a', 'aac',
+            '-shortest',
+            '-y', output_path
+        ])
+        return output_path
+
+    def tts_clip(self, name="stub_tts.mp3", duration=1.5):
+        """Krótki klip MP3 używany jako odpowiedź zastępczego TTS"""
+        output_path = os.path.join(self.output_dir, name)
+        self._run([
+            self.ffmpeg_path,
+            '-f', 'lavfi', '-i', f"sine=frequency=220:sample_rate=24000:duration={duration}",
+            '-ac', '1', '-b:a', '48k',
+            '-y', output_path
+        ])
+        return output_path
+
+
+class StubTTSBackend(TTSBackend):
+    """Silnik TTS, który zamiast syntezy zwraca lokalny klip MP3"""
+    name = "stub"
+    max_concurrency = 16
+    output_format = "mp3"
+
+    def __init__(self, clip_path, logger=None):
+        super().__init__(voices={}, logger=logger)
+        self.clip_path = clip_path
+
+    def voice_for(self, language):
+        return "stub"
+
+    async def stream(self, text, voice):
+        with open(self.clip_path, 'rb') as f:
+            yield f.read()
+
+
+def synthetic_segments(duration, cue_length=3.0, gap=0.5):
+    """Tworzy listę segmentów transkrypcji rozłożonych równomiernie na osi czasu"""
+    words = ["the", "quick", "brown", "fox", "jumps", "over", "a", "lazy", "dog", "today"]
+    segments = []
+    start = 0.0
+    i = 0
+    while start + cue_length <= duration:
+        text = " ".join(words[(i + k) % len(words)] for k in range(8)).capitalize() + "."
+        segments.append({"start": start, "end": start + cue_length, "text": text})
+        start += cue_length + gap
+        i += 1
+    return segments
+
+
+class PipelineBenchmark:
+    """Mierzy czas poszczególnych etapów potoku oraz całego przebiegu"""
+
+    def __init__(self, ffmpeg_path, ffprobe_path, work_dir, duration=60, size="1280x720",
+                 repeats=3, model_size="tiny", translate_pair=("en", "pl"),
+                 intermediate_formats=("wav", "flac", "pcm"), tts_backends=("stub", "espeak", "edge"), logger=None):
+        self.ffmpeg_path = ffmpeg_path
+        self.ffprobe_path = ffprobe_path
+        self.work_dir = work_dir
+        self.duration = duration
+        self.size = size
+        self.repeats = repeats
+        self.model_size = model_size
+        self.translate_pair = translate_pair
+        self.intermediate_formats = intermediate_formats
+        self.tts_backends = tts_backends
+        self.logger = logger or logging.getLogger(__name__)
+        self.results = {}
+
+        self.media = SyntheticMedia(ffmpeg_path, work_dir)
+        self.ffmpeg_service = FFmpegService(ffmpeg_path, ffprobe_path, logger=self.logger)
+        self.media_info = MediaInfoService(self.ffmpeg_service, logger=self.logger)
+        media_options = dict(logger=self.logger, ffmpeg_service=self.ffmpeg_service, media_info=self.media_info)
+        self.extractor = AudioExtractor(ffmpeg_path, ffprobe_path, **media_options)
+        self.replacer = AudioReplacer(ffmpeg_path, ffprobe_path, **media_options)
+        self.burner = SubtitleBurner(ffmpeg_path, ffprobe_path, **media_options)
+        self.transcriber = None
+        self.generator = None
+        self.router = None
+
+    def _time(self, name, func, repeats=None):
+        """Uruchamia funkcję kilka razy i zapisuje min/median/max czasu"""
+        timings = []
+        result = None
+        for _ in range(repeats or self.repeats):
+            started = time.perf_counter()
+            result = func()
+            timings.append(time.perf_counter() - started)
+        self.results[name] = {
+            "runs": len(timings),
+            "min": min(timings),
+            "median": statistics.median(timings),
+            "max": max(timings)
+        }
+        self.logger.info(f"{name}: median {self.results[name]['median']:.3f}s over {len(timings)} run(s)")
+        return result
+
+    def _skip(self, name, reason):
+        self.results[name] = {"skipped": reason}
+        self.logger.warning(f"{name}: skipped ({reason})")
+
+    def _load_route(self):
+        try:
+            from core.translation_router import TranslationRouter
+            self.router = TranslationRouter(auto_install=False, logger=self.logger)
+            return self.router.get_route(*self.translate_pair)
+        except Exception as e:
+            self.logger.warning(f"Translation unavailable: {str(e)}")
+            return None
+
+    def _intermediate_roundtrip(self, audio_format, video_path, segments, clips):
+        """
+        Ekstrakcja, złożenie dubbingu i zamiana audio dla jednego formatu plików pośrednich
+
+        :return: Liczba bajtów zapisanych w plikach pośrednich
+        """
+        extracted_format = "wav" if audio_format == "wav" else "flac"
+        extracted_path = self.extractor.extract_audio(
+            video_path, os.path.join(self.work_dir, f"roundtrip_extracted.{extracted_format}"),
+            audio_format=extracted_format
+        )
+        self.generator.output_format = audio_format
+        dub = self.generator.combine_audio_segments(
+            segments, clips, os.path.join(self.work_dir, f"roundtrip_dub.{audio_format}")
+        )
+        self.replacer.replace_audio(video_path, dub, os.path.join(self.work_dir, "roundtrip.mp4"))
+        return os.path.getsize(extracted_path) + (os.path.getsize(dub) if isinstance(dub, str) else 0)
+
+    def _end_to_end_pass(self, video_path, segments, route):
+        """
+        Jeden pełny przebieg: ekstrakcja, transkrypcja, tłumaczenie, TTS, zamiana audio, napisy
+
+        Etapy niedostępne w środowisku (model Whisper, trasa argos) są pomijane;
+        tekst do syntezy pochodzi z syntetycznych segmentów, bo mowa w nagraniu jest sztuczna.
+
+        :return: Ścieżka wideo z napisami
+        """
+        audio_path = self.extractor.extract_audio(video_path, os.path.join(self.work_dir, "e2e_extracted.wav"))
+        if self.transcriber is not None and self.transcriber.model is not None:
+            self.transcriber.transcribe(audio_path)
+        texts = [s["text"] for s in segments]
+        if route:
+            texts = self.router.translate(route, texts)
+        cues = CueTable.from_segments(
+            [dict(segment, text=text) for segment, text in zip(segments, texts)], self.translate_pair[1]
+        )
+        dub_path = self.generator.generate_translated_audio(
+            cues, os.path.join(self.work_dir, "e2e_dub.wav"), self.translate_pair[1]
+        )
+        replaced_path = self.replacer.replace_audio(video_path, dub_path, os.path.join(self.work_dir, "e2e.mp4"))
+        return self.burner.burn_subtitles_to_video(
+            replaced_path, cues, os.path.join(self.work_dir, "e2e_burned.mp4")
+        )
+
+    def _benchmark_mix_mode(self, video_path, dub_path):
+        """
+        Porównuje tryb 'mix' (ściszanie pod gęstą listą napisów) z trybem 'replace'
+
+        Przerwy między napisami są dłuższe niż atak + powrót ściszania, więc każdy
+        napis jest osobnym przedziałem - jak w długim filmie z setkami kwestii.
+        """
+        cues = CueTable.from_segments(
+            synthetic_segments(self.duration, cue_length=0.5, gap=1.0), self.translate_pair[1]
+        )
+        mixed_path = os.path.join(self.work_dir, "mixed.mp4")
+        self.replacer.mix_mode = "mix"
+        try:
+            self._time(
+                "replace_audio[mix]",
+                lambda: self.replacer.replace_audio(video_path, dub_path, mixed_path, cues=cues)
+            )
+        finally:
+            self.replacer.mix_mode = "replace"
+        mixed = self.results["replace_audio[mix]"]
+        mixed["duck_intervals"] = len(self.replacer._duck_intervals(cues))
+        mixed["vs_replace"] = mixed["median"] / self.results["replace_audio"]["median"]
+        self.logger.info(
+            f"replace_audio[mix]: {mixed['duck_intervals']} duck intervals, {mixed['vs_replace']:.2f}x replace time"
+        )
+
+    def _benchmark_tts_backend(self, name, texts, language):
+        """Mierzy opóźnienie pojedynczego tekstu i przepustowość silnika TTS"""
+        backend = self.generator.backends.get(name)
+        if not backend or not backend.available() or not backend.voice_for(language):
+            self._skip(f"tts[{name}]", f"backend unavailable for {language}")
+            return
+        voice = backend.voice_for(language)
+        latencies = []
+
+        async def timed(text, semaphore):
+            async with semaphore:
+                started = time.perf_counter()
+                await backend.synthesize(text, voice)
+                latencies.append(time.perf_counter() - started)
+
+        async def run_all():
+            semaphore = asyncio.Semaphore(backend.max_concurrency)
+            await asyncio.gather(*(timed(text, semaphore) for text in texts))
+
+        started = time.perf_counter()
+        try:
+            asyncio.run(run_all())
+        except Exception as e:
+            self._skip(f"tts[{name}]", str(e))
+            return
+        seconds = time.perf_counter() - started
+        self.results[f"tts[{name}]"] = {
+            "runs": 1,
+            "seconds": seconds,
+            "items": len(texts),
+            "concurrency": backend.max_concurrency,
+            "latency_median": statistics.median(latencies),
+            "latency_max": max(latencies),
+            "throughput_per_second": len(texts) / seconds
+        }
+        self.logger.info(
+            f"tts[{name}]: {len(texts) / seconds:.1f} items/s, median latency {statistics.median(latencies):.3f}s"
+        )
+
+    def run(self):
+        """Wykonuje wszystkie pomiary i zwraca słownik wyników"""
+        self.logger.info(f"Generating synthetic media ({self.duration}s, {self.size})...")
+        video_path = self._time(
+            "fixture_video", lambda: self.media.video(self.duration, size=self.size), repeats=1
+        )
+        self.media.audio(self.duration)
+        clip_path = self.media.tts_clip()
+        segments = synthetic_segments(self.duration)
+
+        self.generator = AudioGenerator(
+            self.ffmpeg_path, self.ffprobe_path, logger=self.logger, ffmpeg_service=self.ffmpeg_service
+        )
+        self.generator.backends["stub"] = StubTTSBackend(clip_path, logger=self.logger)
+        self.generator.default_backend = "stub"
+
+        audio_path = self._time(
+            "extract_audio",
+            lambda: self.extractor.extract_audio(video_path, os.path.join(self.work_dir, "extracted.wav"))
+        )
+
+        try:
+            self.transcriber = AudioTranscriber(model_size=self.model_size, logger=self.logger, ffmpeg_service=self.ffmpeg_service)
+            self.transcriber.load_model()
+            self._time("transcribe", lambda: self.transcriber.transcribe(audio_path))
+        except Exception as e:
+            self._skip("transcribe", str(e))
+
+        route = self._load_route()
+        if route:
+            texts = [s["text"] for s in segments]
+            self._time("translate", lambda: self.router.translate(route, texts))
+            for hop, seconds in route.last_hop_seconds.items():
+                self.results[f"translate_hop[{hop}]"] = {"runs": 1, "seconds": seconds}
+        else:
+            self._skip("translate", f"no installed argos route {self.translate_pair[0]}->{self.translate_pair[1]}")
+
+        tts_texts = [s["text"] for s in segments[:50]]
+        for name in self.tts_backends:
+            self._benchmark_tts_backend(name, tts_texts, self.translate_pair[1])
+
+        cues = CueTable.from_segments(segments, self.translate_pair[1])
+        subtitle_path = cues.save_srt(os.path.join(self.work_dir, "synthetic_subtitles.srt"))
+        dub_path = os.path.join(self.work_dir, "dub.wav")
+
+        def tts_and_combine():
+            return self.generator.generate_translated_audio(cues, dub_path, self.translate_pair[1])
+
+        self._time("generate_audio", tts_and_combine)
+
+        with open(clip_path, 'rb') as f:
+            clips = [f.read()] * len(segments)
+        self._time(
+            "combine_audio_segments",
+            lambda: self.generator.combine_audio_segments(segments, clips, dub_path)
+        )
+
+        for audio_format in self.intermediate_formats:
+            name = f"intermediate[{audio_format}]"
+            bytes_written = self._time(
+                name, lambda: self._intermediate_roundtrip(audio_format, video_path, segments, clips)
+            )
+            self.results[name]["bytes_written"] = bytes_written
+            self.logger.info(f"{name}: {bytes_written / (1024 * 1024):.2f}MB of intermediates written")
+        self.generator.output_format = "wav"
+
+        replaced_path = os.path.join(self.work_dir, "replaced.mp4")
+        self._time("replace_audio", lambda: self.replacer.replace_audio(video_path, dub_path, replaced_path))
+        self._benchmark_mix_mode(video_path, dub_path)
+
+        burned_path = os.path.join(self.work_dir, "burned.mp4")
+        self._time(
+            "burn_subtitles",
+            lambda: self.burner.burn_subtitles_to_video(replaced_path, subtitle_path, burned_path)
+        )
+
+        self._time("end_to_end", lambda: self._end_to_end_pass(video_path, segments, route), repeats=1)
+        self.results["processes"] = self.ffmpeg_service.snapshot()
+        return self.results
+
+    def environment(self):
+        return {
+            "timestamp": datetime.now().isoformat(timespec='seconds'),
+            "system": f"{platform.system()} {platform.release()}",
+            "machine": platform.machine(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "params": {
+                "duration": self.duration,
+                "size": self.size,
+                "repeats": self.repeats,
+                "model_size": self.model_size,
+                "translate_pair": list(self.translate_pair),
+                "intermediate_formats": list(self.intermediate_formats),
+                "tts_backends": list(self.tts_backends)
+            }
+        }
+
+
+def compare_results(current, baseline, threshold=0.10):
+    """
+    Porównuje medianę każdego etapu z poprzednim przebiegiem
+
+    :param current: Wyniki bieżącego przebiegu
+    :param baseline: Wyniki referencyjne
+    :param threshold: Dopuszczalny względny wzrost czasu
+    :return: Lista etapów, które zwolniły ponad próg
+    """
+    regressions = []
+    for name, result in current.items():
+        previous = baseline.get(name)
+        if not previous or "skipped" in result or "skipped" in previous:
+            continue
+        now = result.get("median", result.get("seconds"))
+        before = previous.get("median", previous.get("seconds"))
+        if now is None or not before:
+            continue
+        change = (now - before) / before
+        marker = "REGRESSION" if change > threshold else "ok"
+        print(f"{name:28s} {before:9.3f}s -> {now:9.3f}s  {change:+7.1%}  {marker}")
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Video Translator pipeline benchmark")
+    parser.add_argument("--duration", type=float, default=60, help="Synthetic media length in seconds")
+    parser.add_argument("--size", default="1280x720", help="Synthetic video resolution")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per stage")
+    parser.add_argument("--model", default="tiny", help="Whisper model size")
+    parser.add_argument("--pair", default="en:pl", help="Translation pair from:to")
+    parser.add_argument("--formats", default="wav,flac,pcm", help="Intermediate audio formats to compare")
+    parser.add_argument("--tts", default="stub,espeak,edge", help="TTS backends to compare")
+    parser.add_argument("--output", help="Result JSON path (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="Baseline result JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed relative slowdown")
+    parser.add_argument("--ffmpeg", default=shutil.which("ffmpeg") or "ffmpeg")
+    parser.add_argument("--ffprobe", default=shutil.which("ffprobe") or "ffprobe")
+    parser.add_argument("--keep", action="store_true", help="Keep the generated work directory")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    logger = logging.getLogger("benchmark")
+
+    work_dir = tempfile.mkdtemp(prefix="vt_bench_")
+    try:
+        benchmark = PipelineBenchmark(
+            args.ffmpeg, args.ffprobe, work_dir,
+            duration=args.duration,
+            size=args.size,
+            repeats=args.repeats,
+            model_size=args.model,
+            translate_pair=tuple(args.pair.split(":", 1)),
+            intermediate_formats=tuple(args.formats.split(",")),
+            tts_backends=tuple(args.tts.split(",")),
+            logger=logger
+        )
+        results = benchmark.run()
+        report = {"environment": benchmark.environment(), "results": results}
+
+        output_path = args.output or os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "results",
+            f"bench_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.json"
+        )
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"Results written to: {output_path}")
+
+        if args.compare:
+            with open(args.compare, encoding='utf-8') as f:
+                baseline = json.load(f)["results"]
+            regressions = compare_results(results, baseline, args.threshold)
+            if regressions:
+                logger.error(f"Performance regressions: {', '.join(regressions)}")
+                return 1
+        return 0
+    finally:
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
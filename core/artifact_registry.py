@@ -0,0 +1,161 @@
+import os
+import shutil
+import logging
+import threading
+
+
+class ArtifactRegistry:
+    """
+    Rejestr plików tworzonych przez etapy zadania
+
+    Każdy etap deklaruje swoje pliki z cyklem życia:
+      - 'keep'  - wynik dla użytkownika, nigdy nie jest usuwany
+      - 'temp'  - plik pośredni, usuwany po zadaniu lub wcześniej przez release()
+      - 'cache' - plik współdzielony między zadaniami, zarządzany przez swoją pamięć podręczną
+    Sprzątanie usuwa wyłącznie zarejestrowane pliki tymczasowe, bez przeszukiwania katalogów.
+    """
+    KEEP = 'keep'
+    TEMP = 'temp'
+    CACHE = 'cache'
+
+    def __init__(self, logger=None):
+        self.logger = logger or logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._artifacts = {}
+        self._folders = []
+        self._cleanup_thread = None
+
+    def log_with_emoji(self, message, level=logging.INFO, emoji_type=None):
+        extra = {'emoji_type': emoji_type} if emoji_type else {}
+        self.logger.log(level, message, extra=extra)
+
+    def register(self, path, lifecycle=TEMP, stage=None):
+        """
+        Rejestruje plik utworzony przez etap
+
+        :param path: Ścieżka pliku
+        :param lifecycle: 'keep', 'temp' lub 'cache'
+        :param stage: Nazwa etapu, który utworzył plik
+        :return: Ścieżka (dla wygody w wywołaniach łańcuchowych)
+        """
+        if path:
+            with self._lock:
+                self._artifacts[os.path.abspath(path)] = (lifecycle, stage)
+        return path
+
+    def keep(self, path):
+        """Oznacza plik jako wynik, który musi przetrwać sprzątanie"""
+        if path:
+            with self._lock:
+                _, stage = self._artifacts.get(os.path.abspath(path), (None, None))
+                self._artifacts[os.path.abspath(path)] = (self.KEEP, stage)
+            self.log_with_emoji(f"Keeping file: {os.path.basename(path)}", emoji_type='FILE')
+
+    def register_folder(self, path):
+        """Folder usuwany przy sprzątaniu, jeśli zostanie pusty"""
+        with self._lock:
+            self._folders.append(path)
+
+    def release(self, stage):
+        """
+        Usuwa od razu pliki tymczasowe etapu, których kolejne etapy już nie potrzebują
+
+        :return: Liczba zwolnionych bajtów
+        """
+        with self._lock:
+            paths = [path for path, (lifecycle, owner) in self._artifacts.items()
+                     if lifecycle == self.TEMP and owner == stage]
+            for path in paths:
+                del self._artifacts[path]
+        freed = self._delete(paths)
+        if paths:
+            self.log_with_emoji(
+                f"Released {len(paths)} '{stage}' file(s), {freed / (1024 * 1024):.1f}MB freed", emoji_type='CLEANUP'
+            )
+        return freed
+
+    def publish(self, path, destination, lifecycle=KEEP, stage=None):
+        """
+        Przenosi gotowy plik do miejsca docelowego tak, by nigdy nie był widoczny w połowie
+
+        Na tym samym systemie plików wykonuje atomowe os.replace; między dyskami
+        kopiuje do pliku .part obok celu i dopiero wtedy podmienia nazwę.
+
+        :param path: Plik źródłowy (np. w katalogu roboczym)
+        :param destination: Ścieżka docelowa
+        :param lifecycle: Cykl życia pliku po przeniesieniu
+        :param stage: Etap, do którego należy plik
+        :return: Ścieżka docelowa
+        """
+        if os.path.abspath(path) != os.path.abspath(destination):
+            os.makedirs(os.path.dirname(destination) or '.', exist_ok=True)
+            try:
+                os.replace(path, destination)
+            except OSError:
+                part_path = f"{destination}.part"
+                shutil.copyfile(path, part_path)
+                os.replace(part_path, destination)
+                os.remove(path)
+            with self._lock:
+                self._artifacts.pop(os.path.abspath(path), None)
+        self.register(destination, lifecycle, stage)
+        return destination
+
+    def temp_files(self):
+        with self._lock:
+            return [path for path, (lifecycle, _) in self._artifacts.items() if lifecycle == self.TEMP]
+
+    def cleanup(self, background=False):
+        """
+        Usuwa wszystkie zarejestrowane pliki tymczasowe i puste foldery
+
+        :param background: Wykonaj usuwanie w osobnym wątku
+        """
+        with self._lock:
+            paths = [path for path, (lifecycle, _) in self._artifacts.items() if lifecycle == self.TEMP]
+            folders = list(self._folders)
+            self._artifacts.clear()
+            self._folders.clear()
+
+        if background:
+            self.wait()
+            self._cleanup_thread = threading.Thread(
+                target=self._cleanup, args=(paths, folders), daemon=True, name="artifact-cleanup"
+            )
+            self._cleanup_thread.start()
+        else:
+            self._cleanup(paths, folders)
+
+    def wait(self):
+        """Czeka na zakończenie sprzątania w tle"""
+        if self._cleanup_thread and self._cleanup_thread.is_alive():
+            self._cleanup_thread.join()
+        self._cleanup_thread = None
+
+    def _cleanup(self, paths, folders):
+        freed = self._delete(paths)
+        deleted_folders = 0
+        for folder in folders:
+            try:
+                if os.path.isdir(folder) and not os.listdir(folder):
+                    os.rmdir(folder)
+                    deleted_folders += 1
+            except OSError as e:
+                self.log_with_emoji(f"Error deleting folder {folder}: {str(e)}", logging.WARNING)
+        self.log_with_emoji(
+            f"Cleanup complete. Deleted {len(paths)} files ({freed / (1024 * 1024):.1f}MB) and {deleted_folders} folders",
+            emoji_type='COMPLETE'
+        )
+
+    def _delete(self, paths):
+        freed = 0
+        for path in paths:
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+                freed += size
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                self.log_with_emoji(f"Error deleting {path}: {str(e)}", logging.WARNING)
+        return freed
@@ -0,0 +1,160 @@
+import json
+import hashlib
+import threading
+
+
+def format_ass_time(seconds):
+    """Formatuje czas w sekundach jako znacznik ASS (H:MM:SS.cc)"""
+    cs = max(0, int(round(seconds * 100)))
+    return f"{cs // 360000}:{cs // 6000 % 60:02d}:{cs // 100 % 60:02d}.{cs % 100:02d}"
+
+
+def escape_ass_text(text):
+    """Zamienia tekst napisu na tekst zdarzenia ASS (nowe linie, nawiasy klamrowe)"""
+    return text.replace("\\", "\\\\").replace("{", "\\{").replace("}", "\\}").replace("\r", "").replace("\n", "\\N")
+
+
+class AssStyleCompiler:
+    """
+    Kompiluje słownik subtitle_style do nagłówka dokumentu ASS
+
+    Nagłówek (PlayRes, styl Default, format zdarzeń) jest budowany raz dla danego
+    stylu i rozdzielczości i trzymany w pamięci pod skrótem, więc kolejne języki
+    i filmy w serii korzystają z gotowego dokumentu. Kolory zapisywane są jako
+    &HAABBGGRR (AA = przezroczystość), a tło napisu jako BorderStyle 3, w którym
+    kolor ramki (OutlineColour) jest kolorem prostokąta.
+    """
+    COLORS = {
+        'white': 'FFFFFF',
+        'black': '000000',
+        'red': 'FF0000',
+        'green': '00FF00',
+        'blue': '0000FF',
+        'yellow': 'FFFF00',
+        'cyan': '00FFFF',
+        'magenta': 'FF00FF'
+    }
+    # Wiersze numpadu ASS: dół 1-3, środek 4-6, góra 7-9
+    POSITION_ROWS = {'bottom': 0, 'middle': 3, 'top': 6}
+    ALIGNMENT_COLUMNS = {'left': 1, 'center': 2, 'right': 3}
+    # Rozmiary w subtitle_style odnoszą się do domyślnej wysokości libass dla SRT
+    REFERENCE_HEIGHT = 288
+
+    DEFAULT_STYLE = {
+        'fontfamily': 'Arial',
+        'fontsize': 24,
+        'fontcolor': 'white',
+        'boxcolor': 'black@0.5',
+        'box': 1,
+        'borderw': 1,
+        'bordercolor': 'black',
+        'position': 'bottom',
+        'alignment': 'center'
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._headers = {}
+
+    def style_hash(self, style, play_res):
+        payload = json.dumps({"style": style, "play_res": list(play_res)}, sort_keys=True)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    def color(self, value, default='FFFFFF', opacity=1.0):
+        """
+        Zamienia kolor ('white', '#RRGGBB', opcjonalnie '@krycie') na &HAABBGGRR
+
+        :param value: Nazwa koloru lub zapis szesnastkowy
+        :param default: Kolor RRGGBB, gdy wartości nie da się odczytać
+        :param opacity: Krycie, gdy wartość nie zawiera '@'
+        """
+        name, _, alpha = (value or '').partition('@')
+        rgb = self.COLORS.get(name.strip().lower())
+        if rgb is None:
+            hex_value = name.strip().lstrip('#')
+            if hex_value.lower().startswith('0x'):
+                hex_value = hex_value[2:]
+            rgb = hex_value.upper() if len(hex_value) == 6 and all(c in '0123456789abcdefABCDEF' for c in hex_value) else default
+        try:
+            opacity = float(alpha) if alpha else opacity
+        except ValueError:
+            pass
+        transparency = 255 - int(round(max(0.0, min(1.0, opacity)) * 255))
+        return f"&H{transparency:02X}{rgb[4:6]}{rgb[2:4]}{rgb[0:2]}"
+
+    def compile(self, style=None, play_res=(1920, 1080)):
+        """
+        Zwraca nagłówek ASS ([Script Info], [V4+ Styles], [Events]) dla stylu
+
+        :param style: Słownik subtitle_style (brakujące klucze z DEFAULT_STYLE)
+        :param play_res: Rozdzielczość wideo (szerokość, wysokość)
+        """
+        style = {**self.DEFAULT_STYLE, **(style or {})}
+        key = self.style_hash(style, play_res)
+        with self._lock:
+            header = self._headers.get(key)
+        if header:
+            return header
+
+        width, height = play_res
+        scale = height / self.REFERENCE_HEIGHT
+        box_color = style['boxcolor'] or ''
+        box_opacity = float(box_color.partition('@')[2] or 0.5) if '@' in box_color else 0.5
+        use_box = bool(style.get('box', 1)) and box_opacity > 0
+
+        if use_box:
+            # BorderStyle 3: prostokąt w kolorze OutlineColour, Outline = margines prostokąta
+            border_style = 3
+            outline_color = back_color = self.color(box_color, '000000', 0.5)
+            outline = max(1.0, float(style['borderw'])) * scale
+        else:
+            border_style = 1
+            outline_color = self.color(style['bordercolor'], '000000')
+            back_color = self.color('black@0')
+            outline = float(style['borderw']) * scale
+
+        alignment = (self.POSITION_ROWS.get(style['position'], 0)
+                     + self.ALIGNMENT_COLUMNS.get(style.get('alignment', 'center'), 2))
+        fontname = str(style.get('fontfamily') or 'Arial').replace(',', ' ')
+
+        header = "\n".join([
+            "[Script Info]",
+            "ScriptType: v4.00+",
+            f"PlayResX: {width}",
+            f"PlayResY: {height}",
+            "WrapStyle: 0",
+            "ScaledBorderAndShadow: yes",
+            "",
+            "[V4+ Styles]",
+            "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, "
+            "Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, "
+            "Alignment, MarginL, MarginR, MarginV, Encoding",
+            f"Style: Default,{fontname},{round(float(style['fontsize']) * scale)},"
+            f"{self.color(style['fontcolor'], 'FFFFFF')},&H000000FF,{outline_color},{back_color},"
+            f"0,0,0,0,100,100,0,0,{border_style},{outline:.1f},0,"
+            f"{alignment},{round(10 * scale)},{round(10 * scale)},{round(20 * scale)},1",
+            "",
+            "[Events]",
+            "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text",
+            ""
+        ])
+        with self._lock:
+            self._headers[key] = header
+        return header
+
+    def write(self, cues, path, style=None, play_res=(1920, 1080)):
+        """
+        Zapisuje napisy bezpośrednio jako dokument ASS
+
+        :param cues: CueTable z tekstem napisów
+        :param path: Ścieżka pliku .ass
+        :return: Ścieżka pliku
+        """
+        header = self.compile(style, play_res)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(header)
+            f.writelines(
+                f"Dialogue: 0,{format_ass_time(start)},{format_ass_time(end)},Default,,0,0,0,,{escape_ass_text(text)}\n"
+                for start, end, text in cues
+            )
+        return path
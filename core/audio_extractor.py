@@ -2,23 +2,35 @@ import os
 import subprocess
 import logging
 from pydub import AudioSegment
+from core.ffmpeg_service import FFmpegService
+from core.media_info import MediaInfoService
 
 class AudioExtractor:
-    def __init__(self, ffmpeg_path, ffprobe_path, logger=None):
+    def __init__(self, ffmpeg_path, ffprobe_path, logger=None, ffmpeg_service=None, media_info=None):
         """
         Inicjalizacja ekstraktora audio
         
         :param ffmpeg_path: Ścieżka do ffmpeg
         :param ffprobe_path: Ścieżka do ffprobe
         :param logger: Obiekt loggera (opcjonalny)
+        :param ffmpeg_service: Wspólny FFmpegService (opcjonalny)
+        :param media_info: Wspólny MediaInfoService (opcjonalny)
         """
         self.ffmpeg_path = ffmpeg_path
         self.ffprobe_path = ffprobe_path
         self.logger = logger or logging.getLogger(__name__)
+        self.ffmpeg_service = ffmpeg_service or FFmpegService(ffmpeg_path, ffprobe_path, logger=self.logger)
+        self.media_info = media_info or MediaInfoService(self.ffmpeg_service, logger=self.logger)
         
         # Konfiguracja pydub
         AudioSegment.converter = self.ffmpeg_path
         AudioSegment.ffprobe = self.ffprobe_path
+        
+        # FLAC jest bezstratny, a przy mowie ~2x mniejszy od WAV
+        self.codec_args = {
+            'wav': ['-c:a', 'pcm_s16le'],
+            'flac': ['-c:a', 'flac', '-compression_level', '5']
+        }
 
     def extract_audio(self, video_path, output_path=None, audio_format='wav', progress_callback=None):
         """
@@ -26,7 +38,7 @@ class AudioExtractor:
         
         :param video_path: Ścieżka do pliku wideo
         :param output_path: Ścieżka wyjściowa (opcjonalna)
-        :param audio_format: Format wyjściowy (wav/mp3)
+        :param audio_format: Format wyjściowy (wav/flac/mp3)
         :param progress_callback: Funkcja callback do śledzenia postępu
         :return: Ścieżka do wyekstrahowanego pliku audio
         """
@@ -46,22 +58,22 @@ class AudioExtractor:
             self._log_with_emoji(f"Extracting audio from: {os.path.basename(video_path)}", emoji_type='AUDIO')
             self._log_with_emoji(f"Output audio file: {os.path.basename(output_path)}", emoji_type='FILE')
             
+            info = self.media_info.get(video_path)
+            if not info.audio:
+                raise RuntimeError(f"No audio stream in {os.path.basename(video_path)}")
+            
             cmd = [
-                self.ffmpeg_path,
                 '-i', video_path,
+                '-map', '0:a:0',     # Pierwsza ścieżka audio, bez dekodowania wideo
+                '-vn',
                 '-ac', '1',          # Mono audio
                 '-ar', '16000',      # 16kHz sample rate
+                *self.codec_args.get(audio_format, []),
                 '-y',                # Overwrite output
                 output_path
             ]
             
-            subprocess.run(
-                cmd,
-                check=True,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-                creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
-            )
+            self.ffmpeg_service.run(cmd)
             
             if progress_callback:
                 progress_callback(100, 'extract_audio')
@@ -100,8 +112,7 @@ class AudioExtractor:
                     f"{base_name}_converted.{output_format}"
                 )
             
-            audio = AudioSegment.from_file(input_path)
-            audio.export(output_path, format=output_format)
+            self.ffmpeg_service.run(['-i', input_path, '-vn', '-y', output_path])
             
             self._log_with_emoji(f"Audio converted to {output_format}: {os.path.basename(output_path)}", emoji_type='COMPLETE')
             return output_path
@@ -109,34 +120,6 @@ class AudioExtractor:
             self._log_with_emoji(f"Audio conversion error: {str(e)}", logging.ERROR, 'ERROR')
             raise RuntimeError(f"Audio conversion error: {e}")
 
-    def normalize_audio(self, input_path, output_path=None, target_dBFS=-20.0):
-        """
-        Normalizacja głośności audio
-        
-        :param input_path: Ścieżka do pliku wejściowego
-        :param output_path: Ścieżka wyjściowa (opcjonalna)
-        :param target_dBFS: Docelowy poziom głośności
-        :return: Ścieżka do znormalizowanego pliku
-        """
-        try:
-            if not output_path:
-                base_name = os.path.splitext(os.path.basename(input_path))[0]
-                output_path = os.path.join(
-                    os.path.dirname(input_path),
-                    f"{base_name}_normalized.wav"
-                )
-            
-            audio = AudioSegment.from_file(input_path)
-            change_in_dBFS = target_dBFS - audio.dBFS
-            normalized = audio.apply_gain(change_in_dBFS)
-            normalized.export(output_path, format="wav")
-            
-            self._log_with_emoji(f"Audio normalized to {target_dBFS} dBFS: {os.path.basename(output_path)}", emoji_type='COMPLETE')
-            return output_path
-        except Exception as e:
-            self._log_with_emoji(f"Audio normalization error: {str(e)}", logging.ERROR, 'ERROR')
-            raise RuntimeError(f"Audio normalization error: {e}")
-
     def _log_with_emoji(self, message, level=logging.INFO, emoji_type=None):
         """Pomocnicza funkcja do logowania z emoji"""
         if self.logger:
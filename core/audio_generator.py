@@ -1,29 +1,96 @@
-import os
-import pysrt
 import asyncio
 import logging
+import subprocess
 from pydub import AudioSegment
-import edge_tts
+from core.subtitle_cues import CueTable
+from core.tts_backends import EdgeTTSBackend, EspeakTTSBackend
+from core.ffmpeg_service import FFmpegService
+from core.loudness import LoudnessNormalizer
+
+# Przepływności (kbps) MP3 Layer III: MPEG-1 oraz MPEG-2/2.5
+_MP3_BITRATES = {
+    3: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160)
+}
+# Częstotliwości próbkowania wg bitów wersji: 3 = MPEG-1, 2 = MPEG-2, 0 = MPEG-2.5
+_MP3_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+
+def mp3_frames(data):
+    """
+    Odczytuje nagłówki ramek MP3 (Layer III) bez dekodowania
+
+    Pomija tag ID3v2 oraz ramkę informacyjną Xing/Info, żeby klipy można było
+    skleić w jeden strumień i zdekodować jednym procesem ffmpeg.
+
+    :param data: Zawartość pliku MP3
+    :return: Krotka (ramki audio jako bytes, liczba próbek, częstotliwość) lub None
+    """
+    pos = 0
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        pos = 10 + size + (10 if data[5] & 0x10 else 0)
+
+    start = pos
+    samples = 0
+    sample_rate = None
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF or (data[pos + 1] & 0xE0) != 0xE0:
+            break
+        version = (data[pos + 1] >> 3) & 3
+        layer = (data[pos + 1] >> 1) & 3
+        bitrate_index = data[pos + 2] >> 4
+        rate_index = (data[pos + 2] >> 2) & 3
+        padding = (data[pos + 2] >> 1) & 1
+        if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+            break
+        rate = _MP3_SAMPLE_RATES[version][rate_index]
+        if sample_rate and rate != sample_rate:
+            break
+        bitrate = _MP3_BITRATES[3 if version == 3 else 2][bitrate_index] * 1000
+        frame_samples = 1152 if version == 3 else 576
+        frame_size = (frame_samples // 8) * bitrate // rate + padding
+        frame = data[pos:pos + frame_size]
+        if samples == 0 and (b"Xing" in frame or b"Info" in frame):
+            # Ramka z metadanymi - dekoder nie zwraca z niej dźwięku
+            start = pos + frame_size
+        else:
+            samples += frame_samples
+        sample_rate = rate
+        pos += frame_size
+
+    if not samples:
+        return None
+    return data[start:min(pos, len(data))], samples, sample_rate
 
 class AudioGenerator:
-    def __init__(self, ffmpeg_path=None, ffprobe_path=None, logger=None):
+    def __init__(self, ffmpeg_path=None, ffprobe_path=None, logger=None, ffmpeg_service=None):
         self.ffmpeg_path = ffmpeg_path
         self.ffprobe_path = ffprobe_path
         self.logger = logger or logging.getLogger(__name__)
+        self.ffmpeg_service = ffmpeg_service or FFmpegService(
+            ffmpeg_path or AudioSegment.converter, ffprobe_path or AudioSegment.ffprobe, logger=self.logger
+        )
         
-        # Ustawienia głosów TTS
-        self.edge_tts_voices = {
-            "en": "en-US-GuyNeural",
-            "pl": "pl-PL-MarekNeural",
-            "es": "es-ES-AlvaroNeural",
-            "fr": "fr-FR-HenriNeural",
-            "de": "de-DE-ConradNeural",
-            "it": "it-IT-DiegoNeural",
-            "ja": "ja-JP-NanjoNeural",
-            "ru": "ru-RU-DmitryNeural",
-            "zh": "zh-CN-YunxiNeural",
-            "pt": "pt-BR-AntonioNeural"
+        # Silniki TTS i ich wybór per język; brak wpisu = default_backend
+        self.backends = {
+            "edge": EdgeTTSBackend(logger=self.logger),
+            "espeak": EspeakTTSBackend(logger=self.logger)
         }
+        self.default_backend = "edge"
+        self.language_backends = {}
+        
+        # Format złożonej ścieżki: 'wav', 'flac' lub 'pcm' (AudioSegment w pamięci,
+        # kodowany dopiero przy zamianie audio)
+        self.output_format = 'wav'
+        # Częstotliwość osi czasu dubbingu (natywna dla głosów edge-tts)
+        self.sample_rate = 24000
+        # Głośność każdego klipu TTS (LUFS) - klipy z usług TTS mają różne poziomy; None = bez zmian
+        self.loudness = LoudnessNormalizer(logger=self.logger, ffmpeg_service=self.ffmpeg_service)
+        self.clip_loudness_target = -18.0
+        # Faktyczne położenie klipów z ostatniego złożenia (CueTable start/koniec/tekst) -
+        # klip może zacząć się później niż napis i trwać dłużej niż on
+        self.last_placements = None
         
         # Konfiguracja AudioSegment
         if self.ffmpeg_path:
@@ -31,84 +98,269 @@ class AudioGenerator:
         if self.ffprobe_path:
             AudioSegment.ffprobe = self.ffprobe_path
 
-    async def _generate_tts_segment(self, text, voice, output_file):
-        """Generuje pojedynczy segment TTS"""
-        try:
-            communicate = edge_tts.Communicate(text, voice)
-            await communicate.save(output_file)
-            return output_file
-        except Exception as e:
-            self.logger.error(f"Error generating TTS for text: {text[:50]}... Error: {str(e)}")
-            raise
-
-    async def generate_all_tts_segments(self, segments, voice, temp_folder):
-        """Generuje wszystkie segmenty TTS asynchronicznie"""
-        tasks = []
-        for i, segment in enumerate(segments):
-            temp_file = os.path.join(temp_folder, f"temp_{i}.mp3")
-            task = self._generate_tts_segment(segment["text"], voice, temp_file)
-            tasks.append(task)
-        return await asyncio.gather(*tasks)
-
-    def combine_audio_segments(self, segments_data, temp_files, output_path):
-        """Łączy segmenty audio w jeden plik"""
-        combined = AudioSegment.silent(duration=0)
-        
-        for temp_file, segment in zip(temp_files, segments_data):
+    def backend_candidates(self, language):
+        """
+        Dostępne silniki TTS i ich głosy dla języka, w kolejności wyboru
+
+        Najpierw silnik przypisany do języka (lub domyślny), potem pozostałe
+        obsługujące język; na końcu silniki z głosem zastępczym (fallback_voice)
+        dla języków, których żaden silnik nie obsługuje.
+
+        :return: Lista krotek (silnik, głos)
+        """
+        preferred = self.language_backends.get(language, self.default_backend)
+        names = [preferred] + [name for name in self.backends if name != preferred]
+        backends = [self.backends[name] for name in names if name in self.backends]
+        candidates = []
+        fallbacks = []
+        for backend in backends:
+            voice = backend.voice_for(language)
+            if not voice and not backend.fallback_voice:
+                continue
+            # available() może łączyć się z usługą lub szukać programu - raz na silnik
+            if not backend.available():
+                continue
+            if voice:
+                candidates.append((backend, voice))
+            else:
+                fallbacks.append((backend, backend.fallback_voice))
+        return candidates + fallbacks
+
+    def speaker_voices(self, backend, language, segments):
+        """
+        Głos dla każdego segmentu według mówcy (klucz 'speaker' z diaryzacji)
+
+        Mówcy numerowani są według czasu mowy, więc główny mówca dostaje głos
+        domyślny języka; przy większej liczbie mówców niż głosów głosy się powtarzają.
+
+        :return: Lista głosów (po jednym na segment) lub None, gdy segmenty nie mają mówców
+        """
+        if not any(segment.get("speaker") for segment in segments):
+            return None
+        voices = backend.voices_for(language)
+        if len(voices) < 2:
+            self.logger.warning(f"TTS backend '{backend.name}' has a single {language} voice - speakers share it")
+            return None
+        assignment = {speaker: voices[speaker % len(voices)] for speaker in {segment["speaker"] for segment in segments}}
+        self.logger.info(
+            "Speaker voices: " + ", ".join(f"S{speaker}={voice}" for speaker, voice in sorted(assignment.items()))
+        )
+        return [assignment[segment["speaker"]] for segment in segments]
+
+    async def generate_all_tts_segments(self, segments, backend, voice):
+        """
+        Generuje wszystkie segmenty TTS asynchronicznie (z limitem równoległości silnika)
+
+        :param voice: Nazwa głosu lub lista głosów, po jednym na segment
+        """
+        return await backend.synthesize_batch([segment["text"] for segment in segments], voice)
+
+    def decode_clips(self, clips, audio_format="mp3"):
+        """
+        Dekoduje klipy TTS z pamięci do surowego PCM (s16le, mono, sample_rate)
+
+        Klipy MP3 są sklejane w jeden strumień i dekodowane jednym procesem ffmpeg,
+        a następnie dzielone według liczby próbek z nagłówków ramek. WAV jest
+        odczytywany bezpośrednio przez pydub, bez uruchamiania ffmpeg.
+
+        :param clips: Lista bytes zwróconych przez silnik TTS
+        :param audio_format: Format klipów
+        :return: Lista bytes PCM (None dla klipów, których nie udało się zdekodować)
+        """
+        decoded = [None] * len(clips)
+        batch = []
+        for index, clip in enumerate(clips):
             try:
-                audio = AudioSegment.from_mp3(temp_file)
-                silent_duration = max(0, segment["start"] * 1000 - len(combined))
-                combined += AudioSegment.silent(duration=silent_duration)
-                combined += audio
+                if audio_format == "mp3":
+                    frames = mp3_frames(clip)
+                    if frames:
+                        batch.append((index, *frames))
+                        continue
+                    decoded[index] = self._decode_clip(clip, audio_format)
+                elif audio_format == "wav":
+                    decoded[index] = self._to_timeline_format(AudioSegment(data=clip)).raw_data
+                else:
+                    decoded[index] = self._decode_clip(clip, audio_format)
             except Exception as e:
-                self.logger.warning(f"Failed to process segment {temp_file}: {str(e)}")
+                self.logger.warning(f"Failed to decode TTS segment {index}: {str(e)}")
+
+        if batch:
+            try:
+                for index, pcm in zip((item[0] for item in batch), self._decode_mp3_batch(batch)):
+                    decoded[index] = pcm
+            except subprocess.CalledProcessError as e:
+                # Uszkodzony klip psuje cały strumień - dekodujemy klipy osobno
+                self.logger.warning(f"Batch MP3 decode failed, decoding clips one by one: {str(e)}")
+                for index, _, _, _ in batch:
+                    try:
+                        decoded[index] = self._decode_clip(clips[index], "mp3")
+                    except Exception as clip_error:
+                        self.logger.warning(f"Failed to decode TTS segment {index}: {str(clip_error)}")
+        return decoded
+
+    def _decode_clip(self, clip, audio_format):
+        """Dekoduje pojedynczy klip przez wspólną pulę ffmpeg do PCM osi czasu"""
+        result = self.ffmpeg_service.run(
+            [
+                '-v', 'error',
+                '-f', audio_format, '-i', 'pipe:0',
+                '-f', 's16le', '-ac', '1', '-ar', str(self.sample_rate),
+                'pipe:1'
+            ],
+            input=clip,
+            capture_output=True
+        )
+        return result.stdout[:len(result.stdout) // 2 * 2]
+
+    def _decode_mp3_batch(self, batch):
+        """Dekoduje sklejone klipy MP3 jednym wywołaniem ffmpeg i dzieli wynik na klipy"""
+        result = self.ffmpeg_service.run(
+            [
+                '-v', 'error',
+                '-f', 'mp3', '-i', 'pipe:0',
+                '-f', 's16le', '-ac', '1', '-ar', str(self.sample_rate),
+                'pipe:1'
+            ],
+            input=b"".join(frames for _, frames, _, _ in batch),
+            capture_output=True
+        )
+        pcm = result.stdout
+
+        # Granice klipów w próbkach wyjściowych (klipy mogą mieć różne częstotliwości)
+        boundaries = []
+        elapsed = 0.0
+        for _, _, samples, rate in batch:
+            elapsed += samples / rate
+            boundaries.append(round(elapsed * self.sample_rate) * 2)
+        # Różnicę długości (opóźnienie dekodera) rozliczamy na końcu ostatniego klipu
+        boundaries[-1] = len(pcm)
+
+        clips = []
+        previous = 0
+        for boundary in boundaries:
+            boundary = min(boundary, len(pcm))
+            clips.append(pcm[previous:boundary])
+            previous = boundary
+        return clips
+
+    def _to_timeline_format(self, audio):
+        return audio.set_frame_rate(self.sample_rate).set_channels(1).set_sample_width(2)
+
+    def combine_audio_segments(self, segments_data, clips, output_path, audio_format="mp3", loudness_target=None):
+        """
+        Układa klipy TTS na osi czasu i zapisuje wynik
+
+        Oś czasu to jeden bufor PCM rozszerzany w miejscu - koszt jest liniowy
+        względem długości nagrania. Klip zaczyna się w chwili swojego napisu albo
+        zaraz po poprzednim, jeśli ten jeszcze trwa; położenie klipów trafia do
+        last_placements. Każdy klip jest wyrównywany do clip_loudness_target,
+        a cała ścieżka (w miejscu) do loudness_target.
+
+        :param segments_data: Lista słowników z czasem startu segmentów
+        :param clips: Lista bytes klipów TTS (w formacie audio_format)
+        :param output_path: Ścieżka wyjściowego pliku audio
+        :param audio_format: Format klipów (zależny od silnika TTS)
+        :param loudness_target: Docelowa głośność całej ścieżki (LUFS), np. głośność oryginału
+        :return: Ścieżka pliku lub AudioSegment, gdy output_format to 'pcm'
+        """
+        timeline = bytearray()
+        starts, ends, texts = [], [], []
+        for pcm, segment in zip(self.decode_clips(clips, audio_format), segments_data):
+            if pcm is None:
                 continue
-        
-        combined.export(output_path, format='wav')
+            if self.clip_loudness_target is not None:
+                pcm, _, _ = self.loudness.normalize_pcm(pcm, self.sample_rate, self.clip_loudness_target)
+            offset = int(segment["start"] * self.sample_rate) * 2
+            if offset > len(timeline):
+                timeline.extend(bytes(offset - len(timeline)))
+            starts.append(len(timeline) / 2 / self.sample_rate)
+            timeline.extend(pcm)
+            ends.append(len(timeline) / 2 / self.sample_rate)
+            texts.append(segment["text"])
+        self.last_placements = CueTable(starts, ends, texts)
+
+        if loudness_target is not None:
+            timeline, measured, gain = self.loudness.normalize_pcm(timeline, self.sample_rate, loudness_target)
+            if measured is not None:
+                self.logger.info(f"Dub loudness {measured:.1f} LUFS -> {loudness_target:.1f} LUFS ({gain:+.1f} dB)")
+        combined = AudioSegment(data=bytes(timeline), sample_width=2, frame_rate=self.sample_rate, channels=1)
+        if self.output_format == 'pcm':
+            return combined
+        if self.output_format == 'wav':
+            # Zapis WAV w pydub nie uruchamia ffmpeg
+            combined.export(output_path, format='wav')
+        else:
+            self.ffmpeg_service.run(
+                ['-f', 's16le', '-ar', str(self.sample_rate), '-ac', '1', '-i', 'pipe:0', '-y', output_path],
+                input=combined.raw_data
+            )
         return output_path
 
-    def generate_translated_audio(self, subtitle_path, output_path, to_lang="en", progress_callback=None):
-        """Główna metoda generująca przetłumaczony dźwięk"""
+    def generate_translated_audio(self, cues, output_path, to_lang="en", progress_callback=None, loudness_target=None):
+        """
+        Główna metoda generująca przetłumaczony dźwięk
+
+        :param cues: CueTable z przetłumaczonym tekstem (lub ścieżka do pliku SRT)
+        :param output_path: Ścieżka wyjściowego pliku audio (nieużywana przy 'pcm')
+        :param to_lang: Kod języka docelowego
+        :param progress_callback: Funkcja callback do raportowania postępu
+        :param loudness_target: Docelowa głośność dubbingu (LUFS); None = bez wyrównania całości
+        :return: Ścieżka pliku audio lub AudioSegment (output_format 'pcm')
+        """
         try:
             if progress_callback:
                 progress_callback(0, 'generate_audio')
                 
-            # Wczytanie napisów
-            subs = pysrt.open(subtitle_path)
-            voice = self.edge_tts_voices.get(to_lang, "en-US-GuyNeural")
-            
-            self.logger.info(f"Generating translated audio using voice: {voice}")
+            # Napisy przekazywane są w pamięci; plik SRT wczytujemy tylko dla zgodności
+            subs = cues if isinstance(cues, CueTable) else CueTable.from_srt(cues, to_lang)
+            candidates = self.backend_candidates(to_lang)
+            if not candidates:
+                raise RuntimeError(f"No TTS backend available for language: {to_lang}")
             self.logger.info(f"Processing {len(subs)} segments")
 
             # Przygotowanie danych segmentów
+            # Po redystrybucji zdań napis może zostać bez tekstu - pomijamy go
+            speakers = subs.speakers or [0] * len(subs)
             segments_data = [{
-                "start": sub.start.ordinal / 1000.0,
-                "text": sub.text
-            } for sub in subs]
+                "start": start,
+                "text": text,
+                "speaker": speaker
+            } for (start, _, text), speaker in zip(subs, speakers) if text.strip()]
 
-            # Generowanie TTS
+            # Generowanie TTS; gdy synteza się nie powiedzie (np. brak sieci), próbujemy kolejnego silnika
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
-            
-            temp_files = loop.run_until_complete(
-                self.generate_all_tts_segments(segments_data, voice, os.path.dirname(output_path))
-            )
-            loop.close()
-
-            # Łączenie segmentów
-            combined_path = self.combine_audio_segments(segments_data, temp_files, output_path)
+            try:
+                for attempt, (backend, voice) in enumerate(candidates):
+                    if not backend.voice_for(to_lang):
+                        self.logger.warning(f"No {to_lang} voice in '{backend.name}', using fallback voice {voice}")
+                    self.logger.info(f"Generating translated audio using {backend.name} voice: {voice}")
+                    voice = self.speaker_voices(backend, to_lang, segments_data) or voice
+                    try:
+                        clips = loop.run_until_complete(
+                            self.generate_all_tts_segments(segments_data, backend, voice)
+                        )
+                        break
+                    except Exception as e:
+                        if attempt == len(candidates) - 1:
+                            raise
+                        self.logger.warning(
+                            f"TTS backend '{backend.name}' failed ({str(e)}), trying '{candidates[attempt + 1][0].name}'"
+                        )
+            finally:
+                loop.close()
 
-            # Czyszczenie tymczasowych plików
-            for temp_file in temp_files:
-                try:
-                    os.remove(temp_file)
-                except Exception as e:
-                    self.logger.warning(f"Could not remove temp file {temp_file}: {str(e)}")
+            # Łączenie segmentów - dźwięk TTS nie trafia na dysk
+            combined_path = self.combine_audio_segments(
+                segments_data, clips, output_path, backend.output_format, loudness_target
+            )
 
             if progress_callback:
                 progress_callback(100, 'generate_audio')
                 
-            self.logger.info(f"Successfully generated translated audio: {output_path}")
+            self.logger.info(
+                f"Successfully generated translated audio: {output_path if self.output_format != 'pcm' else 'in-memory PCM'}"
+            )
             return combined_path
             
         except Exception as e:
@@ -2,9 +2,11 @@ import os
 import subprocess
 import logging
 from core.colored_formatter import ColoredFormatter
+from core.ffmpeg_service import FFmpegService
+from core.media_info import MediaInfoService
 
 class AudioReplacer:
-    def __init__(self, ffmpeg_path, ffprobe_path, logger=None):
+    def __init__(self, ffmpeg_path, ffprobe_path, logger=None, ffmpeg_service=None, media_info=None):
         """
         Inicjalizacja AudioReplacer
         
@@ -12,10 +14,26 @@ class AudioReplacer:
             ffmpeg_path (str): Ścieżka do pliku wykonywalnego ffmpeg
             ffprobe_path (str): Ścieżka do pliku wykonywalnego ffprobe
             logger (logging.Logger, optional): Obiekt loggera. Domyślnie None.
+            ffmpeg_service (FFmpegService, optional): Wspólna usługa uruchamiania ffmpeg.
+            media_info (MediaInfoService, optional): Wspólna pamięć parametrów plików.
         """
         self.ffmpeg_path = ffmpeg_path
         self.ffprobe_path = ffprobe_path
         self.logger = logger or self._setup_default_logger()
+        self.ffmpeg_service = ffmpeg_service or FFmpegService(ffmpeg_path, ffprobe_path, logger=self.logger)
+        self.media_info = media_info or MediaInfoService(self.ffmpeg_service, logger=self.logger)
+        # Kodeki wideo, które można skopiować do MP4 bez ponownego kodowania
+        self.mp4_copy_codecs = {"h264", "hevc", "av1", "vp9", "mpeg4"}
+        # Dubbing jest kodowany dokładnie raz, przy składaniu pliku wynikowego
+        self.audio_codec = "aac"
+        self.audio_bitrate = "192k"
+        # 'replace' - tylko dubbing, 'mix' - oryginalna ścieżka ściszana pod dubbingiem
+        self.mix_mode = "replace"
+        self.duck_db = -14.0
+        # Akompaniament bez głosu lektora wystarczy ściszyć lekko
+        self.stem_duck_db = -4.0
+        self.duck_attack = 0.25
+        self.duck_release = 0.5
         
     def _setup_default_logger(self):
         """Konfiguruje domyślny logger jeśli nie został dostarczony"""
@@ -36,15 +54,28 @@ class AudioReplacer:
             extra['stage'] = stage
         self.logger.log(level, message, extra=extra)
     
-    def replace_audio(self, video_path, audio_path, output_path, progress_callback=None):
+    def replace_audio(self, video_path, audio_path, output_path, progress_callback=None, cues=None,
+                      original_audio_path=None, accompaniment_path=None):
         """
         Zamienia ścieżkę dźwiękową w pliku wideo
         
+        W trybie mix_mode='mix' oryginalna ścieżka (muzyka, efekty) zostaje i jest
+        ściszana pod fragmentami dubbingu w jednym grafie filtrów ffmpeg, bez
+        pośrednich plików WAV; wideo jest nadal kopiowane.
+        
         Args:
             video_path (str): Ścieżka do pliku wideo
-            audio_path (str): Ścieżka do nowego pliku audio
+            audio_path (str | AudioSegment): Ścieżka do nowego pliku audio lub ścieżka w pamięci
+                (surowe PCM przekazywane do ffmpeg przez stdin)
             output_path (str): Ścieżka do pliku wynikowego
             progress_callback (function, optional): Funkcja callback do śledzenia postępu
+            cues (CueTable, optional): Położenie klipów dubbingu (AudioGenerator.last_placements) -
+                wyznacza obwiednię ściszania w trybie 'mix' (bez niego ściszanie steruje sam
+                dubbing przez sidechaincompress)
+            original_audio_path (str, optional): Oryginalne audio, gdy wideo go nie zawiera
+                (np. osobno pobrana ścieżka audio)
+            accompaniment_path (str, optional): Oryginał bez głosu lektora (SourceSeparator) -
+                miksowany z dubbingiem niezależnie od mix_mode
             
         Returns:
             str: Ścieżka do pliku wynikowego
@@ -58,39 +89,110 @@ class AudioReplacer:
             
             self.log_with_emoji("Replacing audio track...", emoji_type='AUDIO', stage='finalize')
             self.log_with_emoji(f"Video: {os.path.basename(video_path)}", emoji_type='FILE', stage='finalize')
-            self.log_with_emoji(f"Audio: {os.path.basename(audio_path)}", emoji_type='FILE', stage='finalize')
+            in_memory = not isinstance(audio_path, str)
+            audio_name = "in-memory PCM" if in_memory else os.path.basename(audio_path)
+            self.log_with_emoji(f"Audio: {audio_name}", emoji_type='FILE', stage='finalize')
             self.log_with_emoji(f"Output: {os.path.basename(output_path)}", emoji_type='FILE', stage='finalize')
             
             # Sprawdzenie czy pliki wejściowe istnieją
             if not os.path.exists(video_path):
                 raise FileNotFoundError(f"Video file not found: {video_path}")
-            if not os.path.exists(audio_path):
+            if not in_memory and not os.path.exists(audio_path):
                 raise FileNotFoundError(f"Audio file not found: {audio_path}")
             
+            info = self.media_info.get(video_path)
+            if not info.video:
+                raise RuntimeError(f"No video stream in {os.path.basename(video_path)}")
+            if info.video.codec_name in self.mp4_copy_codecs:
+                video_codec = ["-c:v", "copy"]
+            else:
+                self.log_with_emoji(
+                    f"Video codec {info.video.codec_name} cannot be copied to MP4 - re-encoding",
+                    logging.WARNING, stage='finalize'
+                )
+                video_codec = ["-c:v", "libx264", "-crf", "18", "-preset", "fast"]
+            # Indeks strumienia z ffprobe - okładka (attached_pic) może być pierwszym strumieniem wideo
+            video_map = f"0:{info.video.index}"
+            
             # Tworzenie folderu wyjściowego jeśli nie istnieje
             os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
             
             # Komenda FFmpeg do zamiany dźwięku
+            if in_memory:
+                pcm = audio_path.set_sample_width(2)
+                audio_input = [
+                    "-f", "s16le",
+                    "-ar", str(pcm.frame_rate),
+                    "-ac", str(pcm.channels),
+                    "-i", "pipe:0"
+                ]
+            else:
+                pcm = None
+                audio_input = ["-i", audio_path]
+            
+            original_input = []
+            commands_path = None
+            duck_db = self.stem_duck_db if accompaniment_path else self.duck_db
+            if self.mix_mode == "mix" or accompaniment_path:
+                bed_source = accompaniment_path or original_audio_path or video_path
+                bed_info = info if bed_source == video_path else self.media_info.get(bed_source)
+                if not bed_info.audio:
+                    self.log_with_emoji(
+                        f"No original audio in {os.path.basename(bed_source)} - replacing instead of mixing",
+                        logging.WARNING, stage='finalize'
+                    )
+                elif bed_source == video_path:
+                    original_input = ["0:a:0"]
+                else:
+                    original_input = ["2:a:0", "-i", bed_source]
+            
+            if original_input:
+                # Graf filtrów i polecenia ściszania trafiają do plików - setki fragmentów
+                # nie zmieszczą się w linii poleceń
+                filter_script = f"{output_path}.filter"
+                if cues is not None:
+                    commands_path = f"{output_path}.cmd"
+                    with open(commands_path, 'w', encoding='utf-8') as f:
+                        f.write(self._duck_commands(cues, duck_db))
+                with open(filter_script, 'w', encoding='utf-8') as f:
+                    f.write(self._mix_filtergraph(original_input[0], commands_path))
+                audio_mapping = [
+                    *original_input[1:],
+                    "-filter_complex_script", filter_script,
+                    "-map", video_map,
+                    "-map", "[aout]",    # Długość wyznacza oryginalna ścieżka (amix duration=first)
+                ]
+                self.log_with_emoji(
+                    f"Mixing dub over {'background' if accompaniment_path else 'original'} audio (ducked {duck_db:+.0f} dB)",
+                    emoji_type='AUDIO', stage='finalize'
+                )
+            else:
+                filter_script = None
+                audio_mapping = [
+                    "-map", video_map,  # Użyj wideo z pierwszego pliku
+                    "-map", "1:a:0",     # Użyj audio z drugiego pliku
+                    "-af", "apad",       # Dopełnij dubbing ciszą, żeby -shortest nie skracał wideo
+                    "-shortest",
+                ]
+            
             cmd = [
-                self.ffmpeg_path,
                 "-i", video_path,
-                "-i", audio_path,
-                "-c:v", "copy",          # Kopiuj strumień wideo bez zmian
-                "-map", "0:v:0",        # Użyj wideo z pierwszego pliku
-                "-map", "1:a:0",         # Użyj audio z drugiego pliku
-                "-shortest",             # Dostosuj długość do krótszego pliku
+                *audio_input,
+                *audio_mapping,
+                *video_codec,            # Kopiuj strumień wideo bez zmian, jeśli to możliwe
+                "-c:a", self.audio_codec,
+                "-b:a", self.audio_bitrate,
                 "-y",                   # Nadpisz plik wyjściowy bez pytania
                 output_path,
             ]
             
             # Uruchomienie FFmpeg
-            subprocess.run(
-                cmd,
-                check=True,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-                creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
-            )
+            try:
+                self.ffmpeg_service.run(cmd, input=pcm.raw_data if pcm is not None else None)
+            finally:
+                for script in (filter_script, commands_path):
+                    if script and os.path.exists(script):
+                        os.remove(script)
             
             if progress_callback:
                 progress_callback(100, 'finalize')
@@ -111,4 +213,63 @@ class AudioReplacer:
             if progress_callback:
                 progress_callback(-1, 'finalize', error_msg)
             self.log_with_emoji(error_msg, logging.ERROR, 'ERROR')
-            raise RuntimeError(error_msg)
\ No newline at end of file
+            raise RuntimeError(error_msg)
+
+    def _duck_intervals(self, cues):
+        """Przedziały klipów dubbingu scalone, gdy przerwa jest krótsza niż atak + powrót"""
+        intervals = []
+        for start, end, text in sorted(cues):
+            if not text.strip() or end <= start:
+                continue
+            if intervals and start - intervals[-1][1] < self.duck_attack + self.duck_release:
+                intervals[-1][1] = max(intervals[-1][1], end)
+            else:
+                intervals.append([start, end])
+        return intervals
+
+    def _duck_commands(self, cues, duck_db):
+        """
+        Polecenia asendcmd ściszające oryginał pod dubbingiem
+
+        Każdy przedział to trapez: spadek przez duck_attack przed początkiem,
+        powrót przez duck_release po końcu. Na początku trapezu filtr volume
+        dostaje wyrażenie tylko z tym jednym trapezem (przedziały się nie
+        nakładają), więc koszt na ramkę nie rośnie z liczbą fragmentów.
+        """
+        depth = 1 - 10 ** (duck_db / 20)
+        lines = []
+        for start, end in self._duck_intervals(cues):
+            fade_in = max(0.0, start - self.duck_attack)
+            expression = (
+                f"1-{depth:.4f}*clip((t-{fade_in:.3f})/{self.duck_attack:.3f},0,1)"
+                f"*clip(({end + self.duck_release:.3f}-t)/{self.duck_release:.3f},0,1)"
+            )
+            lines.append(f"{fade_in:.3f} volume@duck volume '{expression}';")
+        return "\n".join(lines) + "\n"
+
+    def _mix_filtergraph(self, original_label, commands_path=None):
+        """
+        Graf filtrów: ściszony oryginał + dubbing -> [aout]
+
+        :param original_label: Strumień oryginalnego audio (np. '0:a:0')
+        :param commands_path: Plik poleceń z _duck_commands(); bez niego ściszanie
+            przez sidechaincompress sterowany dubbingiem
+        """
+        if commands_path is not None:
+            commands_escaped = commands_path.replace('\\', '/').replace(':', '\\:').replace("'", "\\'")
+            ducking = (
+                f"[{original_label}]asendcmd=f='{commands_escaped}',"
+                "volume@duck=volume=1:eval=frame[bed];"
+                "[1:a]anull[dub];"
+            )
+        else:
+            ducking = (
+                "[1:a]asplit=2[dub][key];"
+                f"[{original_label}][key]sidechaincompress=threshold=0.02:ratio=8:"
+                f"attack={self.duck_attack * 1000:.0f}:release={self.duck_release * 1000:.0f}[bed];"
+            )
+        return (
+            ducking
+            + "[bed][dub]amix=inputs=2:duration=first:dropout_transition=0:normalize=0,"
+            "alimiter=limit=0.97:level=disabled[aout]"
+        )
@@ -1,9 +1,13 @@
-from faster_whisper import WhisperModel
+from faster_whisper import WhisperModel, decode_audio
 import logging
+import time
+import wave
 import os
+import subprocess
+import numpy as np
 
 class AudioTranscriber:
-    def __init__(self, model_size="small", device="cpu", compute_type="int8", logger=None):
+    def __init__(self, model_size="small", device="cpu", compute_type="int8", logger=None, ffmpeg_service=None):
         """
         Inicjalizacja transkrybera audio
         
@@ -11,13 +15,24 @@ class AudioTranscriber:
         :param device: Urządzenie do obliczeń ('cpu' lub 'cuda')
         :param compute_type: Typ obliczeń ('int8', 'float16', itp.)
         :param logger: Obiekt loggera
+        :param ffmpeg_service: Wspólny FFmpegService do dekodowania próbek (opcjonalny)
         """
         self.model_size = model_size
         self.device = device
         self.compute_type = compute_type
         self.logger = logger or logging.getLogger(__name__)
+        self.ffmpeg_service = ffmpeg_service
         self.model = None
         
+        # Progi jakości dla trybu adaptacyjnego (domyślne wartości Whispera)
+        self.log_prob_threshold = -1.0
+        self.compression_ratio_threshold = 2.4
+        self.no_speech_threshold = 0.6
+        self.sampling_rate = 16000
+        
+        # Statystyki ostatniej transkrypcji
+        self.last_stats = {}
+        
     def load_model(self, models_dir="whisper_models"):
         """Ładowanie modelu Whisper"""
         try:
@@ -33,13 +48,22 @@ class AudioTranscriber:
             self.logger.error(f"Błąd podczas ładowania modelu Whisper: {str(e)}")
             raise
 
-    def transcribe(self, audio_path, beam_size=5, progress_callback=None):
+    def transcribe(self, audio_path, beam_size=5, progress_callback=None, vad_filter=False,
+                   word_timestamps=False, vad_parameters=None, decoding="beam", language=None,
+                   detect_sample_seconds=30):
         """
         Transkrybuj audio do tekstu
         
         :param audio_path: Ścieżka do pliku audio
         :param beam_size: Rozmiar wiązki dla dekodowania
         :param progress_callback: Funkcja callback do raportowania postępu
+        :param vad_filter: Pomijanie ciszy i muzyki przy pomocy VAD (Silero)
+        :param word_timestamps: Dołączanie znaczników czasu dla pojedynczych słów
+        :param vad_parameters: Parametry VAD (np. {'min_silence_duration_ms': 500})
+        :param decoding: 'beam' (beam_size), 'greedy' lub 'adaptive' - najpierw
+                         zachłannie, a segmenty o niskiej pewności ponownie z beam_size
+        :param language: Wymuszony kod języka; None = wykrywanie na krótkiej próbce
+        :param detect_sample_seconds: Długość próbki do wykrywania języka
         :return: tuple (język, lista segmentów)
         """
         if not self.model:
@@ -49,27 +73,52 @@ class AudioTranscriber:
             if progress_callback:
                 progress_callback(0, 'transcribe')
                 
-            self.logger.info(f"Rozpoczynanie transkrypcji: {audio_path}")
+            self.logger.info(f"Rozpoczynanie transkrypcji: {audio_path} (dekodowanie: {decoding})")
+            
+            started = time.perf_counter()
+            language_source = "forced"
+            detection_probability = None
+            if not language:
+                language, detection_probability = self.detect_language(audio_path, detect_sample_seconds)
+                language_source = "detected"
             
+            first_pass_beam = beam_size if decoding == "beam" else 1
+            options = {
+                "vad_filter": vad_filter,
+                "vad_parameters": vad_parameters if vad_filter else None,
+                "word_timestamps": word_timestamps
+            }
+            if decoding == "adaptive":
+                # Bez wewnętrznego fallbacku temperatury - słabe segmenty dekodujemy ponownie sami
+                options["temperature"] = 0.0
+            
+            # Język jest zawsze przekazywany, więc Whisper nie wykrywa go ponownie
             segments, info = self.model.transcribe(
                 audio_path,
-                beam_size=beam_size
+                beam_size=first_pass_beam,
+                language=language,
+                **options
             )
             
-            language = info.language
             segments_list = []
+            weak_indices = []
+            
+            self.logger.info(f"Język transkrypcji: {language} ({'wymuszony' if language_source == 'forced' else 'wykryty'})")
             
-            self.logger.info(f"Wykryty język: {language}")
+            duration_after_vad = getattr(info, 'duration_after_vad', None)
+            if vad_filter and duration_after_vad is not None and info.duration:
+                self.logger.info(
+                    f"VAD: dekodowanie {duration_after_vad:.1f}s z {info.duration:.1f}s "
+                    f"(pominięto {(1 - duration_after_vad / info.duration):.0%})"
+                )
             
             for i, segment in enumerate(segments):
-                segments_list.append({
-                    "start": segment.start,
-                    "end": segment.end,
-                    "text": segment.text
-                })
+                segments_list.append(self._segment_to_dict(segment, word_timestamps))
+                if decoding == "adaptive" and self._needs_fallback(segment):
+                    weak_indices.append(i)
                 
-                if progress_callback and i % 5 == 0:
-                    progress = (i / (i + 1)) * 100
+                if progress_callback and i % 5 == 0 and info.duration:
+                    progress = min(99, (segment.end / info.duration) * 100)
                     progress_callback(progress, 'transcribe')
                 
                 if i % 10 == 0:
@@ -77,6 +126,28 @@ class AudioTranscriber:
                         f"Transkrybowany segment {i}: {segment.text[:50]}..."
                     )
             
+            first_pass_time = time.perf_counter() - started
+            self.last_stats = {
+                "decoding": decoding,
+                "language": language,
+                "language_source": language_source,
+                "language_probability": detection_probability,
+                "segments": len(segments_list),
+                "fallback_segments": len(weak_indices),
+                "first_pass_seconds": round(first_pass_time, 2)
+            }
+            
+            if weak_indices:
+                fallback_started = time.perf_counter()
+                segments_list = self._redecode_weak_segments(
+                    audio_path, segments_list, weak_indices, language, beam_size, word_timestamps
+                )
+                self.last_stats["fallback_seconds"] = round(time.perf_counter() - fallback_started, 2)
+                self.logger.info(
+                    f"Tryb adaptacyjny: {len(weak_indices)}/{self.last_stats['segments']} segmentów "
+                    f"zdekodowano ponownie z beam_size={beam_size}"
+                )
+            
             if progress_callback:
                 progress_callback(100, 'transcribe')
                 
@@ -89,4 +160,157 @@ class AudioTranscriber:
             self.logger.error(f"Błąd transkrypcji: {str(e)}")
             if progress_callback:
                 progress_callback(-1, 'transcribe', str(e))
-            raise RuntimeError(f"Błąd transkrypcji: {e}")
\ No newline at end of file
+            raise RuntimeError(f"Błąd transkrypcji: {e}")
+
+    def detect_language(self, audio_path, sample_seconds=30):
+        """
+        Wykrywa język na podstawie pierwszych sekund nagrania
+
+        :param audio_path: Ścieżka do pliku audio
+        :param sample_seconds: Długość próbki w sekundach
+        :return: tuple (kod języka, prawdopodobieństwo)
+        """
+        if not self.model:
+            self.load_model()
+        
+        sample = self._load_sample(audio_path, sample_seconds)
+        started = time.perf_counter()
+        if hasattr(self.model, "detect_language"):
+            language, probability, _ = self.model.detect_language(sample)
+        else:
+            # Starsze wersje faster-whisper: wykrywanie odbywa się w transcribe(),
+            # a segmenty są leniwe, więc nic nie jest dekodowane
+            _, info = self.model.transcribe(sample, beam_size=1)
+            language, probability = info.language, info.language_probability
+        
+        self.logger.info(
+            f"Wykryty język: {language} (p={probability:.2f}, próbka {len(sample) / self.sampling_rate:.0f}s, "
+            f"{time.perf_counter() - started:.2f}s)"
+        )
+        return language, probability
+
+    def _load_sample(self, audio_path, seconds):
+        """Wczytuje początek nagrania jako float32 16 kHz mono"""
+        try:
+            with wave.open(audio_path, 'rb') as wav:
+                if (wav.getframerate() == self.sampling_rate and wav.getnchannels() == 1
+                        and wav.getsampwidth() == 2):
+                    frames = wav.readframes(int(seconds * self.sampling_rate))
+                    return np.frombuffer(frames, dtype=np.int16).astype(np.float32) / 32768.0
+        except (wave.Error, EOFError):
+            pass
+        if self.ffmpeg_service is not None:
+            # Skompresowane nagranie (np. FLAC): dekodowany jest tylko początek
+            try:
+                result = self.ffmpeg_service.run(
+                    ['-i', audio_path, '-t', f"{seconds:.3f}", '-map', '0:a:0', '-vn',
+                     '-f', 's16le', '-acodec', 'pcm_s16le', '-ar', str(self.sampling_rate), '-ac', '1', 'pipe:1'],
+                    capture_output=True
+                )
+                data = result.stdout[:len(result.stdout) // 2 * 2]
+                return np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0
+            except subprocess.CalledProcessError as e:
+                self.logger.warning(f"Could not decode sample of {os.path.basename(audio_path)} with ffmpeg: {e}")
+        audio = decode_audio(audio_path, sampling_rate=self.sampling_rate)
+        return audio[:int(seconds * self.sampling_rate)]
+
+    def _load_window(self, audio_path, start, end):
+        """
+        Dekoduje przez ffmpeg tylko okno [start, end) nagrania jako float32 16 kHz mono
+        
+        :return: Próbki okna lub None, gdy brak usługi ffmpeg albo dekodowanie się nie powiodło
+        """
+        if self.ffmpeg_service is None:
+            return None
+        try:
+            result = self.ffmpeg_service.run(
+                ['-ss', f"{start:.3f}", '-i', audio_path, '-t', f"{max(0.0, end - start):.3f}",
+                 '-map', '0:a:0', '-vn', '-f', 's16le', '-acodec', 'pcm_s16le',
+                 '-ar', str(self.sampling_rate), '-ac', '1', 'pipe:1'],
+                capture_output=True
+            )
+        except subprocess.CalledProcessError as e:
+            self.logger.warning(f"Could not decode window {start:.2f}-{end:.2f}s of {os.path.basename(audio_path)} with ffmpeg: {e}")
+            return None
+        data = result.stdout[:len(result.stdout) // 2 * 2]
+        return np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0
+
+    def _segment_to_dict(self, segment, word_timestamps, offset=0.0):
+        """Konwertuje segment faster-whisper na słownik (z przesunięciem czasu)"""
+        segment_dict = {
+            "start": segment.start + offset,
+            "end": segment.end + offset,
+            "text": segment.text
+        }
+        if word_timestamps and segment.words:
+            segment_dict["words"] = [{
+                "start": word.start + offset,
+                "end": word.end + offset,
+                "word": word.word,
+                "probability": word.probability
+            } for word in segment.words]
+        return segment_dict
+
+    def _needs_fallback(self, segment):
+        """Czy segment z pierwszego przebiegu nie spełnia progów jakości"""
+        if segment.no_speech_prob > self.no_speech_threshold and segment.avg_logprob < self.log_prob_threshold:
+            # Cisza - ponowne dekodowanie nic nie da
+            return False
+        return (segment.avg_logprob < self.log_prob_threshold
+                or segment.compression_ratio > self.compression_ratio_threshold)
+
+    def _redecode_weak_segments(self, audio_path, segments_list, weak_indices, language, beam_size, word_timestamps):
+        """
+        Dekoduje ponownie fragmenty audio słabych segmentów z pełnym beam search
+
+        Sąsiadujące słabe segmenty łączone są w jedno okno, żeby ograniczyć liczbę wywołań.
+        """
+        audio = None
+        
+        windows = []
+        for index in weak_indices:
+            if windows and windows[-1][1] == index - 1:
+                windows[-1][1] = index
+            else:
+                windows.append([index, index])
+        
+        replacements = {}
+        for first, last in windows:
+            window_start = segments_list[first]["start"]
+            window_end = segments_list[last]["end"]
+            chunk = self._load_window(audio_path, window_start, window_end) if audio is None else None
+            if chunk is None:
+                # Brak ffmpeg: całe nagranie dekodowane jest raz i cięte w pamięci
+                if audio is None:
+                    audio = decode_audio(audio_path, sampling_rate=self.sampling_rate)
+                chunk = audio[int(window_start * self.sampling_rate):int(window_end * self.sampling_rate)]
+            if len(chunk) == 0:
+                continue
+            
+            redecoded, _ = self.model.transcribe(
+                chunk,
+                language=language,
+                beam_size=beam_size,
+                word_timestamps=word_timestamps,
+                condition_on_previous_text=False
+            )
+            new_segments = []
+            for segment in redecoded:
+                segment_dict = self._segment_to_dict(segment, word_timestamps, offset=window_start)
+                segment_dict["start"] = max(window_start, min(segment_dict["start"], window_end))
+                segment_dict["end"] = max(segment_dict["start"], min(segment_dict["end"], window_end))
+                new_segments.append(segment_dict)
+            if new_segments:
+                replacements[first] = (last, new_segments)
+        
+        result = []
+        i = 0
+        while i < len(segments_list):
+            if i in replacements:
+                last, new_segments = replacements[i]
+                result.extend(new_segments)
+                i = last + 1
+            else:
+                result.append(segments_list[i])
+                i += 1
+        return result
@@ -0,0 +1,102 @@
+import os
+import queue
+import logging
+import threading
+
+
+class DownloadArchive:
+    """
+    Trwałe archiwum przetworzonych identyfikatorów wideo
+
+    Format pliku jest zgodny z --download-archive yt-dlp ("youtube <id>" w linii),
+    więc to samo archiwum można przekazać bezpośrednio do yt-dlp.
+    """
+
+    def __init__(self, path, extractor="youtube"):
+        self.path = path
+        self.extractor = extractor
+        self._lock = threading.Lock()
+        self._ids = set()
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) == 2:
+                        self._ids.add(parts[1])
+
+    def __contains__(self, video_id):
+        with self._lock:
+            return video_id in self._ids
+
+    def add(self, video_id):
+        with self._lock:
+            if video_id in self._ids:
+                return
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(f"{self.extractor} {video_id}\n")
+            self._ids.add(video_id)
+
+
+class BatchJobQueue:
+    """
+    Kolejka zadań o ograniczonej współbieżności
+
+    Stała liczba wątków roboczych pobiera elementy z kolejki o ograniczonym
+    rozmiarze; submit() blokuje, gdy kolejka jest pełna, co hamuje producenta.
+    """
+
+    def __init__(self, worker, max_concurrency=2, max_pending=None, logger=None):
+        """
+        :param worker: Funkcja(item) wykonywana dla każdego elementu
+        :param max_concurrency: Liczba równoległych wątków roboczych
+        :param max_pending: Maksymalna liczba oczekujących elementów (domyślnie 2 x wątki)
+        :param logger: Obiekt loggera
+        """
+        self.worker = worker
+        self.logger = logger or logging.getLogger(__name__)
+        self.queue = queue.Queue(maxsize=max_pending or max_concurrency * 2)
+        self.results = []
+        self._results_lock = threading.Lock()
+        self._stop = threading.Event()
+        self.threads = [
+            threading.Thread(target=self._run, daemon=True, name=f"batch-worker-{i}")
+            for i in range(max_concurrency)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                if self._stop.is_set():
+                    continue
+                try:
+                    result = self.worker(item)
+                    error = None
+                except Exception as e:
+                    result = None
+                    error = str(e)
+                    self.logger.error(f"Batch item failed: {error}")
+                with self._results_lock:
+                    self.results.append((item, result, error))
+            finally:
+                self.queue.task_done()
+
+    def submit(self, item):
+        self.queue.put(item)
+
+    def cancel(self):
+        """Pomija elementy, które jeszcze nie zostały rozpoczęte"""
+        self._stop.set()
+
+    def close(self):
+        """Czeka na zakończenie wszystkich zadań i zatrzymuje wątki"""
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        return self.results
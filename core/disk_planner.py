@@ -0,0 +1,334 @@
+import os
+import shutil
+import logging
+import platform
+import threading
+
+
+class MediaEstimate:
+    """Parametry źródła potrzebne do oszacowania rozmiarów plików pośrednich"""
+    __slots__ = ('duration', 'bit_rate', 'width', 'height', 'size')
+
+    def __init__(self, duration, bit_rate, width=0, height=0, size=0):
+        self.duration = duration
+        self.bit_rate = bit_rate
+        self.width = width
+        self.height = height
+        self.size = size or int(duration * bit_rate / 8)
+
+
+class DiskPlan:
+    """
+    Szacunkowe zapotrzebowanie zadania na miejsce, etap po etapie
+
+    stages to lista krotek (etap, bajty, cykl życia, miejsce, kopie); pliki 'temp'
+    mogą zostać zwolnione zaraz po etapie, który ich potrzebuje, pliki 'keep'
+    zostają. Miejsce to rola katalogu (DiskPlanner.OUTPUT, SCRATCH, ...), a kopie
+    to krotki (miejsce, cykl życia) dla plików przenoszonych lub dowiązywanych
+    gdzie indziej - na tym samym dysku nie zajmują one dodatkowego miejsca.
+    """
+
+    def __init__(self, stages):
+        self.stages = stages
+        self.mode = "normal"
+
+    @property
+    def peak_bytes(self):
+        """Szczyt przy sprzątaniu dopiero po zakończeniu zadania"""
+        return sum(stage[1] for stage in self.stages)
+
+    @property
+    def low_disk_peak_bytes(self):
+        """Szczyt przy zwalnianiu plików pośrednich etapu, gdy przestają być potrzebne"""
+        peak = kept = 0
+        previous_temp = 0
+        for _, size, lifecycle, *_ in self.stages:
+            # Plik poprzedniego etapu jest wejściem bieżącego, więc oba istnieją jednocześnie
+            peak = max(peak, kept + previous_temp + size)
+            if lifecycle == DiskPlanner.KEEP:
+                kept += size
+                previous_temp = 0
+            else:
+                previous_temp = size
+        return peak
+
+    def by_device(self, devices):
+        """
+        Dzieli plan na plany poszczególnych dysków
+
+        Plik przeniesiony lub dowiązany na tym samym dysku liczony jest raz,
+        z mocniejszym cyklem życia ('keep' wygrywa z 'temp').
+
+        :param devices: Słownik miejsce -> identyfikator dysku
+        :return: Słownik dysk -> DiskPlan (krotki etap, bajty, cykl życia)
+        """
+        plans = {}
+        for name, size, lifecycle, location, copies in self.stages:
+            placed = {}
+            for where, where_lifecycle in [(location, lifecycle), *copies]:
+                device = devices[where]
+                if placed.get(device) != DiskPlanner.KEEP:
+                    placed[device] = where_lifecycle
+            for device, device_lifecycle in placed.items():
+                plans.setdefault(device, DiskPlan([])).stages.append((name, size, device_lifecycle))
+        return plans
+
+    def __str__(self):
+        return ", ".join(f"{stage[0]}={stage[1] / (1024 ** 2):.0f}MB" for stage in self.stages)
+
+
+class DiskReservation:
+    """Rezerwacja miejsca na jednym lub kilku dyskach; zwalniana po zakończeniu zadania"""
+
+    def __init__(self, planner, sizes):
+        """
+        :param planner: DiskPlanner, który utworzył rezerwację
+        :param sizes: Słownik urządzenie -> zarezerwowane bajty
+        """
+        self.planner = planner
+        self.sizes = dict(sizes)
+
+    @property
+    def size(self):
+        return sum(self.sizes.values())
+
+    def release(self):
+        for device, size in self.sizes.items():
+            if size:
+                self.planner._release(device, size)
+        self.sizes = {}
+
+
+class DiskPlanner:
+    """
+    Planowanie miejsca na dysku dla zadania
+
+    Na podstawie czasu trwania, przepływności i rozdzielczości źródła (ffprobe)
+    szacuje rozmiar plików każdego etapu, wybiera tryb pracy i rezerwuje miejsce.
+    Rezerwacje są wspólne dla wszystkich instancji w procesie, więc równoległe
+    zadania na tym samym dysku nie liczą dwa razy tego samego wolnego miejsca.
+    """
+    KEEP = 'keep'
+    TEMP = 'temp'
+    # Role katalogów, na których powstają pliki zadania
+    OUTPUT = 'output'
+    SCRATCH = 'scratch'
+    DOWNLOAD_CACHE = 'download_cache'
+    CHUNK_CACHE = 'chunk_cache'
+
+    # WAV 16 kHz mono 16 bit z ekstrakcji audio
+    EXTRACTED_AUDIO_BYTES_PER_SECOND = 16000 * 2
+    # Złożona ścieżka dubbingu WAV 24 kHz mono 16 bit (klipy TTS zostają w pamięci)
+    DUBBED_AUDIO_BYTES_PER_SECOND = 24000 * 2
+    # Osobno pobierana ścieżka audio (Opus/AAC ok. 160 kb/s)
+    DOWNLOADED_AUDIO_BYTES_PER_SECOND = 160000 // 8
+    # Ścieżka tła po separacji: oryginalne próbkowanie (typowo 48 kHz) stereo 16 bit
+    SEPARATED_AUDIO_BYTES_PER_SECOND = 48000 * 2 * 2
+    # Przepływność ścieżki AAC przy zamianie audio, gdy plan() jej nie dostanie
+    # (domyślna wartość AudioReplacer.audio_bitrate)
+    DEFAULT_OUTPUT_AUDIO_BITRATE = "192k"
+    # Przybliżona przepływność H.264 (CRF 18) na piksel klatki przy 30 fps
+    BURN_BITS_PER_PIXEL = 0.15
+    FALLBACK_FPS = 30
+    # Rozmiar plików pośrednich audio względem WAV
+    AUDIO_FORMAT_RATIO = {'wav': 1.0, 'flac': 0.6, 'pcm': 0.0}
+
+    _reservations = {}
+    _reservations_lock = threading.Lock()
+
+    def __init__(self, media_info, safety_margin=1.15, min_free_bytes=512 * 1024 ** 2, logger=None):
+        """
+        :param media_info: MediaInfoService z parametrami plików
+        :param safety_margin: Mnożnik zapasu dla szacunków
+        :param min_free_bytes: Miejsce, które zawsze musi zostać wolne
+        :param logger: Obiekt loggera
+        """
+        self.media_info = media_info
+        self.safety_margin = safety_margin
+        self.min_free_bytes = min_free_bytes
+        self.logger = logger or logging.getLogger(__name__)
+
+    def log_with_emoji(self, message, level=logging.INFO, emoji_type=None):
+        extra = {'emoji_type': emoji_type} if emoji_type else {}
+        self.logger.log(level, message, extra=extra)
+
+    def probe(self, path):
+        """
+        Odczytuje czas trwania, przepływność i rozdzielczość pliku
+
+        :raises RuntimeError: Gdy ffprobe nie może odczytać pliku
+        """
+        info = self.media_info.get(path)
+        return MediaEstimate(info.duration, info.bit_rate, info.width, info.height, info.size)
+
+    def estimate_from_info(self, info, quality='best'):
+        """
+        Szacuje parametry wideo YouTube przed pobraniem (z get_video_info)
+
+        Wybiera format o największej przepływności nie wyższy niż żądana jakość.
+        """
+        max_height = int(quality[:-1]) if quality.endswith('p') and quality[:-1].isdigit() else None
+        duration = float(info.get('duration') or 0)
+        best = None
+        for fmt in info.get('formats', []):
+            height = fmt.get('height') or 0
+            if fmt.get('vcodec') in (None, 'none') or (max_height and height > max_height):
+                continue
+            if best is None or (fmt.get('tbr') or 0) > (best.get('tbr') or 0):
+                best = fmt
+        best = best or {}
+        size = best.get('filesize') or best.get('filesize_approx') or 0
+        bit_rate = int((best.get('tbr') or 0) * 1000) or (int(size * 8 / duration) if duration else 0)
+        return MediaEstimate(duration, bit_rate, best.get('width') or 0, best.get('height') or 0, size)
+
+    def plan(self, media, add_subtitles=False, download=False, audio_format='wav', separate=False,
+             audio_bitrate=None, two_track=False, chunked_burn=False):
+        """
+        Szacuje rozmiar plików tworzonych przez każdy etap i miejsce, w którym powstają
+
+        Wyniki renderowane są w katalogu roboczym i dopiero potem przenoszone do
+        folderu wyników, a pobrane pliki trafiają najpierw do pamięci podręcznej.
+
+        :param media: MediaEstimate źródła
+        :param add_subtitles: Czy powstanie wersja z wypalonymi napisami
+        :param download: Czy źródło zostanie pobrane do folderu zadania
+        :param audio_format: Format plików pośrednich audio ('wav', 'flac', 'pcm')
+        :param separate: Czy powstanie ścieżka tła bez głosu lektora
+        :param audio_bitrate: Przepływność audio wyniku w notacji ffmpeg (np. '192k')
+        :param two_track: Czy audio pobierane jest osobno (do katalogu roboczego)
+        :param chunked_burn: Czy napisy wypalane są fragmentami (kopia wideo w pamięci fragmentów)
+        :return: DiskPlan
+        """
+        duration = media.duration
+        output_audio_bytes = int(duration * self._bitrate(audio_bitrate or self.DEFAULT_OUTPUT_AUDIO_BITRATE) / 8)
+        video_bytes = max(0, media.size - output_audio_bytes)
+        published = ((self.OUTPUT, self.KEEP),)
+        stages = []
+        if download and two_track:
+            # Plik zostaje w pamięci podręcznej, w folderze zadania jest jego dowiązanie lub kopia
+            stages.append((
+                'download_audio', int(duration * self.DOWNLOADED_AUDIO_BYTES_PER_SECOND), self.KEEP,
+                self.DOWNLOAD_CACHE, ((self.OUTPUT, self.TEMP), (self.SCRATCH, self.TEMP))
+            ))
+        if download:
+            stages.append(('download', media.size, self.KEEP, self.DOWNLOAD_CACHE, published))
+        # Ekstrakcja w trybie 'pcm' zapisuje FLAC
+        extract_ratio = self.AUDIO_FORMAT_RATIO.get(audio_format, 1.0) or self.AUDIO_FORMAT_RATIO['flac']
+        dub_ratio = self.AUDIO_FORMAT_RATIO.get(audio_format, 1.0)
+        stages.append((
+            'extract_audio', int(duration * self.EXTRACTED_AUDIO_BYTES_PER_SECOND * extract_ratio), self.TEMP,
+            self.SCRATCH, ()
+        ))
+        stages.append((
+            'generate_audio', int(duration * self.DUBBED_AUDIO_BYTES_PER_SECOND * dub_ratio), self.TEMP,
+            self.SCRATCH, ()
+        ))
+        if separate:
+            stages.append((
+                'separate', int(duration * self.SEPARATED_AUDIO_BYTES_PER_SECOND * extract_ratio), self.TEMP,
+                self.SCRATCH, ()
+            ))
+        stages.append(('replace_audio', video_bytes + output_audio_bytes, self.TEMP, self.SCRATCH, published))
+        if add_subtitles:
+            burned_rate = media.width * media.height * self.FALLBACK_FPS * self.BURN_BITS_PER_PIXEL / 8
+            burned_bytes = int(duration * burned_rate) if burned_rate else video_bytes
+            if chunked_burn:
+                stages.append(('burn_chunks', burned_bytes, self.TEMP, self.CHUNK_CACHE, ()))
+            stages.append((
+                'burn_subtitles', burned_bytes + output_audio_bytes, self.TEMP, self.SCRATCH, published
+            ))
+        return DiskPlan(stages)
+
+    def reserve(self, path, plan, locations=None):
+        """
+        Wybiera tryb pracy i rezerwuje miejsce dla zadania na każdym używanym dysku
+
+        'normal' - pliki pośrednie usuwane po zakończeniu zadania,
+        'low_disk' - pliki pośrednie usuwane zaraz po etapie, który ich potrzebuje
+        (wybierany, gdy na którymkolwiek dysku nie mieści się tryb normalny).
+
+        :param path: Katalog, w którym powstaną wyniki zadania (miejsce OUTPUT)
+        :param plan: DiskPlan z plan()
+        :param locations: Słownik miejsce -> katalog dla pozostałych miejsc (brak = path)
+        :return: DiskReservation (plan.mode zawiera wybrany tryb)
+        :raises RuntimeError: Gdy nawet tryb oszczędny nie zmieści się na którymś dysku
+        """
+        roots = {self.OUTPUT: self._existing_parent(path)}
+        for location, directory in (locations or {}).items():
+            if directory and location != self.OUTPUT:
+                roots[location] = self._existing_parent(directory)
+        roots = {location: roots.get(location, roots[self.OUTPUT])
+                 for location in (self.OUTPUT, self.SCRATCH, self.DOWNLOAD_CACHE, self.CHUNK_CACHE)}
+        devices = {location: self._device(root) for location, root in roots.items()}
+        paths = {devices[location]: root for location, root in roots.items()}
+
+        sizes = {}
+        free_total = 0
+        with self._reservations_lock:
+            modes = []
+            for device, device_plan in plan.by_device(devices).items():
+                mode, size, free = self._fit(paths[device], device, device_plan)
+                modes.append(mode)
+                sizes[device] = size
+                free_total += free
+            for device, size in sizes.items():
+                self._reservations[device] = self._reservations.get(device, 0) + size
+        plan.mode = "low_disk" if "low_disk" in modes else "normal"
+        size = sum(sizes.values())
+
+        self.log_with_emoji(
+            f"Disk plan ({plan.mode}): {plan}; reserved {size / (1024 ** 3):.2f}GB of {free_total / (1024 ** 3):.2f}GB free"
+            + (f" on {len(sizes)} devices" if len(sizes) > 1 else ""),
+            emoji_type='SETTINGS'
+        )
+        if plan.mode == "low_disk":
+            self.log_with_emoji(
+                "Low disk space - intermediate files will be deleted as soon as each stage finishes",
+                logging.WARNING
+            )
+        return DiskReservation(self, sizes)
+
+    def _fit(self, path, device, plan):
+        """
+        Wybiera tryb dla planu jednego dysku (wywoływane pod _reservations_lock)
+
+        :return: Krotka (tryb, bajty do zarezerwowania, wolne bajty)
+        :raises RuntimeError: Gdy nawet tryb oszczędny się nie zmieści
+        """
+        required = {
+            "normal": int(plan.peak_bytes * self.safety_margin),
+            "low_disk": int(plan.low_disk_peak_bytes * self.safety_margin)
+        }
+        free = shutil.disk_usage(path).free - self._reservations.get(device, 0) - self.min_free_bytes
+        for mode, size in required.items():
+            if size <= free:
+                return mode, size, free
+        raise RuntimeError(
+            f"Insufficient disk space on {path}. Required: {required['low_disk'] / (1024 ** 3):.2f}GB, "
+            f"Available: {max(0, free) / (1024 ** 3):.2f}GB"
+        )
+
+    def _release(self, device, size):
+        with self._reservations_lock:
+            remaining = self._reservations.get(device, 0) - size
+            if remaining > 0:
+                self._reservations[device] = remaining
+            else:
+                self._reservations.pop(device, None)
+
+    def _bitrate(self, bitrate):
+        """Przepływność w notacji ffmpeg ('192k', '1.5M' lub liczba) w bitach na sekundę"""
+        value = str(bitrate).strip()
+        multiplier = {'k': 1000, 'm': 1000 ** 2}.get(value[-1:].lower(), 1)
+        return int(float(value[:-1] if multiplier > 1 else value) * multiplier)
+
+    def _device(self, path):
+        if platform.system() == "Windows":
+            return os.path.splitdrive(os.path.abspath(path))[0].upper()
+        return os.stat(path).st_dev
+
+    def _existing_parent(self, path):
+        path = os.path.abspath(path)
+        while not os.path.exists(path) and os.path.dirname(path) != path:
+            path = os.path.dirname(path)
+        return path
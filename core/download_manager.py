@@ -0,0 +1,206 @@
+import os
+import re
+import json
+import time
+import shutil
+import hashlib
+import logging
+import threading
+
+
+class MediaCache:
+    """
+    Lokalna pamięć podręczna pobranych plików, kluczowana identyfikatorem wideo
+
+    Indeks (index.json) przechowuje rozmiar i czas ostatniego użycia każdego wpisu;
+    po przekroczeniu max_bytes usuwane są najdawniej używane pliki.
+    """
+
+    def __init__(self, cache_dir, max_bytes=20 * 1024 ** 3, logger=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.logger = logger or logging.getLogger(__name__)
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self.index = self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self):
+        temp_path = f"{self.index_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, indent=1)
+        os.replace(temp_path, self.index_path)
+
+    def entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, key):
+        """Zwraca ścieżkę pliku z pamięci podręcznej lub None"""
+        with self._lock:
+            entry = self.index.get(key)
+            if not entry:
+                return None
+            path = os.path.join(self.cache_dir, entry["path"])
+            if not os.path.exists(path):
+                del self.index[key]
+                self._save_index()
+                return None
+            entry["last_access"] = time.time()
+            self._save_index()
+            return path
+
+    def put(self, key, file_path):
+        """
+        Przenosi plik do pamięci podręcznej i usuwa najstarsze wpisy ponad limit
+
+        :param key: Klucz wpisu (np. identyfikator wideo i jakość)
+        :param file_path: Ścieżka pobranego pliku
+        :return: Ścieżka pliku w pamięci podręcznej
+        """
+        with self._lock:
+            target_dir = self.entry_dir(key)
+            os.makedirs(target_dir, exist_ok=True)
+            target_path = os.path.join(target_dir, os.path.basename(file_path))
+            if os.path.abspath(file_path) != os.path.abspath(target_path):
+                shutil.move(file_path, target_path)
+            self.index[key] = {
+                "path": os.path.relpath(target_path, self.cache_dir),
+                "size": os.path.getsize(target_path),
+                "last_access": time.time()
+            }
+            self._evict(keep=key)
+            self._save_index()
+            return target_path
+
+    def total_bytes(self):
+        return sum(entry["size"] for entry in self.index.values())
+
+    def _evict(self, keep=None):
+        total = self.total_bytes()
+        for key, entry in sorted(self.index.items(), key=lambda item: item[1]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(self.entry_dir(key), ignore_errors=True)
+            total -= entry["size"]
+            del self.index[key]
+            self.logger.info(f"Evicted cached download: {key} ({entry['size'] / (1024 * 1024):.1f}MB)")
+
+
+class DownloadManager:
+    """
+    Pobieranie przez YouTubeDownloader z równoległymi fragmentami, wznawianiem
+    i lokalną pamięcią podręczną
+
+    Niedokończone pliki (.part) trafiają do stałego katalogu partial/<klucz>,
+    więc ponowiona próba kontynuuje pobieranie zamiast zaczynać od zera.
+    """
+    VIDEO_ID_PATTERNS = [
+        r'[?&]v=([A-Za-z0-9_-]{11})',
+        r'youtu\.be/([A-Za-z0-9_-]{11})',
+        r'/shorts/([A-Za-z0-9_-]{11})'
+    ]
+
+    def __init__(self, downloader, cache_dir, concurrent_fragments=4, rate_limit=None,
+                 max_cache_bytes=20 * 1024 ** 3, logger=None):
+        """
+        :param downloader: Instancja YouTubeDownloader
+        :param cache_dir: Katalog pamięci podręcznej
+        :param concurrent_fragments: Liczba równolegle pobieranych fragmentów (DASH/HLS)
+        :param rate_limit: Limit prędkości w bajtach/s (None = bez limitu)
+        :param max_cache_bytes: Maksymalny rozmiar pamięci podręcznej
+        :param logger: Obiekt loggera
+        """
+        self.downloader = downloader
+        self.concurrent_fragments = concurrent_fragments
+        self.rate_limit = rate_limit
+        self.logger = logger or logging.getLogger(__name__)
+        self.cache = MediaCache(cache_dir, max_cache_bytes, logger=self.logger)
+        self.partial_dir = os.path.join(cache_dir, "partial")
+        # Wyłączenie walidacji pozwala testować na lokalnym serwerze HTTP
+        self.validate_urls = True
+
+    def cache_key(self, url, quality):
+        """Klucz pamięci podręcznej: identyfikator wideo (lub skrót URL) i jakość"""
+        # Selektory formatu yt-dlp zawierają znaki niedozwolone w nazwach katalogów
+        if not re.fullmatch(r'[\w-]+', quality):
+            quality = hashlib.sha1(quality.encode('utf-8')).hexdigest()[:10]
+        for pattern in self.VIDEO_ID_PATTERNS:
+            match = re.search(pattern, url)
+            if match:
+                return f"{match.group(1)}_{quality}"
+        return f"{hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]}_{quality}"
+
+    def _download_options(self):
+        options = {
+            'continuedl': True,
+            'nopart': False,
+            'retries': 10,
+            'fragment_retries': 10,
+            'concurrent_fragment_downloads': self.concurrent_fragments
+        }
+        if self.rate_limit:
+            options['ratelimit'] = self.rate_limit
+        return options
+
+    def download(self, url, output_dir, quality='best', progress_callback=None, fmt=None):
+        """
+        Zwraca plik z pamięci podręcznej albo pobiera go (z wznowieniem)
+
+        :param url: Adres wideo
+        :param output_dir: Katalog, do którego trafi kopia pliku
+        :param quality: Ustawienie jakości (best, 1080p, ...)
+        :param progress_callback: Funkcja callback postępu
+        :param fmt: Własny selektor formatu yt-dlp (zastępuje quality)
+        :return: Ścieżka do pliku w output_dir
+        """
+        key = self.cache_key(url, fmt or quality)
+        cached_path = self.cache.get(key)
+        if cached_path:
+            self.logger.info(f"Using cached download: {os.path.basename(cached_path)}")
+            if progress_callback:
+                progress_callback(100)
+        else:
+            cached_path = self._download_to_cache(key, url, quality, fmt, progress_callback)
+
+        return self._materialize(cached_path, output_dir)
+
+    def _download_to_cache(self, key, url, quality, fmt, progress_callback=None):
+        partial_dir = os.path.join(self.partial_dir, key)
+        downloaded_path = self.downloader.download(
+            url,
+            partial_dir,
+            quality=quality,
+            progress_callback=progress_callback,
+            extra_opts=self._download_options(),
+            fmt=fmt,
+            validate=self.validate_urls
+        )
+        cached_path = self.cache.put(key, downloaded_path)
+        shutil.rmtree(partial_dir, ignore_errors=True)
+        return cached_path
+
+    def prefetch(self, url, quality='best', fmt=None):
+        """Pobiera plik do pamięci podręcznej bez kopiowania go do katalogu zadania"""
+        key = self.cache_key(url, fmt or quality)
+        return self.cache.get(key) or self._download_to_cache(key, url, quality, fmt)
+
+    def _materialize(self, cached_path, output_dir):
+        """Tworzy w output_dir twarde dowiązanie (lub kopię) pliku z pamięci podręcznej"""
+        os.makedirs(output_dir, exist_ok=True)
+        target_path = os.path.join(output_dir, os.path.basename(cached_path))
+        if os.path.exists(target_path):
+            os.remove(target_path)
+        try:
+            os.link(cached_path, target_path)
+        except OSError:
+            shutil.copy2(cached_path, target_path)
+        return target_path
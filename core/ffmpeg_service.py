@@ -0,0 +1,180 @@
+import os
+import json
+import logging
+import platform
+import threading
+import subprocess
+from contextlib import contextmanager
+
+
+class FFmpegService:
+    """
+    Wspólny punkt uruchamiania ffmpeg i ffprobe
+
+    Ogranicza liczbę jednocześnie działających procesów, uruchamia je z niższym
+    priorytetem i (opcjonalnie) na wybranych rdzeniach, zapamiętuje wyniki
+    ffprobe dla niezmienionych plików i liczy uruchomione procesy.
+    """
+
+    def __init__(self, ffmpeg_path, ffprobe_path, max_processes=None, niceness=None, cpu_affinity=None, logger=None):
+        """
+        :param ffmpeg_path: Ścieżka do ffmpeg
+        :param ffprobe_path: Ścieżka do ffprobe
+        :param max_processes: Maksymalna liczba równoległych procesów (domyślnie połowa rdzeni)
+        :param niceness: Przyrost niceness procesów (POSIX); >0 na Windows = niższy priorytet
+        :param cpu_affinity: Zbiór numerów rdzeni dla procesów (tylko Linux)
+        :param logger: Obiekt loggera
+        """
+        self.ffmpeg_path = ffmpeg_path
+        self.ffprobe_path = ffprobe_path
+        self.max_processes = max_processes or max(1, (os.cpu_count() or 2) // 2)
+        self.niceness = niceness
+        self.cpu_affinity = cpu_affinity
+        self.logger = logger or logging.getLogger(__name__)
+        self._slots = threading.BoundedSemaphore(self.max_processes)
+        self._lock = threading.Lock()
+        self._probe_cache = {}
+        self.counters = {"ffmpeg": 0, "ffprobe": 0, "probe_cache_hits": 0}
+
+    def _count(self, key):
+        with self._lock:
+            self.counters[key] += 1
+
+    def snapshot(self):
+        """Kopia liczników (do wyliczenia różnicy dla pojedynczego zadania)"""
+        with self._lock:
+            return dict(self.counters)
+
+    def _process_options(self):
+        if platform.system() == "Windows":
+            flags = subprocess.CREATE_NO_WINDOW
+            if self.niceness and self.niceness > 0:
+                flags |= subprocess.BELOW_NORMAL_PRIORITY_CLASS
+            return {"creationflags": flags}
+        return {}
+
+    def _apply_limits(self, pid):
+        """
+        Ustawia priorytet i rdzenie uruchomionego procesu (POSIX)
+
+        Robione po Popen, a nie w preexec_fn, które nie jest bezpieczne przy
+        uruchamianiu procesów z wielu wątków. Wątki, które ffmpeg tworzy po
+        zmianie, dziedziczą ustawienia.
+        """
+        if platform.system() == "Windows":
+            return
+        try:
+            if self.niceness:
+                priority = min(19, os.getpriority(os.PRIO_PROCESS, 0) + self.niceness)
+                os.setpriority(os.PRIO_PROCESS, pid, priority)
+            if self.cpu_affinity and hasattr(os, "sched_setaffinity"):
+                os.sched_setaffinity(pid, self.cpu_affinity)
+        except ProcessLookupError:
+            # Proces zdążył się zakończyć
+            pass
+        except OSError as e:
+            self.logger.warning(f"Could not apply process limits to pid {pid}: {str(e)}")
+
+    def run(self, args, input=None, capture_output=False, check=True, tool="ffmpeg"):
+        """
+        Uruchamia ffmpeg (lub ffprobe) z podanymi argumentami
+
+        Czeka na wolne miejsce w puli, jeśli działa już max_processes procesów.
+
+        :param args: Argumenty bez ścieżki programu
+        :param input: Dane przekazywane na stdin
+        :param capture_output: Czy zwrócić stdout/stderr
+        :param check: Czy zgłaszać CalledProcessError przy błędzie
+        :param tool: 'ffmpeg' lub 'ffprobe'
+        :return: subprocess.CompletedProcess
+        """
+        executable = self.ffprobe_path if tool == "ffprobe" else self.ffmpeg_path
+        command = [executable, *args]
+        output = subprocess.PIPE if capture_output else subprocess.DEVNULL
+        with self._slots:
+            self._count(tool)
+            process = subprocess.Popen(
+                command,
+                stdin=subprocess.PIPE if input is not None else None,
+                stdout=output,
+                stderr=output,
+                **self._process_options()
+            )
+            self._apply_limits(process.pid)
+            try:
+                stdout, stderr = process.communicate(input)
+            except BaseException:
+                process.kill()
+                process.wait()
+                raise
+        if check and process.returncode:
+            raise subprocess.CalledProcessError(process.returncode, command, stdout, stderr)
+        return subprocess.CompletedProcess(command, process.returncode, stdout, stderr)
+
+    @contextmanager
+    def open(self, args, stdin=False, stdout=False, tool="ffmpeg"):
+        """
+        Uruchamia ffmpeg jako proces strumieniowy (dane przez potoki stdin/stdout)
+
+        Proces nie zajmuje miejsca w puli: tempo wyznacza strona Pythona, która
+        czyta i zapisuje potoki, a dekoder i koder jednego strumienia muszą działać
+        jednocześnie. Po wyjściu z bloku czeka na zakończenie procesu.
+
+        :param args: Argumenty bez ścieżki programu
+        :param stdin: Czy otworzyć potok na stdin
+        :param stdout: Czy otworzyć potok na stdout
+        :raises CalledProcessError: Gdy proces zakończy się błędem
+        """
+        executable = self.ffprobe_path if tool == "ffprobe" else self.ffmpeg_path
+        self._count(tool)
+        process = subprocess.Popen(
+            [executable, *args],
+            stdin=subprocess.PIPE if stdin else subprocess.DEVNULL,
+            stdout=subprocess.PIPE if stdout else subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            **self._process_options()
+        )
+        self._apply_limits(process.pid)
+        try:
+            yield process
+        except BaseException:
+            process.kill()
+            process.wait()
+            raise
+        if process.stdin:
+            process.stdin.close()
+        if process.stdout:
+            process.stdout.close()
+        if process.wait() != 0:
+            raise subprocess.CalledProcessError(process.returncode, [executable, *args])
+
+    def probe(self, path):
+        """
+        Zwraca wynik ffprobe (format i strumienie) jako słownik
+
+        Wynik jest zapamiętywany dla ścieżki, rozmiaru i czasu modyfikacji pliku,
+        więc kolejne wywołania dla niezmienionego pliku nie uruchamiają ffprobe.
+
+        :raises RuntimeError: Gdy ffprobe nie może odczytać pliku
+        """
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            cached = self._probe_cache.get(key)
+            if cached is not None:
+                self.counters["probe_cache_hits"] += 1
+                return cached
+
+        try:
+            result = self.run(
+                ['-v', 'error', '-print_format', 'json', '-show_format', '-show_streams', path],
+                capture_output=True,
+                tool="ffprobe"
+            )
+            data = json.loads(result.stdout)
+        except (subprocess.CalledProcessError, ValueError) as e:
+            raise RuntimeError(f"Could not probe {os.path.basename(path)}: {str(e)}")
+
+        with self._lock:
+            self._probe_cache[key] = data
+        return data
@@ -0,0 +1,238 @@
+import os
+import logging
+import subprocess
+import numpy as np
+from core.ffmpeg_service import FFmpegService
+from core.media_info import MediaInfoService
+
+# Filtr K (ITU-R BS.1770) dla 48 kHz: półka wysokotonowa i filtr górnoprzepustowy RLB
+_K_SHELF = ([1.53512485958697, -2.69169618940638, 1.19839281085285], [1.0, -1.69065929318241, 0.73248077421585])
+_K_HIGHPASS = ([1.0, -2.0, 1.0], [1.0, -1.99004745483398, 0.99007225036621])
+_K_RATE = 48000
+
+
+def _biquad_power(coefficients, frequencies):
+    """|H(f)|^2 biquadu 48 kHz dla podanych częstotliwości"""
+    b, a = coefficients
+    z = np.exp(-1j * 2 * np.pi * np.minimum(frequencies, _K_RATE / 2) / _K_RATE)
+    numerator = b[0] + b[1] * z + b[2] * z ** 2
+    denominator = a[0] + a[1] * z + a[2] * z ** 2
+    return np.abs(numerator / denominator) ** 2
+
+
+def _to_lufs(power):
+    return -0.691 + 10 * np.log10(np.maximum(power, 1e-20))
+
+
+class LoudnessMeter:
+    """
+    Pomiar głośności wg ITU-R BS.1770 (LUFS) w stałej pamięci
+
+    Próbki dodawane są dowolnymi porcjami; licznik trzyma tylko moc ważoną
+    filtrem K każdego 100 ms odcinka (10 liczb na sekundę nagrania). Filtr K
+    jest stosowany w dziedzinie częstotliwości odcinka (twierdzenie Parsevala),
+    więc cały pomiar to kilka operacji wektorowych na porcję.
+    Bloki 400 ms z 75% nakładaniem powstają z czterech kolejnych odcinków,
+    a okno krótkoterminowe (3 s) z trzydziestu.
+    """
+    ABSOLUTE_GATE = -70.0
+    RELATIVE_GATE = -10.0
+
+    def __init__(self, sample_rate, channels=1):
+        """
+        :param sample_rate: Częstotliwość próbkowania
+        :param channels: Liczba kanałów (L/R/mono z wagą 1)
+        """
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sub_block = max(1, sample_rate // 10)
+        frequencies = np.fft.rfftfreq(self.sub_block, 1.0 / sample_rate)
+        weights = _biquad_power(_K_SHELF, frequencies) * _biquad_power(_K_HIGHPASS, frequencies)
+        # Parseval dla rfft: prążki poza DC (i Nyquistem przy parzystej długości) liczą się podwójnie
+        weights[1:] *= 2
+        if self.sub_block % 2 == 0:
+            weights[-1] /= 2
+        self._weights = (weights / self.sub_block ** 2).astype(np.float64)
+        self._powers = []
+        self._pending = np.zeros((channels, 0), dtype=np.float32)
+        self.peak = 0.0
+        self.samples = 0
+
+    def add(self, samples):
+        """
+        Dodaje próbki float32 o kształcie (kanały, próbki) lub (próbki,) dla mono
+        """
+        samples = np.asarray(samples, dtype=np.float32).reshape(self.channels, -1)
+        if not samples.shape[1]:
+            return
+        self.samples += samples.shape[1]
+        self.peak = max(self.peak, float(np.abs(samples).max()))
+        if self._pending.shape[1]:
+            samples = np.concatenate([self._pending, samples], axis=1)
+        count = samples.shape[1] // self.sub_block
+        if count:
+            blocks = samples[:, :count * self.sub_block].reshape(self.channels, count, self.sub_block)
+            spectrum = np.fft.rfft(blocks, axis=2)
+            power = (np.abs(spectrum) ** 2 @ self._weights).sum(axis=0)
+            self._powers.append(power)
+        self._pending = samples[:, count * self.sub_block:].copy()
+
+    def add_pcm(self, data):
+        """Dodaje przeplatane próbki s16le"""
+        samples = np.frombuffer(data[:len(data) // (2 * self.channels) * 2 * self.channels], dtype=np.int16)
+        self.add(samples.reshape(-1, self.channels).T.astype(np.float32) / 32768.0)
+
+    def _sub_block_powers(self):
+        powers = np.concatenate(self._powers) if self._powers else np.zeros(0)
+        if not len(powers) and self._pending.shape[1]:
+            # Nagranie krótsze niż odcinek: moc całości (bez filtra K)
+            powers = np.array([float((self._pending.astype(np.float64) ** 2).mean(axis=1).sum())])
+        return powers
+
+    def _window_powers(self, length):
+        """Średnia moc okien po length odcinków z krokiem jednego odcinka"""
+        powers = self._sub_block_powers()
+        if len(powers) < length:
+            return powers[:0] if len(powers) == 0 else np.array([powers.mean()])
+        cumulative = np.concatenate([[0.0], np.cumsum(powers)])
+        return (cumulative[length:] - cumulative[:-length]) / length
+
+    def integrated(self):
+        """Głośność zintegrowana (LUFS) z bramkowaniem bezwzględnym i względnym; None dla ciszy"""
+        blocks = self._window_powers(4)
+        blocks = blocks[_to_lufs(blocks) > self.ABSOLUTE_GATE]
+        if not len(blocks):
+            return None
+        relative_gate = _to_lufs(blocks.mean()) + self.RELATIVE_GATE
+        gated = blocks[_to_lufs(blocks) > relative_gate]
+        return float(_to_lufs(gated.mean() if len(gated) else blocks.mean()))
+
+    def short_term(self):
+        """Głośność krótkoterminowa (okno 3 s, krok 100 ms) jako tablica LUFS"""
+        return _to_lufs(self._window_powers(30))
+
+    @property
+    def true_peak_db(self):
+        """Szczyt próbek w dBFS (bez nadpróbkowania)"""
+        return 20 * np.log10(max(self.peak, 1e-10))
+
+
+class LoudnessNormalizer:
+    """
+    Pomiar i wyrównanie głośności klipów TTS, ścieżki dubbingu i plików
+
+    Pliki są dekodowane strumieniowo przez ffmpeg i mierzone porcjami, a
+    wzmocnienie stosowane jest jednym przebiegiem filtra volume, więc pamięć
+    nie zależy od długości nagrania.
+    """
+
+    def __init__(self, ffmpeg_path=None, ffprobe_path=None, logger=None, ffmpeg_service=None, media_info=None):
+        """
+        :param ffmpeg_path: Ścieżka do ffmpeg
+        :param ffprobe_path: Ścieżka do ffprobe
+        :param logger: Obiekt loggera (opcjonalny)
+        :param ffmpeg_service: Wspólny FFmpegService (opcjonalny)
+        :param media_info: Wspólny MediaInfoService (opcjonalny)
+        """
+        self.logger = logger or logging.getLogger(__name__)
+        self.ffmpeg_service = ffmpeg_service or FFmpegService(ffmpeg_path, ffprobe_path, logger=self.logger)
+        self.media_info = media_info or MediaInfoService(self.ffmpeg_service, logger=self.logger)
+        # Największa korekta wzmocnienia - cichy szum nie jest podbijany do poziomu mowy
+        self.max_gain_db = 20.0
+        # Szczyt próbek po korekcie nie przekracza tego poziomu
+        self.peak_ceiling_db = -1.0
+        self.chunk_seconds = 10
+
+    def gain_db(self, measured, target, peak_db=None):
+        """
+        Wzmocnienie (dB) doprowadzające pomiar do celu, z limitem korekty i szczytu
+
+        :param measured: Zmierzona głośność (LUFS) lub None dla ciszy
+        :param target: Docelowa głośność (LUFS)
+        :param peak_db: Szczyt próbek w dBFS (ogranicza wzmocnienie)
+        """
+        if measured is None:
+            return 0.0
+        gain = max(-self.max_gain_db, min(self.max_gain_db, target - measured))
+        if peak_db is not None:
+            gain = min(gain, self.peak_ceiling_db - peak_db)
+        return gain
+
+    def measure_pcm(self, data, sample_rate, channels=1):
+        """
+        Mierzy głośność bufora s16le
+
+        :return: LoudnessMeter z wynikiem
+        """
+        meter = LoudnessMeter(sample_rate, channels)
+        step = int(self.chunk_seconds * sample_rate) * 2 * channels
+        view = memoryview(data)
+        for start in range(0, len(view), step):
+            meter.add_pcm(view[start:start + step])
+        return meter
+
+    def apply_gain_pcm(self, data, gain_db):
+        """
+        Mnoży próbki s16le przez wzmocnienie (porcjami, z przycięciem do zakresu)
+
+        :param data: bytes lub bytearray; bytearray jest zmieniany w miejscu
+        :return: Bufor z zastosowanym wzmocnieniem
+        """
+        if abs(gain_db) < 0.05:
+            return data
+        buffer = data if isinstance(data, bytearray) else bytearray(data)
+        samples = np.frombuffer(buffer, dtype=np.int16)
+        factor = 10 ** (gain_db / 20)
+        step = int(self.chunk_seconds * 48000)
+        for start in range(0, len(samples), step):
+            chunk = samples[start:start + step]
+            chunk[:] = np.clip(chunk.astype(np.float32) * factor, -32768, 32767).astype(np.int16)
+        return buffer
+
+    def normalize_pcm(self, data, sample_rate, target, channels=1):
+        """
+        Doprowadza bufor s16le do docelowej głośności
+
+        :return: (bufor, zmierzona głośność, zastosowane wzmocnienie dB)
+        """
+        meter = self.measure_pcm(data, sample_rate, channels)
+        measured = meter.integrated()
+        gain = self.gain_db(measured, target, meter.true_peak_db)
+        return self.apply_gain_pcm(data, gain), measured, gain
+
+    def measure_file(self, path, max_channels=2):
+        """
+        Mierzy głośność pierwszej ścieżki audio pliku, dekodując ją strumieniowo
+
+        :return: LoudnessMeter z wynikiem
+        :raises RuntimeError: Gdy plik nie ma audio lub ffmpeg zakończy się błędem
+        """
+        info = self.media_info.get(path)
+        if not info.audio:
+            raise RuntimeError(f"No audio stream in {os.path.basename(path)}")
+        sample_rate = info.audio.sample_rate or 48000
+        channels = max(1, min(max_channels, info.audio.channels or 1))
+        meter = LoudnessMeter(sample_rate, channels)
+        step = int(self.chunk_seconds * sample_rate) * 2 * channels
+        try:
+            with self.ffmpeg_service.open(
+                ['-i', path, '-map', '0:a:0', '-vn', '-f', 's16le', '-acodec', 'pcm_s16le',
+                 '-ar', str(sample_rate), '-ac', str(channels), 'pipe:1'],
+                stdout=True
+            ) as decoder:
+                while True:
+                    data = decoder.stdout.read(step)
+                    if not data:
+                        break
+                    meter.add_pcm(data)
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f"Could not measure loudness of {os.path.basename(path)}: {e}")
+        integrated = meter.integrated()
+        short_term = meter.short_term()
+        self.logger.info(
+            f"Loudness {os.path.basename(path)}: "
+            f"{'silence' if integrated is None else f'{integrated:.1f} LUFS'}"
+            f"{f', short-term max {short_term.max():.1f} LUFS' if len(short_term) else ''}, "
+            f"peak {meter.true_peak_db:.1f} dBFS"
+        )
+        return meter
@@ -2,20 +2,36 @@ import os
 import math
 import re
 import glob
-import pysrt
+import time
 import logging
+import threading
 import platform
+import tempfile
 import subprocess
 import argostranslate.package
 import argostranslate.translate
+from concurrent.futures import ThreadPoolExecutor
 from pydub import AudioSegment
 from core.youtube_downloader import YouTubeDownloader
+from core.download_manager import DownloadManager
+from core.batch_queue import BatchJobQueue, DownloadArchive
 from core.audio_extractor import AudioExtractor
 from core.audio_transcriber import AudioTranscriber
 from core.audio_generator import AudioGenerator
 from core.audio_replacer import AudioReplacer
+from core.source_separator import SourceSeparator
+from core.loudness import LoudnessNormalizer
+from core.speaker_diarizer import SpeakerDiarizer
 from core.subtitle_burner import SubtitleBurner
 from core.logging_manager import LoggingManager
+from core.subtitle_cues import CueTable
+from core.artifact_registry import ArtifactRegistry
+from core.disk_planner import DiskPlanner
+from core.ffmpeg_service import FFmpegService
+from core.media_info import MediaInfoService
+from core.sentence_segmenter import SentenceSegmenter
+from core.translation_pool import TranslationPool
+from core.translation_router import TranslationRouter
 
 class VideoTranslator:
     def __init__(self):
@@ -30,18 +46,98 @@ class VideoTranslator:
         self.ffprobe_path = self._get_ffmpeg_path("ffprobe")
         
         self.downloader = YouTubeDownloader(ffmpeg_path=self.ffmpeg_path, logger=self.logger)
-        self.audio_extractor = AudioExtractor(ffmpeg_path=self.ffmpeg_path, ffprobe_path=self.ffprobe_path, logger=self.logger)
-        self.transcriber = AudioTranscriber(model_size="small", device="cpu", compute_type="int8", logger=self.logger)
-        self.audio_generator = AudioGenerator(ffmpeg_path=self.ffmpeg_path, ffprobe_path=self.ffprobe_path, logger=self.logger)
-        self.audio_replacer = AudioReplacer(ffmpeg_path=self.ffmpeg_path, ffprobe_path=self.ffprobe_path, logger=self.logger)
-        self.subtitle_burner = SubtitleBurner(ffmpeg_path=self.ffmpeg_path, ffprobe_path=self.ffprobe_path, logger=self.logger)
+        self.download_manager = DownloadManager(
+            self.downloader,
+            cache_dir=os.path.join(self.script_dir, 'download_cache'),
+            concurrent_fragments=4,
+            logger=self.logger
+        )
+        # Wszystkie procesy ffmpeg/ffprobe przechodzą przez jedną pulę o niższym priorytecie
+        self.ffmpeg_service = FFmpegService(self.ffmpeg_path, self.ffprobe_path, niceness=5, logger=self.logger)
+        # Parametry każdego pliku odczytywane raz i współdzielone przez etapy
+        self.media_info = MediaInfoService(self.ffmpeg_service, logger=self.logger)
+        media_options = dict(
+            ffmpeg_path=self.ffmpeg_path, ffprobe_path=self.ffprobe_path,
+            logger=self.logger, ffmpeg_service=self.ffmpeg_service, media_info=self.media_info
+        )
+        self.audio_extractor = AudioExtractor(**media_options)
+        self.transcriber = AudioTranscriber(
+            model_size="small", device="cpu", compute_type="int8",
+            logger=self.logger, ffmpeg_service=self.ffmpeg_service
+        )
+        self.diarizer = SpeakerDiarizer(logger=self.logger, ffmpeg_service=self.ffmpeg_service)
+        self.audio_generator = AudioGenerator(
+            ffmpeg_path=self.ffmpeg_path, ffprobe_path=self.ffprobe_path,
+            logger=self.logger, ffmpeg_service=self.ffmpeg_service
+        )
+        self.audio_replacer = AudioReplacer(**media_options)
+        self.source_separator = SourceSeparator(**media_options)
+        # Oddzielenie muzyki i efektów od głosu lektora i zmiksowanie ich z dubbingiem
+        self.separate_background = False
+        # Głośność dubbingu dopasowana do zmierzonej głośności oryginału (LUFS),
+        # a gdy pomiar jest niedostępny - dub_loudness_target
+        self.loudness = LoudnessNormalizer(**media_options)
+        self.match_program_loudness = True
+        self.dub_loudness_target = -16.0
+        self.subtitle_burner = SubtitleBurner(**media_options)
+        # Długie filmy wypalane równolegle fragmentami między klatkami kluczowymi
+        self.subtitle_burner.chunk_workers = min(4, self.ffmpeg_service.max_processes)
         
         # Rest of initialization
         self.temp_folder = None
+        # Katalog roboczy dla plików pośrednich (np. tmpfs lub lokalny NVMe);
+        # None = pliki pośrednie w folderze zadania obok wyników
+        self.scratch_dir = None
+        self.work_folder = None
         self.clean_temp_files = True
-        self.temp_files_to_keep = set()
-        self.temp_folders = set()
+        self.artifacts = ArtifactRegistry(logger=self.logger)
+        self.subtitle_burner.artifacts = self.artifacts
+        self.subtitle_burner.chunk_cache_dir = self._burn_cache_dir()
+        # Usuwanie plików pośrednich etapu zaraz po tym, jak przestają być potrzebne
+        self.release_intermediates = False
+        # Planowanie miejsca na dysku na podstawie parametrów źródła
+        self.disk_planner = DiskPlanner(self.media_info, logger=self.logger)
+        self.disk_reservation = None
+        self._low_disk_job = False
+        # Format plików pośrednich audio: 'wav', 'flac' lub 'pcm' (dubbing w pamięci;
+        # ekstrakcja używa wtedy FLAC, bo Whisper czyta nagranie z pliku)
+        self.intermediate_audio_format = "flac"
         self.cancel_process = False
+        self.job_stats = {}
+        self._ffmpeg_counters = {}
+        
+        # Opcje transkrypcji: pomijanie ciszy (VAD) i znaczniki czasu słów
+        self.vad_filter = True
+        self.word_timestamps = False
+        # Diaryzacja mówców po transkrypcji - osobny głos TTS dla każdego mówcy
+        self.diarize_speakers = False
+        # Profil dekodowania: 'beam', 'greedy' lub 'adaptive'
+        self.decoding_profile = "adaptive"
+        # Wykrywanie języka na krótkiej próbce, gdy użytkownik wybrał 'Auto-detect'
+        self.auto_detect_label = "Auto-detect"
+        self.language_detect_seconds = 30
+        # Kontrola wybranego języka źródłowego dodatkowym wykrywaniem na próbce (opcjonalna,
+        # kosztuje osobny przebieg enkodera)
+        self.verify_source_language = False
+        
+        # Łączenie fragmentów Whispera w zdania przed tłumaczeniem
+        self.resegment_sentences = True
+        self.sentence_segmenter = SentenceSegmenter()
+        
+        # Równoległe tłumaczenie: 1 = w bieżącym wątku, >1 = pula procesów na parę językową
+        self.translation_workers = 1
+        self.translation_threads_per_worker = 1
+        self.translation_pool_min_texts = 200
+        self.translation_pools = {}
+        self.translation_router = TranslationRouter(logger=self.logger)
+        
+        # YouTube: najpierw sama ścieżka audio, wideo pobierane w tle
+        self.two_track_download = True
+        
+        # Playlisty i kanały: równoległe pobieranie, przetwarzanie po jednym filmie
+        self.batch_download_concurrency = 2
+        self.download_archive = DownloadArchive(os.path.join(self.script_dir, 'download_cache', 'archive.txt'))
+        self._job_lock = threading.Lock()
         
         # Definicja etapów przetwarzania i ich wag
         self.progress_stages = {
@@ -56,8 +152,6 @@ class VideoTranslator:
         AudioSegment.converter = self.ffmpeg_path
         AudioSegment.ffprobe = self.ffprobe_path
         
-        self._register_temp_patterns()
-        
         self.language_codes = {
             "English": "en",
             "Polish": "pl",
@@ -71,19 +165,6 @@ class VideoTranslator:
             "Portuguese": "pt"
         }
         
-        self.edge_tts_voices = {
-            "en": "en-US-GuyNeural",
-            "pl": "pl-PL-MarekNeural",
-            "es": "es-ES-AlvaroNeural",
-            "fr": "fr-FR-HenriNeural",
-            "de": "de-DE-ConradNeural",
-            "it": "it-IT-DiegoNeural",
-            "ja": "ja-JP-NanjoNeural",
-            "ru": "ru-RU-DmitryNeural",
-            "zh": "zh-CN-YunxiNeural",
-            "pt": "pt-BR-AntonioNeural"
-        }
-
         self._initialize_translation()
         self._log_system_info()
 
@@ -137,20 +218,6 @@ class VideoTranslator:
             self.log_with_emoji(f"Translation initialization error: {str(e)}", logging.ERROR, 'ERROR')
             self.installed_languages = []
 
-    def _register_temp_patterns(self):
-        """Rejestruje wzorce nazw plików tymczasowych do czyszczenia"""
-        self.temp_file_patterns = [
-            r'.*_extracted_audio\.(wav|mp3)$',
-            r'.*_subtitles\.srt$',
-            r'.*_subtitles_(?:pl|en|ru|es|fr|de|it|ja|zh|pt)\.srt$',
-            r'.*_translated_audio\.(wav|mp3)$',
-            r'temp_\d+\.(mp3|wav)$',
-            r'.*temp_.*',
-            r'^tmp.*',
-            r'.*\.temp$',
-            r'ffmpeg_temp\.\w+'
-        ]
-
     def _get_ffmpeg_path(self, executable):
         if platform.system() == "Windows":
             executable += ".exe"
@@ -176,90 +243,28 @@ class VideoTranslator:
         self.log_with_emoji(f"Found {executable} at: {path}", emoji_type='SETTINGS')
         return path
 
-    def _register_temp_file(self, file_path):
-        if file_path and os.path.exists(file_path):
-            self.temp_files_to_keep.discard(file_path)
-            base_name = os.path.basename(file_path)
-            for pattern in self.temp_file_patterns:
-                if re.match(pattern, base_name):
-                    self.temp_files_to_keep.discard(file_path)
-                    break
+    def _register_temp_file(self, file_path, stage=None):
+        """Rejestruje plik pośredni etapu do późniejszego usunięcia"""
+        # Dubbing w trybie 'pcm' jest obiektem w pamięci, a nie plikiem
+        if isinstance(file_path, str) and os.path.exists(file_path):
+            self.artifacts.register(file_path, ArtifactRegistry.TEMP, stage)
 
     def _keep_temp_file(self, file_path):
         if file_path and os.path.exists(file_path):
-            self.temp_files_to_keep.add(file_path)
-            self.log_with_emoji(f"Keeping temporary file: {os.path.basename(file_path)}", emoji_type='FILE')
+            self.artifacts.keep(file_path)
+
+    def _release_stage(self, stage):
+        """Zwalnia pliki etapu od razu, jeśli włączono tryb oszczędzania miejsca"""
+        if (self.release_intermediates or self._low_disk_job) and self.clean_temp_files:
+            self.artifacts.release(stage)
 
-    def _clean_temp_files(self):
+    def _clean_temp_files(self, background=False):
         if not self.clean_temp_files:
             self.log_with_emoji("Skipping temp files cleanup (disabled in settings)", emoji_type='CLEANUP')
             return
-
-        if not self.temp_folder or not os.path.exists(self.temp_folder):
-            self.log_with_emoji("No temp folder to clean", emoji_type='CLEANUP')
-            return
-
-        try:
-            self.log_with_emoji("Starting temp files cleanup...", emoji_type='CLEANUP')
-            
-            deleted_files = 0
-            deleted_folders = 0
-            
-            specific_patterns = [
-                "*_extracted_audio.*",
-                "*_subtitles.srt",
-                "*_subtitles_*.srt",
-                "*_translated_audio.*"
-            ]
-            
-            for pattern in specific_patterns:
-                for file in glob.glob(os.path.join(self.temp_folder, pattern)):
-                    if file not in self.temp_files_to_keep:
-                        try:
-                            os.remove(file)
-                            deleted_files += 1
-                            self.log_with_emoji(f"Deleted temp file: {os.path.basename(file)}", emoji_type='FILE')
-                        except Exception as e:
-                            self.log_with_emoji(f"Error deleting {file}: {str(e)}", logging.WARNING)
-            
-            for root, dirs, files in os.walk(self.temp_folder, topdown=False):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    if file_path not in self.temp_files_to_keep:
-                        try:
-                            file_match = any(
-                                re.fullmatch(pattern, file) 
-                                for pattern in self.temp_file_patterns
-                            )
-                            if file_match or "temp" in file.lower() or "tmp" in file.lower():
-                                os.remove(file_path)
-                                deleted_files += 1
-                                self.log_with_emoji(f"Deleted temp file: {file}", emoji_type='FILE')
-                        except Exception as e:
-                            self.log_with_emoji(f"Error deleting file {file}: {str(e)}", logging.WARNING)
-                
-                try:
-                    if not os.listdir(root):
-                        os.rmdir(root)
-                        deleted_folders += 1
-                        self.log_with_emoji(f"Deleted empty folder: {root}", emoji_type='CLEANUP')
-                except Exception as e:
-                    self.log_with_emoji(f"Error deleting folder {root}: {str(e)}", logging.WARNING)
-
-            self.log_with_emoji(f"Cleanup complete. Deleted {deleted_files} files and {deleted_folders} folders", emoji_type='COMPLETE')
-
-        except Exception as e:
-            self.log_with_emoji(f"Cleanup error: {str(e)}", logging.ERROR, 'ERROR')
-
-    def _clean_empty_folders(self):
-        for folder in list(self.temp_folders):
-            try:
-                if os.path.exists(folder) and not os.listdir(folder):
-                    os.rmdir(folder)
-                    self.temp_folders.remove(folder)
-                    self.log_with_emoji(f"Deleted empty temp folder: {folder}", emoji_type='CLEANUP')
-            except Exception as e:
-                self.log_with_emoji(f"Error deleting folder {folder}: {str(e)}", logging.WARNING)
+        
+        self.log_with_emoji("Starting temp files cleanup...", emoji_type='CLEANUP')
+        self.artifacts.cleanup(background=background)
 
     def _create_output_folder(self, base_path):
         base_name = os.path.splitext(os.path.basename(base_path))[0]
@@ -276,34 +281,121 @@ class VideoTranslator:
             counter += 1
         
         os.makedirs(self.temp_folder, exist_ok=True)
-        self.temp_folders.add(self.temp_folder)
+        self.artifacts.register_folder(self.temp_folder)
         self.log_with_emoji(f"Created output folder: {self.temp_folder}", emoji_type='FILE')
+        self._create_work_folder()
         return self.temp_folder
 
+    def _create_work_folder(self):
+        """Tworzy katalog roboczy zadania w scratch_dir (lub używa folderu zadania)"""
+        # Fragmenty wypalania przeżywają zadanie (wznawianie), więc leżą poza katalogiem roboczym
+        self.subtitle_burner.chunk_cache_dir = self._burn_cache_dir()
+        if not self.scratch_dir:
+            self.work_folder = self.temp_folder
+            return self.work_folder
+        
+        os.makedirs(self.scratch_dir, exist_ok=True)
+        self.work_folder = tempfile.mkdtemp(prefix=f"{os.path.basename(self.temp_folder)}_", dir=self.scratch_dir)
+        self.artifacts.register_folder(self.work_folder)
+        self.log_with_emoji(f"Scratch folder for intermediates: {self.work_folder}", emoji_type='FILE')
+        return self.work_folder
+
+    def _burn_cache_dir(self):
+        """Katalog fragmentów wypalania napisów (w scratch_dir, jeśli jest ustawiony)"""
+        return os.path.join(self.scratch_dir or self.script_dir, 'burn_cache')
+
+    def _work_path(self, source_path, suffix):
+        """Ścieżka pliku pośredniego w katalogu roboczym, nazwana od pliku źródłowego"""
+        return os.path.join(self.work_folder, f"{os.path.splitext(os.path.basename(source_path))[0]}{suffix}")
+
+    def _publish_output(self, path, destination):
+        """Przenosi gotowy wynik do folderu zadania atomową zmianą nazwy"""
+        return self.artifacts.publish(path, destination)
+
     def _clean_filename(self, filename):
         return re.sub(r'[\\/*?:"<>|#]', "", filename)
 
-    def _check_disk_space(self, path, required_gb=2):
+    def _reserve_disk_space(self, path, media, add_subtitles=False, download=False):
+        """
+        Szacuje miejsce potrzebne zadaniu i rezerwuje je przed startem
+
+        Przy małej ilości miejsca włącza tryb oszczędny (zwalnianie plików etapów
+        od razu); gdy i on się nie zmieści, przerywa zadanie przed pobraniem.
+        """
+        burner = self.subtitle_burner
+        plan = self.disk_planner.plan(
+            media, add_subtitles=add_subtitles, download=download, audio_format=self.intermediate_audio_format,
+            separate=self.separate_background, audio_bitrate=self.audio_replacer.audio_bitrate,
+            two_track=download and self.two_track_download,
+            chunked_burn=burner.chunk_workers > 1 and media.duration >= 2 * burner.chunk_seconds
+        )
+        # Pliki pośrednie i rendery powstają w scratch_dir, pobrane pliki w pamięci podręcznej -
+        # każde z tych miejsc może być na innym dysku niż wyniki
+        self.disk_reservation = self.disk_planner.reserve(path, plan, {
+            DiskPlanner.SCRATCH: self.scratch_dir,
+            DiskPlanner.DOWNLOAD_CACHE: self.download_manager.cache.cache_dir,
+            DiskPlanner.CHUNK_CACHE: self._burn_cache_dir()
+        })
+        self._low_disk_job = plan.mode == "low_disk"
+        self.job_stats['disk_mode'] = plan.mode
+        self.job_stats['disk_reserved'] = f"{self.disk_reservation.size / (1024 ** 3):.2f}GB"
+
+    def _separate_background(self, source_path, cues):
+        """
+        Tworzy ścieżkę tła bez głosu lektora, jeśli włączono separate_background
+
+        :return: Ścieżka akompaniamentu lub None (wyłączone albo separacja się nie udała)
+        """
+        if not self.separate_background:
+            return None
+        stem_format = "wav" if self.intermediate_audio_format == "wav" else "flac"
         try:
-            if platform.system() == "Windows":
-                import ctypes
-                free_bytes = ctypes.c_ulonglong(0)
-                ctypes.windll.kernel32.GetDiskFreeSpaceExW(
-                    ctypes.c_wchar_p(path), None, None, ctypes.pointer(free_bytes))
-                free_gb = free_bytes.value / (1024 ** 3)
-            else:
-                stat = os.statvfs(path)
-                free_gb = (stat.f_bavail * stat.f_frsize) / (1024 ** 3)
-            
-            self.log_with_emoji(f"Disk space check: {free_gb:.2f}GB free (required: {required_gb}GB)", emoji_type='SETTINGS')
-            
-            if free_gb < required_gb:
-                self.log_with_emoji(f"Insufficient disk space. Required: {required_gb}GB, Available: {free_gb:.2f}GB", logging.ERROR, 'ERROR')
-                raise RuntimeError(
-                    f"Insufficient disk space. Required: {required_gb}GB, Available: {free_gb:.2f}GB"
-                )
-        except Exception as e:
-            self.log_with_emoji(f"Disk space check failed: {str(e)}", logging.WARNING)
+            stem_path = self.source_separator.separate(
+                source_path, self._work_path(source_path, f"_background.{stem_format}"), cues, stem_format
+            )
+        except RuntimeError as e:
+            self.log_with_emoji(f"Background separation failed, using original audio: {str(e)}", logging.WARNING)
+            return None
+        self._register_temp_file(stem_path, 'separate')
+        return stem_path
+
+    def _measure_program_loudness(self, source_path):
+        """Mierzy w tle głośność oryginału; zwraca Future lub None, gdy dopasowanie jest wyłączone"""
+        if not self.match_program_loudness:
+            return None
+        executor = ThreadPoolExecutor(max_workers=1)
+        future = executor.submit(self.loudness.measure_file, source_path)
+        executor.shutdown(wait=False)
+        return future
+
+    def _dub_loudness(self, loudness_future):
+        """Docelowa głośność dubbingu (LUFS) z pomiaru oryginału"""
+        if loudness_future is None:
+            return self.dub_loudness_target
+        try:
+            measured = loudness_future.result().integrated()
+        except RuntimeError as e:
+            self.log_with_emoji(f"Program loudness unavailable: {str(e)}", logging.WARNING)
+            return self.dub_loudness_target
+        if measured is None:
+            return self.dub_loudness_target
+        self.job_stats['program_loudness'] = f"{measured:.1f} LUFS"
+        # Bardzo ciche lub przesterowane źródła nie wyznaczają skrajnego poziomu dubbingu
+        return max(-31.0, min(-10.0, measured))
+
+    def _release_disk_reservation(self):
+        if self.disk_reservation:
+            self.disk_reservation.release()
+            self.disk_reservation = None
+        self._low_disk_job = False
+
+    def _log_job_stats(self):
+        """Loguje metryki zebrane podczas zadania"""
+        for key, value in self.ffmpeg_service.snapshot().items():
+            self.job_stats[f"{key}_spawned" if key != "probe_cache_hits" else key] = value - self._ffmpeg_counters.get(key, 0)
+        if self.job_stats:
+            stats = ", ".join(f"{key}={value}" for key, value in self.job_stats.items())
+            self.log_with_emoji(f"Job stats: {stats}", emoji_type='SYSTEM')
 
     def format_time(self, seconds):
         hours = math.floor(seconds / 3600)
@@ -314,24 +406,44 @@ class VideoTranslator:
         seconds = math.floor(seconds)
         return f"{hours:02d}:{minutes:02d}:{seconds:02d},{milliseconds:03d}"
 
-    def download_youtube_video(self, youtube_url, output_path, quality='best', progress_callback=None):
+    def download_youtube_video(self, youtube_url, output_path, quality='best', progress_callback=None, fmt=None, output_folder=None,
+                               track=None):
+        """
+        Pobiera wideo (lub pojedynczą ścieżkę) i przenosi je do folderu zadania
+
+        :param fmt: Własny selektor formatu yt-dlp (np. tylko audio)
+        :param output_folder: Istniejący folder zadania; domyślnie tworzony na podstawie nazwy pliku
+        :param track: Przyrostek nazwy pliku ('audio' lub 'video') przy pobieraniu dwóch
+                      ścieżek - bez niego pliki o tym samym rozszerzeniu nadpisałyby się
+                      w folderze zadania, gdy nie ma osobnego katalogu roboczego
+        """
         try:
             if progress_callback:
                 progress_callback(0, 'download')
                 
             self.log_with_emoji(f"Starting download: {youtube_url}", emoji_type='DOWNLOAD', stage='download')
             
-            video_path = self.downloader.download(
+            video_path = self.download_manager.download(
                 youtube_url, 
                 output_path, 
                 quality=quality,
-                progress_callback=lambda p: progress_callback(p, 'download') if progress_callback else None
+                progress_callback=lambda p: progress_callback(p, 'download') if progress_callback else None,
+                fmt=fmt
             )
             
-            output_folder = self._create_output_folder(video_path)
-            new_path = os.path.join(output_folder, os.path.basename(video_path))
-            os.rename(video_path, new_path)
-            self._keep_temp_file(new_path)
+            output_folder = output_folder or self._create_output_folder(video_path)
+            file_name = os.path.basename(video_path)
+            if track:
+                stem, ext = os.path.splitext(file_name)
+                file_name = f"{stem}_{track}{ext}"
+            if fmt == self.downloader.audio_only_format:
+                # Sama ścieżka audio jest potrzebna tylko do ekstrakcji - trafia do katalogu roboczego
+                new_path = self.artifacts.publish(
+                    video_path, os.path.join(self.work_folder, file_name),
+                    ArtifactRegistry.TEMP, 'download'
+                )
+            else:
+                new_path = self._publish_output(video_path, os.path.join(output_folder, file_name))
             
             if progress_callback:
                 progress_callback(100, 'download')
@@ -345,45 +457,68 @@ class VideoTranslator:
             self.log_with_emoji(f"Download failed: {str(e)}", logging.ERROR, 'ERROR')
             raise RuntimeError(f"Failed to download video: {e}")
 
-    def transcribe(self, audio_path, progress_callback=None):
+    def transcribe(self, audio_path, progress_callback=None, language=None):
         """
         Publiczna metoda transkrypcji dla VideoTranslator
         Deleguje zadanie do AudioTranscriber
+
+        Jeśli użytkownik wybrał język źródłowy, jest on wymuszany w Whisperze.
+        W przeciwnym razie język wykrywany jest na krótkiej próbce. Przy włączonym
+        verify_source_language wybrany język jest dodatkowo porównywany z wykrytym.
+        """
+        if language and self.verify_source_language:
+            detected, probability = self.transcriber.detect_language(audio_path, self.language_detect_seconds)
+            if detected != language:
+                self.job_stats['language_mismatch'] = f"{language}!={detected}"
+                self.log_with_emoji(
+                    f"Selected source language '{language}' differs from detected '{detected}' (p={probability:.2f})",
+                    logging.WARNING, stage='transcribe'
+                )
+        
+        result = self.transcriber.transcribe(
+            audio_path,
+            progress_callback=progress_callback,
+            vad_filter=self.vad_filter,
+            word_timestamps=self.word_timestamps,
+            decoding=self.decoding_profile,
+            language=language,
+            detect_sample_seconds=self.language_detect_seconds
+        )
+        stats = self.transcriber.last_stats
+        self.job_stats['transcribe_segments'] = stats.get('segments', 0)
+        self.job_stats['transcribe_fallback_segments'] = stats.get('fallback_segments', 0)
+        self.job_stats['source_language'] = f"{stats.get('language')} ({stats.get('language_source')})"
+        
+        if self.diarize_speakers:
+            try:
+                self.job_stats['speakers'] = self.diarizer.diarize(audio_path, result[1])
+                self.job_stats['diarize_time'] = f"{self.diarizer.last_stats['time']:.1f}s"
+            except RuntimeError as e:
+                self.log_with_emoji(f"Speaker diarization failed, using a single voice: {str(e)}", logging.WARNING, stage='transcribe')
+        return result
+
+    def generate_subtitle_file(self, language, segments, output_path, suffix=""):
         """
-        return self.transcriber.transcribe(audio_path, progress_callback=progress_callback)
+        Zapisuje napisy do pliku SRT w folderze zadania
 
-    def generate_subtitle_file(self, language, segments, output_path):
+        :param language: Kod języka napisów
+        :param segments: CueTable lub lista segmentów z transkrypcji
+        :param output_path: Ścieżka pliku wideo, od której pochodzi nazwa napisów
+        :param suffix: Dodatkowy przyrostek nazwy (np. '_pl' dla tłumaczenia)
+        :return: Ścieżka do pliku SRT
+        """
         try:
+            cues = segments if isinstance(segments, CueTable) else CueTable.from_segments(segments, language)
             base_name = os.path.splitext(os.path.basename(output_path))[0]
-            subtitle_file = os.path.join(self.temp_folder, f"{base_name}_subtitles.srt")
+            subtitle_file = os.path.join(self.work_folder, f"{base_name}_subtitles{suffix}.srt")
             
             self.log_with_emoji("Generating subtitle file...", emoji_type='SUBTITLES', stage='transcribe')
             self.log_with_emoji(f"Output file: {os.path.basename(subtitle_file)}", emoji_type='FILE', stage='transcribe')
             self.log_with_emoji(f"Language: {language}", emoji_type='SUBTITLES', stage='transcribe')
-            self.log_with_emoji(f"Segments to process: {len(segments)}", emoji_type='SUBTITLES', stage='transcribe')
-            
-            subs = pysrt.SubRipFile()
-            
-            for index, segment in enumerate(segments):
-                sub = pysrt.SubRipItem()
-                sub.index = index + 1
-                
-                def seconds_to_time(seconds):
-                    hours = int(seconds // 3600)
-                    seconds %= 3600
-                    minutes = int(seconds // 60)
-                    seconds %= 60
-                    sec = int(seconds)
-                    milliseconds = int((seconds - sec) * 1000)
-                    return pysrt.SubRipTime(hours, minutes, sec, milliseconds)
-                
-                sub.start = seconds_to_time(segment["start"])
-                sub.end = seconds_to_time(segment["end"])
-                sub.text = segment["text"]
-                subs.append(sub)
+            self.log_with_emoji(f"Segments to process: {len(cues)}", emoji_type='SUBTITLES', stage='transcribe')
             
-            subs.save(subtitle_file, encoding='utf-8')
-            self._register_temp_file(subtitle_file)
+            cues.save_srt(subtitle_file)
+            self._register_temp_file(subtitle_file, 'translate' if suffix else 'transcribe')
             
             self.log_with_emoji(f"Subtitle file generated: {os.path.basename(subtitle_file)}", emoji_type='COMPLETE', stage='transcribe')
             self.log_with_emoji(f"File size: {os.path.getsize(subtitle_file)/(1024):.2f}KB", emoji_type='FILE', stage='transcribe')
@@ -392,140 +527,201 @@ class VideoTranslator:
             self.log_with_emoji(f"Subtitle generation error: {str(e)}", logging.ERROR, 'ERROR')
             raise RuntimeError(f"Failed to generate subtitles: {e}")
 
-    def translate_subtitles(self, subtitle_path, from_lang, to_lang, progress_callback=None):
+    def translate_subtitles(self, cues, from_lang, to_lang, progress_callback=None):
+        """
+        Tłumaczy napisy w pamięci
+
+        :param cues: CueTable (lub ścieżka do pliku SRT)
+        :param from_lang: Kod języka źródłowego
+        :param to_lang: Kod języka docelowego
+        :param progress_callback: Funkcja callback do raportowania postępu
+        :return: Nowa CueTable z przetłumaczonym tekstem
+        """
         try:
             if progress_callback:
                 progress_callback(0, 'translate')
                 
-            subs = pysrt.open(subtitle_path)
+            if not isinstance(cues, CueTable):
+                cues = CueTable.from_srt(cues, from_lang)
             
-            if not self.installed_languages:
-                self._initialize_translation()
+            if from_lang == to_lang:
+                self.log_with_emoji(f"Source and target language are both '{to_lang}', skipping translation", logging.WARNING, stage='translate')
+                if progress_callback:
+                    progress_callback(100, 'translate')
+                return cues.with_texts(cues.texts, to_lang)
             
             self.log_with_emoji(f"Starting translation from {from_lang} to {to_lang}...", emoji_type='TRANSLATE', stage='translate')
-            self.log_with_emoji(f"Input file: {os.path.basename(subtitle_path)}", emoji_type='FILE', stage='translate')
-            self.log_with_emoji(f"Segments to translate: {len(subs)}", emoji_type='TRANSLATE', stage='translate')
+            self.log_with_emoji(f"Segments to translate: {len(cues)}", emoji_type='TRANSLATE', stage='translate')
             
-            from_lang_obj = next(
-                (lang for lang in self.installed_languages if lang.code == from_lang),
-                None
-            )
-            to_lang_obj = next(
-                (lang for lang in self.installed_languages if lang.code == to_lang),
-                None
-            )
-            
-            if not from_lang_obj or not to_lang_obj:
-                self.log_with_emoji(f"No installed translation from {from_lang} to {to_lang}. Attempting installation...", logging.WARNING)
-                argostranslate.package.update_package_index()
-                available_packages = argostranslate.package.get_available_packages()
-                package_to_install = next(
-                    (pkg for pkg in available_packages 
-                     if pkg.from_code == from_lang and pkg.to_code == to_lang),
-                    None
-                )
-                
-                if package_to_install:
-                    self.log_with_emoji(f"Installing translation package: {from_lang} -> {to_lang}", emoji_type='SETTINGS', stage='translate')
-                    argostranslate.package.install_from_path(package_to_install.download())
-                    self._initialize_translation()
-                    
-                    from_lang_obj = next(
-                        (lang for lang in self.installed_languages if lang.code == from_lang),
-                        None
-                    )
-                    to_lang_obj = next(
-                        (lang for lang in self.installed_languages if lang.code == to_lang),
-                        None
-                    )
-            
-            if not from_lang_obj or not to_lang_obj:
-                if progress_callback:
-                    progress_callback(-1, 'translate', f"No translation from {from_lang} to {to_lang}")
-                self.log_with_emoji(f"No available translation from {from_lang} to {to_lang}", logging.ERROR, 'ERROR')
-                raise RuntimeError(f"No translation installed from {from_lang} to {to_lang}")
-            
-            translation = from_lang_obj.get_translation(to_lang_obj)
-            if not translation:
+            try:
+                route = self.translation_router.get_route(from_lang, to_lang)
+            except Exception as e:
                 if progress_callback:
-                    progress_callback(-1, 'translate', f"Could not create translation from {from_lang} to {to_lang}")
-                self.log_with_emoji(f"Could not create translation from {from_lang} to {to_lang}", logging.ERROR, 'ERROR')
-                raise RuntimeError(f"Could not create translation from {from_lang} to {to_lang}")
+                    progress_callback(-1, 'translate', str(e))
+                self.log_with_emoji(f"No available translation from {from_lang} to {to_lang}: {str(e)}", logging.ERROR, 'ERROR')
+                raise
+            self.log_with_emoji(f"Translation route: {route}", emoji_type='TRANSLATE', stage='translate')
+            
+            if self.resegment_sentences:
+                groups = self.sentence_segmenter.group(cues)
+                source_texts = self.sentence_segmenter.merge(cues, groups)
+            else:
+                groups = None
+                source_texts = cues.texts
+            
+            if self.translation_workers > 1 and len(source_texts) >= self.translation_pool_min_texts:
+                pool = self._get_translation_pool(from_lang, to_lang)
+                translated_texts = pool.translate(
+                    source_texts,
+                    progress_callback=lambda p: progress_callback(p, 'translate') if progress_callback else None,
+                    cancel_check=lambda: self.cancel_process
+                )
+                hop_seconds = pool.last_hop_seconds
+            else:
+                translated_texts = self.translation_router.translate(
+                    route,
+                    source_texts,
+                    progress_callback=lambda p: progress_callback(p, 'translate') if progress_callback else None,
+                    cancel_check=lambda: self.cancel_process
+                )
+                hop_seconds = route.last_hop_seconds
             
-            for i, sub in enumerate(subs):
-                if self.cancel_process:
-                    self.log_with_emoji("Translation cancelled by user", logging.WARNING, 'ERROR')
-                    break
-                    
-                original_text = sub.text
-                sub.text = translation.translate(sub.text)
-                
-                if i < 3:
-                    self.log_with_emoji(f"Sample translation {i+1}:", emoji_type='TRANSLATE', stage='translate')
-                    self.log_with_emoji(f"Original: {original_text}", emoji_type='TRANSLATE', stage='translate')
-                    self.log_with_emoji(f"Translated: {sub.text}", emoji_type='TRANSLATE', stage='translate')
-                
-                if progress_callback and i % 10 == 0:
-                    progress = (i / len(subs)) * 100
-                    progress_callback(progress, 'translate')
+            for hop, seconds in hop_seconds.items():
+                self.job_stats[f"translate_hop[{hop}]"] = f"{seconds:.2f}s"
+                self.log_with_emoji(
+                    f"Hop {hop}: {seconds:.2f}s ({seconds / max(1, len(source_texts)) * 1000:.1f} ms/unit)",
+                    emoji_type='TRANSLATE', stage='translate'
+                )
             
-            base_name = os.path.splitext(os.path.basename(subtitle_path))[0]
-            translated_subtitle_path = os.path.join(self.temp_folder, f"{base_name}_subtitles_{to_lang}.srt")
+            for i in range(min(3, len(source_texts))):
+                self.log_with_emoji(f"Sample translation {i+1}:", emoji_type='TRANSLATE', stage='translate')
+                self.log_with_emoji(f"Original: {source_texts[i]}", emoji_type='TRANSLATE', stage='translate')
+                self.log_with_emoji(f"Translated: {translated_texts[i]}", emoji_type='TRANSLATE', stage='translate')
+            
+            self.job_stats['translate_segments'] = len(cues)
+            self.job_stats['translate_calls'] = len(source_texts)
+            if groups is not None:
+                translated_texts = self.sentence_segmenter.redistribute(cues, groups, translated_texts, to_lang)
+                saved = len(cues) - len(source_texts)
+                self.log_with_emoji(
+                    f"Sentence re-segmentation: {len(source_texts)} translation calls instead of {len(cues)} "
+                    f"({saved / max(1, len(cues)):.0%} fewer)",
+                    emoji_type='TRANSLATE', stage='translate'
+                )
             
-            subs.save(translated_subtitle_path, encoding='utf-8')
-            self._register_temp_file(translated_subtitle_path)
+            translated_cues = cues.with_texts(translated_texts, to_lang)
             
             if progress_callback:
                 progress_callback(100, 'translate')
                 
-            self.log_with_emoji(f"Translation complete. File: {os.path.basename(translated_subtitle_path)}", emoji_type='COMPLETE', stage='translate')
-            return translated_subtitle_path
+            self.log_with_emoji(f"Translation complete. Segments: {len(translated_cues)}", emoji_type='COMPLETE', stage='translate')
+            return translated_cues
         except Exception as e:
             if progress_callback:
                 progress_callback(-1, 'translate', str(e))
             self.log_with_emoji(f"Translation error: {str(e)}", logging.ERROR, 'ERROR')
             raise RuntimeError(f"Translation error: {e}")
 
-    def process_local_video(self, video_path, from_lang="en", to_lang="pl", output_dir=None, progress_callback=None, add_subtitles=False, subtitle_style=None):
+    def _get_translation_pool(self, from_lang, to_lang):
+        """Zwraca (i tworzy przy pierwszym użyciu) pulę procesów dla pary językowej"""
+        key = (from_lang, to_lang)
+        pool = self.translation_pools.get(key)
+        if pool is not None and (pool.workers, pool.threads_per_worker) != (
+                self.translation_workers, self.translation_threads_per_worker):
+            # Ustawienia zmienione w trakcie sesji - pula tworzona od nowa
+            pool.close()
+            pool = None
+        if pool is None:
+            pool = TranslationPool(
+                from_lang, to_lang,
+                workers=self.translation_workers,
+                threads_per_worker=self.translation_threads_per_worker,
+                logger=self.logger
+            )
+            self.translation_pools[key] = pool
+        return pool
+
+    def shutdown(self):
+        """Zamyka procesy robocze tłumaczenia"""
+        for pool in self.translation_pools.values():
+            pool.close()
+        self.translation_pools.clear()
+
+    def process_local_video(self, video_path, from_lang=None, to_lang="pl", output_dir=None, progress_callback=None, add_subtitles=False, subtitle_style=None):
         try:
+            self.job_stats = {}
+            self._ffmpeg_counters = self.ffmpeg_service.snapshot()
             self.log_with_emoji("Starting local video processing...", emoji_type='PROCESS')
             self.log_with_emoji(f"Input file: {video_path}", emoji_type='FILE')
-            self.log_with_emoji(f"Translation: {from_lang} -> {to_lang}", emoji_type='TRANSLATE')
+            self.log_with_emoji(f"Translation: {from_lang or 'auto'} -> {to_lang}", emoji_type='TRANSLATE')
             self.log_with_emoji(f"Add subtitles: {'Yes' if add_subtitles else 'No'}", emoji_type='SUBTITLES')
             
             self._create_output_folder(video_path)
-            
-            if output_dir:
-                self._check_disk_space(output_dir)
-            else:
-                self._check_disk_space(os.path.dirname(video_path))
+            self._reserve_disk_space(
+                self.temp_folder, self.disk_planner.probe(video_path), add_subtitles=add_subtitles
+            )
             
             self.log_with_emoji("Step 1/6: Extracting audio...", emoji_type='AUDIO', stage='extract_audio')
-            audio_path = self.audio_extractor.extract_audio(video_path, progress_callback=progress_callback)
+            loudness_future = self._measure_program_loudness(video_path)
+            extracted_format = "wav" if self.intermediate_audio_format == "wav" else "flac"
+            audio_path = self.audio_extractor.extract_audio(
+                video_path,
+                self._work_path(video_path, f"_extracted_audio.{extracted_format}"),
+                audio_format=extracted_format,
+                progress_callback=progress_callback
+            )
+            self._register_temp_file(audio_path, 'extract_audio')
+            dub_loudness = self._dub_loudness(loudness_future)
+            self._release_stage('download')
             
             self.log_with_emoji("Step 2/6: Transcribing audio...", emoji_type='TRANSCRIBE', stage='transcribe')
-            language, segments = self.transcribe(audio_path, progress_callback)
+            language, segments = self.transcribe(audio_path, progress_callback, language=from_lang)
+            from_lang = language
+            self._release_stage('extract_audio')
             
             self.log_with_emoji("Step 3/6: Generating subtitles...", emoji_type='SUBTITLES', stage='transcribe')
-            subtitle_path = self.generate_subtitle_file(language, segments, video_path)
+            cues = CueTable.from_segments(segments, language)
+            self.generate_subtitle_file(language, cues, video_path)
             
             self.log_with_emoji("Step 4/6: Translating subtitles...", emoji_type='TRANSLATE', stage='translate')
-            translated_subtitle_path = self.translate_subtitles(subtitle_path, from_lang, to_lang, progress_callback)
+            translated_cues = self.translate_subtitles(cues, from_lang, to_lang, progress_callback)
+            self.generate_subtitle_file(to_lang, translated_cues, video_path, suffix=f"_{to_lang}")
             
             self.log_with_emoji("Step 5/6: Generating translated audio...", emoji_type='AUDIO', stage='generate_audio')
-            translated_audio_path = self.audio_generator.generate_translated_audio(translated_subtitle_path, os.path.join(self.temp_folder, f"{os.path.splitext(os.path.basename(video_path))[0]}_translated_audio.wav"), to_lang, progress_callback)
+            self.audio_generator.output_format = self.intermediate_audio_format
+            translated_audio_path = self.audio_generator.generate_translated_audio(
+                translated_cues,
+                self._work_path(video_path, f"_translated_audio.{self.intermediate_audio_format}"),
+                to_lang,
+                progress_callback,
+                loudness_target=dub_loudness
+            )
+            self._register_temp_file(translated_audio_path, 'generate_audio')
             
             video_name = os.path.splitext(os.path.basename(video_path))[0]
             final_filename = f"{video_name}_translated.mp4"
             final_video_path = os.path.join(self.temp_folder, final_filename)
             
+            accompaniment_path = self._separate_background(video_path, cues)
+            
             self.log_with_emoji("Step 6/6: Replacing audio track...", emoji_type='AUDIO', stage='finalize')
-            final_video_path = self.audio_replacer.replace_audio(video_path, translated_audio_path, final_video_path, progress_callback)
+            rendered_path = self.audio_replacer.replace_audio(
+                video_path, translated_audio_path, self._work_path(final_video_path, ".mp4"), progress_callback,
+                # Ściszanie według faktycznego położenia klipów, a nie czasów napisów
+                cues=self.audio_generator.last_placements,
+                accompaniment_path=accompaniment_path
+            )
+            final_video_path = self._publish_output(rendered_path, final_video_path)
+            self._release_stage('generate_audio')
+            self._release_stage('separate')
 
             if add_subtitles:
                 self.log_with_emoji("Adding subtitles to video...", emoji_type='SUBTITLES', stage='finalize')
                 final_with_subs = os.path.join(self.temp_folder, f"{video_name}_with_subs.mp4")
-                self.subtitle_burner.burn_subtitles_to_video(final_video_path, translated_subtitle_path, final_with_subs, subtitle_style)
+                rendered_path = self.subtitle_burner.burn_subtitles_to_video(
+                    final_video_path, translated_cues, self._work_path(final_with_subs, ".mp4"), subtitle_style
+                )
+                self._publish_output(rendered_path, final_with_subs)
             
             self.log_with_emoji(f"Processing complete. Output file: {final_video_path}", emoji_type='COMPLETE')
             return final_video_path
@@ -534,60 +730,230 @@ class VideoTranslator:
             self.log_with_emoji(f"Processing error: {str(e)}", logging.ERROR, 'ERROR')
             raise
         finally:
-            self._clean_temp_files()
+            self._release_disk_reservation()
+            self._log_job_stats()
+            self._clean_temp_files(background=True)
 
-    def main(self, youtube_url, from_lang="en", to_lang="pl", output_dir=None, quality='best', progress_callback=None, add_subtitles=False, subtitle_style=None):
+    def main(self, youtube_url, from_lang=None, to_lang="pl", output_dir=None, quality='best', progress_callback=None, add_subtitles=False, subtitle_style=None,
+             video_info=None, media=None):
+        """
+        Tłumaczy jeden film YouTube
+
+        :param video_info: Znane już metadane filmu (np. wpis kolekcji z title i duration);
+                           bez listy formatów i bez media pobierane są przez get_video_info
+        :param media: MediaEstimate źródła do planowania miejsca (np. z pliku pobranego
+                      wcześniej do pamięci podręcznej); None = szacunek z video_info
+        """
         if output_dir is None:
             output_dir = self.script_dir
         
+        video_future = None
         try:
+            self.job_stats = {}
+            self._ffmpeg_counters = self.ffmpeg_service.snapshot()
             self.log_with_emoji("Starting YouTube video translation...", emoji_type='PROCESS')
             self.log_with_emoji(f"URL: {youtube_url}", emoji_type='DOWNLOAD', stage='download')
-            self.log_with_emoji(f"Translation: {from_lang} -> {to_lang}", emoji_type='TRANSLATE', stage='translate')
+            self.log_with_emoji(f"Translation: {from_lang or 'auto'} -> {to_lang}", emoji_type='TRANSLATE', stage='translate')
             self.log_with_emoji(f"Quality: {quality}", emoji_type='SETTINGS')
             self.log_with_emoji(f"Add subtitles: {'Yes' if add_subtitles else 'No'}", emoji_type='SUBTITLES')
             
-            self._check_disk_space(output_dir)
-            
-            self.log_with_emoji("Step 1/6: Downloading video...", emoji_type='DOWNLOAD', stage='download')
-            video_path = self.download_youtube_video(youtube_url, output_dir, quality, progress_callback)
+            if media is None:
+                if not video_info or not video_info.get('formats'):
+                    # Płaski wpis kolekcji nie ma listy formatów potrzebnej do szacunku
+                    video_info = self.downloader.get_video_info(youtube_url)
+                if video_info and video_info.get('duration'):
+                    media = self.disk_planner.estimate_from_info(video_info, quality)
+            if media is not None:
+                self._reserve_disk_space(
+                    output_dir,
+                    media,
+                    add_subtitles=add_subtitles,
+                    download=True
+                )
+            else:
+                self.log_with_emoji("Video info unavailable - skipping disk space planning", logging.WARNING)
+            
+            job_started = time.perf_counter()
+            if self.two_track_download:
+                self.log_with_emoji("Step 1/6: Downloading audio track (video continues in background)...", emoji_type='DOWNLOAD', stage='download')
+                source_path = self.download_youtube_video(
+                    youtube_url, output_dir, quality, progress_callback, fmt=self.downloader.audio_only_format,
+                    track='audio'
+                )
+                download_executor = ThreadPoolExecutor(max_workers=1)
+                video_future = download_executor.submit(
+                    self.download_youtube_video,
+                    youtube_url, output_dir, quality, None,
+                    fmt=self.downloader.video_only_format(quality),
+                    output_folder=self.temp_folder,
+                    track='video'
+                )
+                download_executor.shutdown(wait=False)
+                video_path = original_audio_path = source_path
+                # Nazwa wyniku bez przyrostka ścieżki
+                video_name = os.path.splitext(os.path.basename(source_path))[0][:-len('_audio')]
+            else:
+                self.log_with_emoji("Step 1/6: Downloading video...", emoji_type='DOWNLOAD', stage='download')
+                video_path = self.download_youtube_video(youtube_url, output_dir, quality, progress_callback)
+                original_audio_path = None
+                video_name = os.path.splitext(os.path.basename(video_path))[0]
             
             self.log_with_emoji("Step 2/6: Extracting audio...", emoji_type='AUDIO', stage='extract_audio')
-            audio_path = self.audio_extractor.extract_audio(video_path, progress_callback=progress_callback)
+            loudness_future = self._measure_program_loudness(video_path)
+            extracted_format = "wav" if self.intermediate_audio_format == "wav" else "flac"
+            audio_path = self.audio_extractor.extract_audio(
+                video_path,
+                self._work_path(video_path, f"_extracted_audio.{extracted_format}"),
+                audio_format=extracted_format,
+                progress_callback=progress_callback
+            )
+            self._register_temp_file(audio_path, 'extract_audio')
+            dub_loudness = self._dub_loudness(loudness_future)
+            if self.audio_replacer.mix_mode != "mix" and not self.separate_background:
+                # Przy miksowaniu pobrana ścieżka audio jest potrzebna jeszcze przy składaniu
+                self._release_stage('download')
             
             self.log_with_emoji("Step 3/6: Transcribing audio...", emoji_type='TRANSCRIBE', stage='transcribe')
-            language, segments = self.transcribe(audio_path, progress_callback)
+            language, segments = self.transcribe(audio_path, progress_callback, language=from_lang)
+            from_lang = language
+            self._release_stage('extract_audio')
+            self.job_stats['time_to_transcript'] = f"{time.perf_counter() - job_started:.1f}s"
             
             self.log_with_emoji("Step 4/6: Generating subtitles...", emoji_type='SUBTITLES', stage='transcribe')
-            subtitle_path = self.generate_subtitle_file(language, segments, video_path)
+            cues = CueTable.from_segments(segments, language)
+            self.generate_subtitle_file(language, cues, video_path)
             
             self.log_with_emoji("Step 5/6: Translating subtitles...", emoji_type='TRANSLATE', stage='translate')
-            translated_subtitle_path = self.translate_subtitles(subtitle_path, from_lang, to_lang, progress_callback)
+            translated_cues = self.translate_subtitles(cues, from_lang, to_lang, progress_callback)
+            self.generate_subtitle_file(to_lang, translated_cues, video_path, suffix=f"_{to_lang}")
             
             self.log_with_emoji("Step 6/6: Generating translated audio...", emoji_type='AUDIO', stage='generate_audio')
-            translated_audio_path = self.audio_generator.generate_translated_audio(translated_subtitle_path, os.path.join(self.temp_folder, f"{os.path.splitext(os.path.basename(video_path))[0]}_translated_audio.wav"), to_lang, progress_callback)
+            self.audio_generator.output_format = self.intermediate_audio_format
+            translated_audio_path = self.audio_generator.generate_translated_audio(
+                translated_cues,
+                self._work_path(video_path, f"_translated_audio.{self.intermediate_audio_format}"),
+                to_lang,
+                progress_callback,
+                loudness_target=dub_loudness
+            )
+            self._register_temp_file(translated_audio_path, 'generate_audio')
             
-            video_name = os.path.splitext(os.path.basename(video_path))[0]
             final_filename = f"{video_name}_translated.mp4"
             final_video_path = os.path.join(self.temp_folder, final_filename)
+            # Przy pobieraniu dwóch ścieżek separacja działa, gdy wideo jeszcze się pobiera
+            accompaniment_path = self._separate_background(original_audio_path or video_path, cues)
+            
+            if video_future is not None:
+                self.log_with_emoji("Waiting for background video download...", emoji_type='DOWNLOAD', stage='download')
+                video_path = video_future.result()
+                video_future = None
             
             self.log_with_emoji("Final step: Replacing audio track...", emoji_type='AUDIO', stage='finalize')
-            final_video_path = self.audio_replacer.replace_audio(video_path, translated_audio_path, final_video_path, progress_callback)
+            rendered_path = self.audio_replacer.replace_audio(
+                video_path, translated_audio_path, self._work_path(final_video_path, ".mp4"), progress_callback,
+                # Ściszanie według faktycznego położenia klipów, a nie czasów napisów
+                cues=self.audio_generator.last_placements,
+                original_audio_path=original_audio_path,
+                accompaniment_path=accompaniment_path
+            )
+            self._release_stage('download')
+            final_video_path = self._publish_output(rendered_path, final_video_path)
+            self._release_stage('generate_audio')
+            self._release_stage('separate')
 
 
             if add_subtitles:
                 self.log_with_emoji("Adding subtitles to video...", emoji_type='SUBTITLES', stage='finalize')
                 final_with_subs = os.path.join(self.temp_folder, f"{video_name}_with_subs.mp4")
-                self.subtitle_burner.burn_subtitles_to_video(final_video_path, translated_subtitle_path, final_with_subs, subtitle_style)
+                rendered_path = self.subtitle_burner.burn_subtitles_to_video(
+                    final_video_path, translated_cues, self._work_path(final_with_subs, ".mp4"), subtitle_style
+                )
+                self._publish_output(rendered_path, final_with_subs)
             
             self.log_with_emoji(f"Translation complete. Output file: {final_video_path}", emoji_type='COMPLETE')
             return final_video_path
             
         except Exception as e:
             self.log_with_emoji(f"Translation error: {str(e)}", logging.ERROR, 'ERROR')
+            if video_future is not None:
+                # Nie sprzątamy folderu, dopóki wątek pobierania może do niego pisać
+                try:
+                    video_future.result()
+                except Exception:
+                    pass
             raise
         finally:
-            self._clean_temp_files()
+            self._release_disk_reservation()
+            self._log_job_stats()
+            self._clean_temp_files(background=True)
+
+    def process_collection(self, collection_url, from_lang=None, to_lang="pl", output_dir=None, quality='best',
+                           progress_callback=None, add_subtitles=False, subtitle_style=None, limit=None):
+        """
+        Tłumaczy wszystkie filmy z playlisty lub kanału
+
+        Metadane wszystkich pozycji pobierane są jednym zapytaniem. Pobieranie do
+        pamięci podręcznej działa równolegle (batch_download_concurrency), a samo
+        przetwarzanie - po jednym filmie naraz. Przetworzone identyfikatory trafiają
+        do trwałego archiwum i są pomijane przy kolejnych uruchomieniach.
+
+        :return: Lista krotek (wpis, ścieżka wyniku, błąd)
+        """
+        if output_dir is None:
+            output_dir = self.script_dir
+        
+        self.log_with_emoji(f"Expanding collection: {collection_url}", emoji_type='DOWNLOAD', stage='download')
+        entries = self.downloader.expand_collection(collection_url, limit=limit)
+        pending = [entry for entry in entries if entry['id'] not in self.download_archive]
+        self.log_with_emoji(
+            f"Collection: {len(entries)} videos, {len(entries) - len(pending)} already processed",
+            emoji_type='DOWNLOAD', stage='download'
+        )
+        
+        formats = (
+            [self.downloader.audio_only_format, self.downloader.video_only_format(quality)]
+            if self.two_track_download else [None]
+        )
+        
+        def process_entry(entry):
+            if self.cancel_process:
+                raise RuntimeError("Process cancelled by user")
+            cached_paths = [self.download_manager.prefetch(entry['url'], quality, fmt=fmt) for fmt in formats]
+            try:
+                # Plik wideo jest już w pamięci podręcznej - planowanie korzysta z jego parametrów
+                media = self.disk_planner.probe(cached_paths[-1])
+            except RuntimeError:
+                media = None
+            with self._job_lock:
+                if self.cancel_process:
+                    raise RuntimeError("Process cancelled by user")
+                self.log_with_emoji(f"Processing: {entry['title']}", emoji_type='PROCESS')
+                result = self.main(
+                    entry['url'], from_lang, to_lang, output_dir, quality,
+                    progress_callback=progress_callback,
+                    add_subtitles=add_subtitles,
+                    subtitle_style=subtitle_style,
+                    video_info=entry,
+                    media=media
+                )
+            self.download_archive.add(entry['id'])
+            return result
+        
+        job_queue = BatchJobQueue(process_entry, max_concurrency=self.batch_download_concurrency, logger=self.logger)
+        for entry in pending:
+            if self.cancel_process:
+                job_queue.cancel()
+                break
+            job_queue.submit(entry)
+        results = job_queue.close()
+        
+        failed = sum(1 for _, _, error in results if error)
+        self.log_with_emoji(
+            f"Collection complete: {len(results) - failed} translated, {failed} failed",
+            emoji_type='COMPLETE' if not failed else None,
+            level=logging.INFO if not failed else logging.WARNING
+        )
+        return results
 
     def cancel(self):
         self.cancel_process = True
@@ -0,0 +1,116 @@
+import os
+import logging
+import threading
+
+
+def _parse_rate(rate):
+    """Zamienia ułamek ffprobe (np. '30000/1001') na liczbę"""
+    try:
+        numerator, _, denominator = (rate or "0/1").partition("/")
+        return float(numerator) / float(denominator or 1)
+    except (ValueError, ZeroDivisionError):
+        return 0.0
+
+
+class StreamInfo:
+    """Parametry pojedynczego strumienia pliku multimedialnego"""
+    __slots__ = ('index', 'codec_type', 'codec_name', 'width', 'height', 'fps',
+                 'sample_rate', 'channels', 'channel_layout', 'duration')
+
+    def __init__(self, data):
+        self.index = data.get('index', 0)
+        self.codec_type = data.get('codec_type')
+        self.codec_name = data.get('codec_name')
+        self.width = int(data.get('width') or 0)
+        self.height = int(data.get('height') or 0)
+        self.fps = _parse_rate(data.get('avg_frame_rate')) or _parse_rate(data.get('r_frame_rate'))
+        self.sample_rate = int(data.get('sample_rate') or 0)
+        self.channels = int(data.get('channels') or 0)
+        self.channel_layout = data.get('channel_layout')
+        self.duration = float(data.get('duration') or 0)
+
+
+class MediaInfo:
+    """Wynik ffprobe dla pliku: czas trwania, strumienie, kodeki, rozdzielczość i układ audio"""
+    __slots__ = ('path', 'size', 'duration', 'bit_rate', 'format_name', 'streams')
+
+    def __init__(self, path, data):
+        fmt = data.get('format', {})
+        self.path = path
+        self.size = int(fmt.get('size') or os.path.getsize(path))
+        self.streams = [StreamInfo(stream) for stream in data.get('streams', [])]
+        self.duration = float(fmt.get('duration') or 0) or max((s.duration for s in self.streams), default=0.0)
+        self.bit_rate = int(fmt.get('bit_rate') or (self.size * 8 / self.duration if self.duration else 0))
+        self.format_name = fmt.get('format_name', '')
+
+    def _first(self, codec_type):
+        return next((stream for stream in self.streams if stream.codec_type == codec_type), None)
+
+    @property
+    def video(self):
+        """Pierwszy strumień wideo (bez okładek) lub None"""
+        return next(
+            (s for s in self.streams if s.codec_type == 'video' and s.codec_name not in ('mjpeg', 'png')),
+            None
+        )
+
+    @property
+    def audio(self):
+        return self._first('audio')
+
+    @property
+    def width(self):
+        return self.video.width if self.video else 0
+
+    @property
+    def height(self):
+        return self.video.height if self.video else 0
+
+    @property
+    def fps(self):
+        return self.video.fps if self.video else 0.0
+
+    def __str__(self):
+        parts = [f"{self.duration:.1f}s"]
+        if self.video:
+            parts.append(f"{self.video.codec_name} {self.width}x{self.height}@{self.fps:.2f}")
+        if self.audio:
+            parts.append(f"{self.audio.codec_name} {self.audio.sample_rate}Hz {self.audio.channel_layout or self.audio.channels}")
+        return ", ".join(parts)
+
+
+class MediaInfoService:
+    """
+    Jednorazowy odczyt parametrów pliku przez ffprobe
+
+    Rekordy MediaInfo są przechowywane dla ścieżki, rozmiaru i czasu modyfikacji,
+    więc każdy niezmieniony plik jest badany tylko raz, niezależnie od tego,
+    ile etapów pyta o jego parametry.
+    """
+
+    def __init__(self, ffmpeg_service, logger=None):
+        """
+        :param ffmpeg_service: FFmpegService uruchamiający ffprobe
+        :param logger: Obiekt loggera
+        """
+        self.ffmpeg_service = ffmpeg_service
+        self.logger = logger or logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._cache = {}
+
+    def get(self, path):
+        """
+        Zwraca MediaInfo pliku
+
+        :raises RuntimeError: Gdy ffprobe nie może odczytać pliku
+        """
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            info = self._cache.get(key)
+        if info is None:
+            info = MediaInfo(path, self.ffmpeg_service.probe(path))
+            with self._lock:
+                self._cache[key] = info
+            self.logger.info(f"Media info {os.path.basename(path)}: {info}")
+        return info
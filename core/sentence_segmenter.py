@@ -0,0 +1,104 @@
+import re
+
+
+class SentenceSegmenter:
+    """
+    Łączy fragmenty z Whispera w pełne zdania przed tłumaczeniem
+
+    Segment zamyka zdanie, gdy kończy się znakiem interpunkcyjnym, gdy przerwa do
+    następnego segmentu przekracza max_gap, gdy zmienia się mówca lub gdy
+    jednostka osiągnie max_chars.
+    Po tłumaczeniu tekst zdania jest rozdzielany z powrotem na oryginalne napisy
+    proporcjonalnie do długości tekstu źródłowego.
+    """
+    SENTENCE_END = re.compile(r'[.!?…。！？]["\'”’)\]]*$')
+    NO_SPACE_LANGUAGES = ("ja", "zh")
+
+    def __init__(self, max_gap=1.0, max_chars=400):
+        """
+        :param max_gap: Maksymalna przerwa (s) między fragmentami jednego zdania
+        :param max_chars: Maksymalna długość jednostki tłumaczenia
+        """
+        self.max_gap = max_gap
+        self.max_chars = max_chars
+
+    def group(self, cues):
+        """
+        Wyznacza grupy napisów tworzące zdania
+
+        :param cues: CueTable z tekstem źródłowym
+        :return: Lista krotek (pierwszy, ostatni+1) indeksów napisów
+        """
+        groups = []
+        first = 0
+        length = 0
+        count = len(cues)
+        for i in range(count):
+            length += len(cues.texts[i]) + 1
+            is_last = i == count - 1
+            if (is_last
+                    or self.SENTENCE_END.search(cues.texts[i].rstrip())
+                    or cues.starts[i + 1] - cues.ends[i] > self.max_gap
+                    or (cues.speakers is not None and cues.speakers[i + 1] != cues.speakers[i])
+                    or length + len(cues.texts[i + 1]) > self.max_chars):
+                groups.append((first, i + 1))
+                first = i + 1
+                length = 0
+        return groups
+
+    def merge(self, cues, groups):
+        """Zwraca tekst każdej jednostki zdaniowej"""
+        joiner = "" if cues.language in self.NO_SPACE_LANGUAGES else " "
+        return [
+            joiner.join(text for text in cues.texts[first:last] if text)
+            for first, last in groups
+        ]
+
+    def redistribute(self, cues, groups, translated_units, language=None):
+        """
+        Rozdziela przetłumaczone zdania na oryginalne napisy
+
+        :param cues: CueTable z tekstem źródłowym (wagi podziału)
+        :param groups: Grupy zwrócone przez group()
+        :param translated_units: Przetłumaczony tekst każdej grupy
+        :param language: Kod języka tłumaczenia
+        :return: Lista tekstów, po jednym na napis
+        """
+        no_space = language in self.NO_SPACE_LANGUAGES
+        texts = []
+        for (first, last), unit in zip(groups, translated_units):
+            if last - first == 1:
+                texts.append(unit)
+                continue
+            tokens = list(unit.replace(" ", "")) if no_space else unit.split()
+            weights = [max(1, len(text)) for text in cues.texts[first:last]]
+            texts.extend(self._split_tokens(tokens, weights, "" if no_space else " "))
+        return texts
+
+    def _split_tokens(self, tokens, weights, joiner):
+        """Dzieli tokeny na len(weights) części o długościach proporcjonalnych do wag"""
+        parts = len(weights)
+        total_weight = sum(weights)
+        total_chars = sum(len(token) for token in tokens) or 1
+
+        boundaries = []
+        cumulative = 0
+        for weight in weights[:-1]:
+            cumulative += weight
+            boundaries.append(cumulative / total_weight * total_chars)
+
+        buckets = [[] for _ in range(parts)]
+        position = 0
+        part = 0
+        for index, token in enumerate(tokens):
+            midpoint = position + len(token) / 2
+            while part < parts - 1 and midpoint > boundaries[part]:
+                part += 1
+            # Zostaw co najmniej jeden token na każdy pozostały napis
+            remaining_tokens = len(tokens) - index
+            remaining_parts = parts - part
+            if remaining_tokens < remaining_parts:
+                part = parts - remaining_tokens
+            buckets[part].append(token)
+            position += len(token)
+        return [joiner.join(bucket) for bucket in buckets]
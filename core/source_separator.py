@@ -0,0 +1,209 @@
+import os
+import logging
+import subprocess
+import numpy as np
+from core.ffmpeg_service import FFmpegService
+from core.media_info import MediaInfoService
+
+
+class SourceSeparator:
+    """
+    Oddzielanie tła (muzyka, efekty) od głosu oryginalnego lektora
+
+    Działa na CPU maską widmową STFT: w przedziałach mowy (z napisów źródła)
+    tłumione są składowe pasma głosu wystające ponad tło, a w nagraniach
+    stereo dodatkowo te, które są w środku panoramy (głos), a nie po bokach
+    (większość muzyki). Audio przepływa przez potoki ffmpeg fragmentami po
+    chunk_seconds z nakładaniem okien, więc pamięć nie zależy od długości
+    nagrania. Wynikiem jest ścieżka akompaniamentu do zmiksowania z dubbingiem.
+    """
+
+    def __init__(self, ffmpeg_path, ffprobe_path, logger=None, ffmpeg_service=None, media_info=None):
+        """
+        :param ffmpeg_path: Ścieżka do ffmpeg
+        :param ffprobe_path: Ścieżka do ffprobe
+        :param logger: Obiekt loggera (opcjonalny)
+        :param ffmpeg_service: Wspólny FFmpegService (opcjonalny)
+        :param media_info: Wspólny MediaInfoService (opcjonalny)
+        """
+        self.logger = logger or logging.getLogger(__name__)
+        self.ffmpeg_service = ffmpeg_service or FFmpegService(ffmpeg_path, ffprobe_path, logger=self.logger)
+        self.media_info = media_info or MediaInfoService(self.ffmpeg_service, logger=self.logger)
+        self.n_fft = 2048
+        self.hop = self.n_fft // 4
+        self.chunk_seconds = 15
+        # Pasmo głosu, w którym działa maska
+        self.voice_band = (100.0, 5000.0)
+        # Siła tłumienia głosu (0 - bez zmian, 1 - pełna maska)
+        self.strength = 0.9
+        # Margines wokół napisów, w którym głos może jeszcze brzmieć
+        self.speech_padding = 0.2
+        # Percentyl amplitudy fragmentu traktowany jako poziom tła
+        self.background_percentile = 20
+        self.codec_args = {
+            'wav': ['-c:a', 'pcm_s16le'],
+            'flac': ['-c:a', 'flac', '-compression_level', '5']
+        }
+
+    def log_with_emoji(self, message, level=logging.INFO, emoji_type=None):
+        """Funkcja pomocnicza do logowania z emoji"""
+        extra = {'emoji_type': emoji_type} if emoji_type else {}
+        self.logger.log(level, message, extra=extra)
+
+    def separate(self, source_path, output_path, cues=None, audio_format='flac'):
+        """
+        Tworzy ścieżkę akompaniamentu (oryginał bez głosu lektora)
+
+        :param source_path: Plik wideo lub audio z oryginalną ścieżką
+        :param output_path: Ścieżka pliku wynikowego
+        :param cues: CueTable mowy w oryginale; bez niej maska działa na całym nagraniu
+        :param audio_format: 'flac' lub 'wav'
+        :return: Ścieżka pliku wynikowego
+        :raises RuntimeError: Gdy źródło nie ma audio lub ffmpeg zakończy się błędem
+        """
+        try:
+            info = self.media_info.get(source_path)
+            if not info.audio:
+                raise RuntimeError(f"No audio stream in {os.path.basename(source_path)}")
+            sample_rate = info.audio.sample_rate or 44100
+            channels = min(2, info.audio.channels or 1)
+            self.log_with_emoji(
+                f"Separating background audio: {os.path.basename(source_path)} "
+                f"({sample_rate}Hz, {channels}ch, {'center + ' if channels == 2 else ''}spectral mask)",
+                emoji_type='AUDIO'
+            )
+            speech = self._speech_intervals(cues)
+
+            decode_args = [
+                '-i', source_path, '-map', '0:a:0', '-vn',
+                '-f', 's16le', '-acodec', 'pcm_s16le', '-ar', str(sample_rate), '-ac', str(channels), 'pipe:1'
+            ]
+            encode_args = [
+                '-f', 's16le', '-ar', str(sample_rate), '-ac', str(channels), '-i', 'pipe:0',
+                *self.codec_args.get(audio_format, self.codec_args['flac']), '-y', output_path
+            ]
+            block_samples = int(self.chunk_seconds * sample_rate) // self.hop * self.hop
+            with self.ffmpeg_service.open(decode_args, stdout=True) as decoder, \
+                    self.ffmpeg_service.open(encode_args, stdin=True) as encoder:
+                for block in self._process_stream(decoder.stdout, block_samples, sample_rate, channels, speech):
+                    encoder.stdin.write(self._to_pcm(block))
+
+            self.log_with_emoji(f"Background audio saved: {os.path.basename(output_path)}", emoji_type='COMPLETE')
+            return output_path
+
+        except subprocess.CalledProcessError as e:
+            self.log_with_emoji(f"FFmpeg error during separation: {str(e)}", logging.ERROR, 'ERROR')
+            raise RuntimeError(f"Failed to separate background audio: {e}")
+        except Exception as e:
+            self.log_with_emoji(f"Separation error: {str(e)}", logging.ERROR, 'ERROR')
+            raise RuntimeError(f"Error separating background audio: {e}")
+
+    def _speech_intervals(self, cues):
+        """Przedziały mowy (z marginesem) jako tablica [[start, end], ...] lub None"""
+        if cues is None:
+            return None
+        intervals = [(start - self.speech_padding, end + self.speech_padding)
+                     for start, end, text in cues if text.strip()]
+        return np.array(sorted(intervals), dtype=np.float64).reshape(-1, 2)
+
+    def _process_stream(self, stream, block_samples, sample_rate, channels, speech):
+        """
+        Przetwarza strumień PCM fragmentami z nakładaniem okien (overlap-add)
+
+        Próbki z końca fragmentu, których ramki nie są jeszcze kompletne, przechodzą
+        do następnego fragmentu. Przed strumieniem jest n_fft - hop próbek ciszy
+        (odrzucanych z wyniku), a koniec dopełniany jest zerami.
+
+        :return: Generator tablic float32 (kanały, próbki)
+        """
+        overlap = self.n_fft - self.hop
+        window = np.sqrt(np.hanning(self.n_fft + 1)[:-1]).astype(np.float32)
+        # sqrt-Hann przy analizie i syntezie z krokiem n_fft/4 sumuje się do 2
+        gain = window ** 2
+        norm = sum(gain[i * self.hop:(i + 1) * self.hop] for i in range(self.n_fft // self.hop))
+        frequencies = np.fft.rfftfreq(self.n_fft, 1.0 / sample_rate)
+        band = ((frequencies >= self.voice_band[0]) & (frequencies <= self.voice_band[1])).astype(np.float32)
+
+        carry = np.zeros((channels, overlap), dtype=np.float32)
+        out_carry = np.zeros((channels, overlap), dtype=np.float32)
+        base = -overlap         # Numer próbki pierwszego elementu bufora wejściowego
+        to_skip = overlap       # Próbki opóźnienia do odrzucenia z początku wyniku
+        remaining = None        # Liczba próbek do wydania po końcu strumienia
+        bytes_per_block = block_samples * channels * 2
+
+        while remaining is None or remaining > 0:
+            data = stream.read(bytes_per_block) if remaining is None else b""
+            block = np.frombuffer(data[:len(data) // (2 * channels) * 2 * channels], dtype=np.int16)
+            block = block.reshape(-1, channels).T.astype(np.float32) / 32768.0
+            if remaining is None and block.shape[1] < block_samples:
+                # Koniec strumienia: do wydania zostaje to, co jest jeszcze w buforach
+                remaining = carry.shape[1] + block.shape[1] - to_skip
+                block = np.concatenate([block, np.zeros((channels, self.n_fft), dtype=np.float32)], axis=1)
+            buffer = np.concatenate([carry, block], axis=1)
+            frame_count = (buffer.shape[1] - self.n_fft) // self.hop + 1
+            if frame_count <= 0:
+                break
+
+            frames = np.lib.stride_tricks.sliding_window_view(buffer, self.n_fft, axis=1)[:, ::self.hop][:, :frame_count]
+            spectrum = np.fft.rfft(frames * window, axis=2)
+            times = (base + np.arange(frame_count) * self.hop + self.n_fft / 2) / sample_rate
+            spectrum *= self._mask(spectrum, band, self._speech_activity(times, speech))[None]
+            synthesized = np.fft.irfft(spectrum, n=self.n_fft, axis=2).astype(np.float32) * window
+
+            output = np.zeros((channels, (frame_count - 1) * self.hop + self.n_fft), dtype=np.float32)
+            output[:, :overlap] += out_carry
+            # Ramka ma n_fft / hop odcinków; odcinek q wszystkich ramek trafia na przesunięcie q * hop
+            segments = synthesized.reshape(channels, frame_count, self.n_fft // self.hop, self.hop)
+            for q in range(self.n_fft // self.hop):
+                output[:, q * self.hop:q * self.hop + frame_count * self.hop] += \
+                    segments[:, :, q].reshape(channels, frame_count * self.hop)
+            ready_count = frame_count * self.hop
+            ready = output[:, :ready_count] / np.tile(norm, frame_count)
+            out_carry = output[:, ready_count:ready_count + overlap]
+            carry = buffer[:, ready_count:]
+            base += ready_count
+
+            if to_skip:
+                skipped = min(to_skip, ready.shape[1])
+                ready = ready[:, skipped:]
+                to_skip -= skipped
+            if remaining is not None:
+                ready = ready[:, :remaining]
+                remaining -= ready.shape[1]
+                if not ready.shape[1]:
+                    break
+            yield ready
+
+    def _speech_activity(self, times, speech):
+        """Czy w czasie ramki mówi oryginalny lektor (1/0 dla każdej ramki)"""
+        if speech is None:
+            return np.ones(len(times), dtype=np.float32)
+        if not len(speech):
+            return np.zeros(len(times), dtype=np.float32)
+        index = np.searchsorted(speech[:, 0], times, side='right') - 1
+        # Przedziały mogą się nakładać, więc liczy się najdalszy koniec do danego startu
+        ends = np.maximum.accumulate(speech[:, 1])
+        active = (index >= 0) & (times <= ends[np.maximum(index, 0)])
+        return active.astype(np.float32)
+
+    def _mask(self, spectrum, band, activity):
+        """
+        Maska zachowania tła dla ramek fragmentu, kształt (ramki, częstotliwości)
+
+        Głosem jest nadwyżka amplitudy ponad percentyl fragmentu (tło jest bardziej
+        ciągłe niż mowa); w stereo mnożona przez spójność kanałów, bo lektor jest
+        zwykle w środku panoramy.
+        """
+        magnitude = np.abs(spectrum).mean(axis=0)
+        background = np.percentile(magnitude, self.background_percentile, axis=0)
+        vocal = np.clip(1.0 - background / np.maximum(magnitude, 1e-9), 0.0, 1.0)
+        if spectrum.shape[0] == 2:
+            left, right = spectrum
+            cross = np.abs(left * np.conj(right))
+            power = np.abs(left) ** 2 + np.abs(right) ** 2
+            vocal *= 2.0 * cross / np.maximum(power, 1e-12)
+        return (1.0 - self.strength * vocal * band[None, :] * activity[:, None]).astype(np.float32)
+
+    def _to_pcm(self, block):
+        """Tablica float32 (kanały, próbki) -> przeplatane s16le"""
+        return (np.clip(block, -1.0, 1.0) * 32767.0).astype('<i2').T.tobytes()
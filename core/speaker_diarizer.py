@@ -0,0 +1,258 @@
+import os
+import time
+import logging
+import subprocess
+import numpy as np
+from core.ffmpeg_service import FFmpegService
+
+
+class SpeakerDiarizer:
+    """
+    Lekka diaryzacja mówców na CPU dla segmentów transkrypcji
+
+    Każdy segment mowy (po VAD Whispera) dostaje wektor cech: średnią i
+    odchylenie współczynników cepstralnych z ramek o wystarczającej energii.
+    Statystyki liczone są w trakcie strumieniowego dekodowania, więc pamięć
+    zależy od liczby segmentów, a nie od długości nagrania. Wektory są
+    grupowane: k-means na mikroklastry, potem aglomeracyjnie (średnie
+    podobieństwo kosinusowe) aż do progu podobieństwa lub max_speakers.
+    Numery mówców są nadawane według łącznego czasu mowy (0 = najwięcej).
+    """
+    SAMPLE_RATE = 16000
+
+    def __init__(self, ffmpeg_path=None, ffprobe_path=None, logger=None, ffmpeg_service=None):
+        """
+        :param ffmpeg_path: Ścieżka do ffmpeg
+        :param ffprobe_path: Ścieżka do ffprobe
+        :param logger: Obiekt loggera (opcjonalny)
+        :param ffmpeg_service: Wspólny FFmpegService (opcjonalny)
+        """
+        self.logger = logger or logging.getLogger(__name__)
+        self.ffmpeg_service = ffmpeg_service or FFmpegService(ffmpeg_path, ffprobe_path, logger=self.logger)
+        self.n_fft = 512
+        self.hop = 160
+        self.n_mels = 40
+        self.n_cepstra = 20
+        self.chunk_seconds = 30
+        # Ramki cichsze niż ten poziom (dBFS) nie wchodzą do statystyk
+        self.energy_floor_db = -55.0
+        # Segmenty krótsze niż to mają zbyt mało ramek - dziedziczą mówcę po sąsiedzie
+        self.min_segment_seconds = 0.8
+        self.similarity_threshold = 0.45
+        self.max_speakers = 8
+        # Mówcy z mniejszym udziałem w czasie mowy są dołączani do najbliższego
+        self.min_speaker_share = 0.03
+        self.micro_clusters = 64
+        self._filters = self._mel_filters()
+        self._dct = self._dct_matrix()
+        self.last_stats = {}
+
+    def log_with_emoji(self, message, level=logging.INFO, emoji_type=None):
+        """Funkcja pomocnicza do logowania z emoji"""
+        extra = {'emoji_type': emoji_type} if emoji_type else {}
+        self.logger.log(level, message, extra=extra)
+
+    def diarize(self, audio_path, segments):
+        """
+        Przypisuje mówcę każdemu segmentowi (klucz 'speaker', liczba od 0)
+
+        :param audio_path: Nagranie, z którego powstały segmenty
+        :param segments: Lista słowników start/end/text (modyfikowana w miejscu)
+        :return: Liczba wykrytych mówców
+        :raises RuntimeError: Gdy nie można zdekodować nagrania
+        """
+        started = time.perf_counter()
+        if not segments:
+            return 0
+        starts = np.array([segment["start"] for segment in segments], dtype=np.float64)
+        ends = np.array([segment["end"] for segment in segments], dtype=np.float64)
+        order = np.argsort(starts, kind='stable')
+
+        sums, squares, counts = self._segment_statistics(audio_path, starts[order], ends[order])
+        durations = ends[order] - starts[order]
+        usable = (counts >= 10) & (durations >= self.min_segment_seconds)
+        labels = np.full(len(segments), -1, dtype=np.int64)
+        if usable.any():
+            mean = sums[usable] / counts[usable, None]
+            std = np.sqrt(np.maximum(squares[usable] / counts[usable, None] - mean ** 2, 0.0))
+            embeddings = np.hstack([mean, std])
+            embeddings -= embeddings.mean(axis=0)
+            embeddings /= embeddings.std(axis=0) + 1e-6
+            embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-9
+            labels[np.flatnonzero(usable)] = self._cluster(embeddings, durations[usable])
+        labels = self._fill_short(labels)
+
+        for position, index in enumerate(order):
+            segments[index]["speaker"] = int(labels[position])
+        speakers = int(labels.max()) + 1 if len(labels) else 0
+        elapsed = time.perf_counter() - started
+        self.last_stats = {"speakers": speakers, "time": elapsed}
+        self.log_with_emoji(
+            f"Speaker diarization: {speakers} speaker(s) in {len(segments)} segments ({elapsed:.1f}s)",
+            emoji_type='TRANSCRIBE'
+        )
+        return speakers
+
+    def _mel_filters(self):
+        """Trójkątne filtry melowe (n_mels, n_fft // 2 + 1)"""
+        def to_mel(hz):
+            return 2595.0 * np.log10(1.0 + hz / 700.0)
+
+        def to_hz(mel):
+            return 700.0 * (10 ** (mel / 2595.0) - 1.0)
+
+        frequencies = np.fft.rfftfreq(self.n_fft, 1.0 / self.SAMPLE_RATE)
+        edges = to_hz(np.linspace(to_mel(60.0), to_mel(7600.0), self.n_mels + 2))
+        lower, center, upper = edges[:-2, None], edges[1:-1, None], edges[2:, None]
+        rising = (frequencies - lower) / (center - lower)
+        falling = (upper - frequencies) / (upper - center)
+        return np.maximum(0.0, np.minimum(rising, falling)).astype(np.float32)
+
+    def _dct_matrix(self):
+        """DCT-II (bez c0 - poziom głośności nie odróżnia mówców)"""
+        n = np.arange(self.n_mels)
+        k = np.arange(1, self.n_cepstra)[:, None]
+        return np.cos(np.pi * k * (2 * n + 1) / (2 * self.n_mels)).T.astype(np.float32)
+
+    def _segment_statistics(self, audio_path, starts, ends):
+        """
+        Suma, suma kwadratów i liczba ramek cepstralnych w każdym segmencie
+
+        Nagranie dekodowane jest strumieniowo (16 kHz mono) fragmentami po
+        chunk_seconds; ramki spoza segmentów i ciche ramki są pomijane.
+        """
+        dims = self.n_cepstra - 1
+        sums = np.zeros((len(starts), dims))
+        squares = np.zeros((len(starts), dims))
+        counts = np.zeros(len(starts))
+        # Najdalszy koniec do danego startu - segmenty mogą się nakładać
+        reach = np.maximum.accumulate(ends)
+        window = np.hanning(self.n_fft).astype(np.float32)
+        floor = (10 ** (self.energy_floor_db / 20)) ** 2
+        block_bytes = int(self.chunk_seconds * self.SAMPLE_RATE) // self.hop * self.hop * 2
+        carry = np.zeros(0, dtype=np.float32)
+        consumed = 0    # Numer próbki pierwszego elementu carry
+
+        try:
+            with self.ffmpeg_service.open(
+                ['-i', audio_path, '-map', '0:a:0', '-vn', '-f', 's16le', '-acodec', 'pcm_s16le',
+                 '-ar', str(self.SAMPLE_RATE), '-ac', '1', 'pipe:1'],
+                stdout=True
+            ) as decoder:
+                while True:
+                    data = decoder.stdout.read(block_bytes)
+                    if not data:
+                        break
+                    samples = np.frombuffer(data[:len(data) // 2 * 2], dtype=np.int16).astype(np.float32) / 32768.0
+                    buffer = np.concatenate([carry, samples])
+                    frame_count = (len(buffer) - self.n_fft) // self.hop + 1
+                    if frame_count <= 0:
+                        carry = buffer
+                        continue
+
+                    frames = np.lib.stride_tricks.sliding_window_view(buffer, self.n_fft)[::self.hop][:frame_count]
+                    times = (consumed + np.arange(frame_count) * self.hop + self.n_fft / 2) / self.SAMPLE_RATE
+                    index = np.searchsorted(starts, times, side='right') - 1
+                    keep = (index >= 0) & (times < reach[np.maximum(index, 0)]) & ((frames ** 2).mean(axis=1) > floor)
+                    if keep.any():
+                        power = np.abs(np.fft.rfft(frames[keep] * window, axis=1)) ** 2
+                        cepstra = np.log(power @ self._filters.T + 1e-10) @ self._dct
+                        np.add.at(sums, index[keep], cepstra)
+                        np.add.at(squares, index[keep], cepstra ** 2)
+                        np.add.at(counts, index[keep], 1)
+
+                    carry = buffer[frame_count * self.hop:]
+                    consumed += frame_count * self.hop
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f"Could not decode {os.path.basename(audio_path)} for diarization: {e}")
+        return sums, squares, counts
+
+    def _cluster(self, embeddings, weights):
+        """
+        Grupuje wektory segmentów w mówców
+
+        :param embeddings: Znormalizowane wektory (segmenty, cechy)
+        :param weights: Czas trwania segmentów (waga przy średnich)
+        :return: Etykiety 0..k-1, według łącznego czasu mowy malejąco
+        """
+        centroids, assignment = self._micro_clusters(embeddings, weights)
+        masses = np.bincount(assignment, weights=weights, minlength=len(centroids))
+        present = np.flatnonzero(masses > 0)
+        groups = [[index] for index in present]
+        # Średnie podobieństwo grup (average linkage) = linked / (masa * masa)
+        mass = masses[present]
+        linked = (mass[:, None] * mass[None, :]) * (centroids[present] @ centroids[present].T)
+
+        def merge(i, j):
+            nonlocal mass, linked
+            groups[i] = groups[i] + groups.pop(j)
+            linked[i] += linked[j]
+            linked[:, i] += linked[:, j]
+            mass[i] += mass[j]
+            linked = np.delete(np.delete(linked, j, axis=0), j, axis=1)
+            mass = np.delete(mass, j)
+
+        def similarity():
+            values = linked / (mass[:, None] * mass[None, :])
+            np.fill_diagonal(values, -np.inf)
+            return values
+
+        while len(groups) > 1:
+            values = similarity()
+            i, j = np.unravel_index(np.argmax(values), values.shape)
+            if values[i, j] < self.similarity_threshold and len(groups) <= self.max_speakers:
+                break
+            merge(min(i, j), max(i, j))
+
+        # Mówcy z marginalnym udziałem to zwykle szum lub pojedyncze wtrącenia
+        while len(groups) > 1:
+            smallest = int(np.argmin(mass))
+            if mass[smallest] / mass.sum() >= self.min_speaker_share:
+                break
+            nearest = int(np.argmax(similarity()[smallest]))
+            merge(min(smallest, nearest), max(smallest, nearest))
+
+        relabel = np.zeros(len(centroids), dtype=np.int64)
+        for label, position in enumerate(np.argsort(-mass, kind='stable')):
+            relabel[groups[position]] = label
+        return relabel[assignment]
+
+    def _micro_clusters(self, embeddings, weights, iterations=10):
+        """
+        K-means (kosinusowy) do micro_clusters centroidów
+
+        Ogranicza koszt grupowania aglomeracyjnego przy tysiącach segmentów.
+        Start z punktów najdalszych od dotychczasowych centroidów (deterministycznie).
+        """
+        count = min(self.micro_clusters, len(embeddings))
+        chosen = [int(np.argmax(weights))]
+        closest = embeddings @ embeddings[chosen[0]]
+        for _ in range(count - 1):
+            chosen.append(int(np.argmin(closest)))
+            closest = np.maximum(closest, embeddings @ embeddings[chosen[-1]])
+        centroids = embeddings[chosen].copy()
+
+        for _ in range(iterations):
+            assignment = np.argmax(embeddings @ centroids.T, axis=1)
+            updated = np.zeros_like(centroids)
+            np.add.at(updated, assignment, embeddings * weights[:, None])
+            norms = np.linalg.norm(updated, axis=1, keepdims=True)
+            empty = norms[:, 0] == 0
+            updated[~empty] /= norms[~empty]
+            updated[empty] = centroids[empty]
+            if np.allclose(updated, centroids):
+                break
+            centroids = updated
+        return centroids, np.argmax(embeddings @ centroids.T, axis=1)
+
+    def _fill_short(self, labels):
+        """Segmenty bez etykiety dostają mówcę poprzedniego (lub następnego) segmentu"""
+        labels = labels.copy()
+        known = np.flatnonzero(labels >= 0)
+        if not len(known):
+            labels[:] = 0
+            return labels
+        for position in np.flatnonzero(labels < 0):
+            previous = known[known < position]
+            labels[position] = labels[previous[-1] if len(previous) else known[0]]
+        return labels
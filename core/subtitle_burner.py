@@ -1,14 +1,38 @@
 import os
-import platform
-import subprocess
+import json
+import time
+import shutil
+import hashlib
 import logging
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from pydub import AudioSegment
+from core.ffmpeg_service import FFmpegService
+from core.media_info import MediaInfoService
+from core.subtitle_cues import CueTable
+from core.ass_style import AssStyleCompiler
+from core.artifact_registry import ArtifactRegistry
 
 class SubtitleBurner:
-    def __init__(self, ffmpeg_path, ffprobe_path, logger=None):
+    def __init__(self, ffmpeg_path, ffprobe_path, logger=None, ffmpeg_service=None, media_info=None):
         self.ffmpeg_path = ffmpeg_path
         self.ffprobe_path = ffprobe_path
         self.logger = logger or logging.getLogger(__name__)
+        self.ffmpeg_service = ffmpeg_service or FFmpegService(ffmpeg_path, ffprobe_path, logger=self.logger)
+        self.media_info = media_info or MediaInfoService(self.ffmpeg_service, logger=self.logger)
+        # Wypalanie fragmentami: liczba równoległych procesów (1 = jedno kodowanie całości)
+        self.chunk_workers = 1
+        self.chunk_seconds = 120
+        # Fragmenty przerwanych zadań: katalog nazwany od klucza zadania, więc ponowne
+        # uruchomienie go odnajduje (None = obok pliku wynikowego)
+        self.chunk_cache_dir = None
+        # Porzucone katalogi fragmentów starsze niż to (w sekundach) są usuwane
+        self.chunk_cache_max_age = 3 * 24 * 3600
+        # Wspólny ArtifactRegistry zadania (opcjonalny)
+        self.artifacts = None
+        # Skompilowane nagłówki ASS, wspólne dla kolejnych języków i filmów
+        self.style_compiler = AssStyleCompiler()
         
         # Ustaw ścieżki dla pydub
         AudioSegment.converter = self.ffmpeg_path
@@ -20,98 +44,49 @@ class SubtitleBurner:
             extra = {'emoji_type': emoji_type} if emoji_type else {}
             self.logger.log(level, message, extra=extra)
 
-    def burn_subtitles_to_video(self, video_path, subtitle_path, output_path, style=None):
-        """Burn subtitles into video with customizable styling"""
-        if style is None:
-            style = {
-                'fontfamily': 'Arial',
-                'fontsize': 24,
-                'fontcolor': 'white',
-                'boxcolor': 'black@0.5',
-                'borderw': 1,
-                'bordercolor': 'black',
-                'position': 'bottom',
-                'alignment': 'center'
-            }
+    def burn_subtitles_to_video(self, video_path, subtitles, output_path, style=None):
+        """
+        Burn subtitles into video with customizable styling
 
+        :param video_path: Ścieżka do wideo
+        :param subtitles: CueTable lub ścieżka do pliku .srt/.ass (.ass używany bez zmian)
+        :param output_path: Ścieżka wynikowego wideo
+        :param style: Słownik subtitle_style (kompilowany do stylu ASS)
+        """
+        ass_path = None
         try:
             self.log_with_emoji("Burning subtitles into video...", emoji_type='SUBTITLES')
             self.log_with_emoji(f"Video: {os.path.basename(video_path)}", emoji_type='FILE')
-            self.log_with_emoji(f"Subtitles: {os.path.basename(subtitle_path)}", emoji_type='FILE')
+            if isinstance(subtitles, str):
+                self.log_with_emoji(f"Subtitles: {os.path.basename(subtitles)}", emoji_type='FILE')
             self.log_with_emoji(f"Output: {os.path.basename(output_path)}", emoji_type='FILE')
             
-            subtitle_path_escaped = subtitle_path.replace('\\', '/').replace(':', '\\:').replace("'", "\\'")
-            
-            color_mapping = {
-                'white': '0xFFFFFF',
-                'black': '0x000000',
-                'red': '0xFF0000',
-                'green': '0x00FF00',
-                'blue': '0x0000FF',
-                'yellow': '0xFFFF00',
-                'cyan': '0x00FFFF',
-                'magenta': '0xFF00FF'
-            }
-            
-            fontcolor = style['fontcolor']
-            if fontcolor.lower() in color_mapping:
-                fontcolor = color_mapping[fontcolor.lower()]
-            elif fontcolor.startswith('#'):
-                fontcolor = f"0x{fontcolor[1:]}"
-            else:
-                fontcolor = '0xFFFFFF'
-            
-            boxcolor = style['boxcolor'].split('@')[0] if '@' in style['boxcolor'] else 'black'
-            if boxcolor.lower() in color_mapping:
-                boxcolor = color_mapping[boxcolor.lower()]
-            elif boxcolor.startswith('#'):
-                boxcolor = f"0x{boxcolor[1:]}"
-            else:
-                boxcolor = '0x000000'
-            
-            bg_opacity = style['boxcolor'].split('@')[1] if '@' in style['boxcolor'] else '0.5'
-            boxcolor_alpha = f"{boxcolor}{int(float(bg_opacity)*255):02x}"
+            info = self.media_info.get(video_path)
+            if not info.video:
+                raise RuntimeError(f"No video stream in {os.path.basename(video_path)}")
+            self.log_with_emoji(f"Video: {info.width}x{info.height} @ {info.fps:.2f} fps, {info.duration:.1f}s", emoji_type='FILE')
+            play_res = (info.width, info.height)
             
-            bordercolor = style['bordercolor']
-            if bordercolor.lower() in color_mapping:
-                bordercolor = color_mapping[bordercolor.lower()]
-            elif bordercolor.startswith('#'):
-                bordercolor = f"0x{bordercolor[1:]}"
+            if isinstance(subtitles, str) and subtitles.lower().endswith('.ass'):
+                cues = None
+                subtitle_path = subtitles
             else:
-                bordercolor = '0x000000'
+                cues = subtitles if isinstance(subtitles, CueTable) else CueTable.from_srt(subtitles)
+                ass_path = subtitle_path = f"{os.path.splitext(output_path)[0]}.ass"
+                self.style_compiler.write(cues, ass_path, style, play_res)
             
-            position_mapping = {
-                'top': '10',
-                'middle': '(h-text_h)/2',
-                'bottom': 'h-text_h-10'
-            }
-            position = position_mapping.get(style['position'], 'h-text_h-10')
-            
-            alignment_mapping = {
-                'left': '1',
-                'center': '2',
-                'right': '3'
-            }
-            alignment = alignment_mapping.get(style.get('alignment', 'center'), '2')
-            
-            subtitle_filter = (
-                f"subtitles='{subtitle_path_escaped}':"
-                f"force_style='"
-                f"Fontname={style.get('fontfamily', 'Arial')},"
-                f"Fontsize={style['fontsize']},"
-                f"PrimaryColour={fontcolor},"
-                f"BackColour={boxcolor_alpha},"
-                f"BorderStyle={style['borderw']},"
-                f"OutlineColour={bordercolor},"
-                f"Alignment={alignment},"
-                f"MarginV=20'"
-            )
+            if cues is not None and self.chunk_workers > 1 and info.duration >= 2 * self.chunk_seconds:
+                self._burn_chunked(video_path, cues, subtitle_path, output_path, style, info)
+                self.log_with_emoji(f"Subtitles burned successfully: {os.path.basename(output_path)}", emoji_type='COMPLETE')
+                return output_path
 
             cmd = [
-                self.ffmpeg_path,
                 '-i', video_path,
-                '-vf', subtitle_filter,
-                '-c:a', 'copy',
+                # Indeks strumienia z ffprobe - bez -map ffmpeg może wybrać okładkę
+                '-map', f"0:{info.video.index}",
+                *(['-map', '0:a:0'] if info.audio else []),
+                '-vf', self._subtitle_filter(subtitle_path),
+                *(['-c:a', 'copy'] if info.audio else ['-an']),
                 '-c:v', 'libx264',
                 '-crf', '18',
                 '-preset', 'fast',
@@ -119,13 +94,7 @@ class SubtitleBurner:
                 output_path
             ]
             
-            subprocess.run(
-                cmd,
-                check=True,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-                creationflags=subprocess.CREATE_NO_WINDOW if platform.system() == "Windows" else 0
-            )
+            self.ffmpeg_service.run(cmd)
             
             self.log_with_emoji(f"Subtitles burned successfully: {os.path.basename(output_path)}", emoji_type='COMPLETE')
             return output_path
@@ -135,4 +104,170 @@ class SubtitleBurner:
             raise RuntimeError(f"Failed to burn subtitles: {e}")
         except Exception as e:
             self.log_with_emoji(f"Subtitle burning error: {str(e)}", logging.ERROR, 'ERROR')
-            raise RuntimeError(f"Error burning subtitles: {e}")
\ No newline at end of file
+            raise RuntimeError(f"Error burning subtitles: {e}")
+        finally:
+            if ass_path and os.path.exists(ass_path):
+                os.remove(ass_path)
+
+    def _subtitle_filter(self, subtitle_path):
+        """Filtr ass dla gotowego dokumentu ASS (styl zapisany w pliku, bez force_style)"""
+        subtitle_path_escaped = subtitle_path.replace('\\', '/').replace(':', '\\:').replace("'", "\\'")
+        return f"ass='{subtitle_path_escaped}'"
+
+    def _keyframe_times(self, video_path, stream_index):
+        """Czasy klatek kluczowych strumienia wideo (z pakietów, bez dekodowania)"""
+        result = self.ffmpeg_service.run(
+            ['-v', 'error', '-select_streams', str(stream_index),
+             '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0', video_path],
+            capture_output=True,
+            tool="ffprobe"
+        )
+        times = []
+        for line in result.stdout.decode(errors='ignore').splitlines():
+            pts_time, _, flags = line.partition(',')
+            if 'K' in flags:
+                try:
+                    times.append(float(pts_time))
+                except ValueError:
+                    continue
+        return sorted(times)
+
+    def _chunk_ranges(self, video_path, duration, stream_index):
+        """Dzieli wideo na przedziały zaczynające się od klatek kluczowych, ok. chunk_seconds każdy"""
+        keyframes = self._keyframe_times(video_path, stream_index)
+        boundaries = [0.0]
+        for keyframe in keyframes:
+            if keyframe - boundaries[-1] >= self.chunk_seconds and duration - keyframe >= self.chunk_seconds / 2:
+                boundaries.append(keyframe)
+        boundaries.append(duration)
+        return list(zip(boundaries[:-1], boundaries[1:]))
+
+    def _burn_chunked(self, video_path, cues, subtitle_path, output_path, style, info):
+        """
+        Wypala napisy równolegle w fragmentach wyrównanych do klatek kluczowych
+
+        Każdy fragment kodowany jest osobnym procesem z własnym wycinkiem napisów
+        (przesuniętym do zera), a gotowe fragmenty łączone są demuxerem concat bez
+        ponownego kodowania; audio kopiowane jest ze źródła. Katalog fragmentów
+        w chunk_cache_dir nazwany jest od klucza zadania, a jego manifest pozwala
+        po przerwaniu pominąć fragmenty już zakodowane. Katalog jest usuwany po
+        sukcesie albo gdy przeleży dłużej niż chunk_cache_max_age.
+        """
+        stat = os.stat(video_path)
+        # Dokument ASS zawiera już styl i rozdzielczość, więc jego skrót wystarcza
+        with open(subtitle_path, 'rb') as f:
+            subtitle_hash = hashlib.sha1(f.read()).hexdigest()
+        # Ścieżka i czas modyfikacji zmieniają się przy każdym uruchomieniu zadania
+        # (nowy folder wyników), więc źródło identyfikuje rozmiar i skrót zawartości
+        job_key = {
+            "source": self._content_hash(video_path),
+            "size": stat.st_size,
+            "subtitles": subtitle_hash
+        }
+        cache_dir = self.chunk_cache_dir or os.path.dirname(os.path.abspath(output_path))
+        job_id = hashlib.sha1(json.dumps(job_key, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+        chunk_dir = os.path.join(cache_dir, f"burn_{job_id}.chunks")
+        self._remove_stale_chunks(cache_dir, keep=chunk_dir)
+        os.makedirs(chunk_dir, exist_ok=True)
+        if self.artifacts is not None:
+            self.artifacts.register(chunk_dir, ArtifactRegistry.CACHE, 'burn')
+        manifest_path = os.path.join(chunk_dir, "manifest.json")
+        
+        manifest = {}
+        if os.path.exists(manifest_path):
+            try:
+                with open(manifest_path, encoding='utf-8') as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError):
+                manifest = {}
+        if manifest.get("job") != job_key:
+            manifest = {"job": job_key, "ranges": self._chunk_ranges(video_path, info.duration, info.video.index), "done": []}
+        ranges = [tuple(r) for r in manifest["ranges"]]
+        done = set(manifest["done"])
+        manifest_lock = threading.Lock()
+        
+        def save_manifest():
+            temp_path = f"{manifest_path}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f)
+            os.replace(temp_path, manifest_path)
+        
+        save_manifest()
+        play_res = (info.width, info.height)
+        threads = max(1, (os.cpu_count() or 2) // self.chunk_workers)
+        
+        def encode_chunk(index):
+            start, end = ranges[index]
+            chunk_path = os.path.join(chunk_dir, f"chunk_{index:04d}.mp4")
+            chunk_subtitles = self.style_compiler.write(
+                cues.slice(start, end), os.path.join(chunk_dir, f"chunk_{index:04d}.ass"), style, play_res
+            )
+            self.ffmpeg_service.run([
+                '-ss', f"{start:.6f}",
+                '-i', video_path,
+                '-t', f"{end - start:.6f}",
+                '-map', f"0:{info.video.index}",
+                '-vf', self._subtitle_filter(chunk_subtitles),
+                '-an',
+                '-c:v', 'libx264',
+                '-crf', '18',
+                '-preset', 'fast',
+                '-threads', str(threads),
+                '-y',
+                chunk_path
+            ])
+            with manifest_lock:
+                manifest["done"].append(index)
+                save_manifest()
+        
+        pending = [index for index in range(len(ranges)) if index not in done
+                   or not os.path.exists(os.path.join(chunk_dir, f"chunk_{index:04d}.mp4"))]
+        self.log_with_emoji(
+            f"Chunked burn: {len(ranges)} chunks, {len(ranges) - len(pending)} resumed, {self.chunk_workers} workers",
+            emoji_type='SUBTITLES'
+        )
+        with ThreadPoolExecutor(max_workers=self.chunk_workers) as executor:
+            for future in [executor.submit(encode_chunk, index) for index in pending]:
+                future.result()
+        
+        concat_list = os.path.join(chunk_dir, "concat.txt")
+        with open(concat_list, 'w', encoding='utf-8') as f:
+            for index in range(len(ranges)):
+                f.write(f"file 'chunk_{index:04d}.mp4'\n")
+        self.ffmpeg_service.run([
+            '-f', 'concat', '-safe', '0', '-i', concat_list,
+            '-i', video_path,
+            '-map', '0:v:0',    # Fragmenty mają tylko jeden strumień
+            *(['-map', '1:a:0', '-c:a', 'copy'] if info.audio else []),
+            '-c:v', 'copy',
+            '-y',
+            output_path
+        ])
+        shutil.rmtree(chunk_dir, ignore_errors=True)
+
+    def _content_hash(self, path, sample_bytes=1024 * 1024):
+        """Skrót początku i końca pliku - tani identyfikator dużego wideo"""
+        digest = hashlib.sha1()
+        with open(path, 'rb') as f:
+            digest.update(f.read(sample_bytes))
+            f.seek(max(0, os.fstat(f.fileno()).st_size - sample_bytes))
+            digest.update(f.read(sample_bytes))
+        return digest.hexdigest()
+
+    def _remove_stale_chunks(self, cache_dir, keep=None):
+        """Usuwa katalogi fragmentów nieużywane dłużej niż chunk_cache_max_age"""
+        if not os.path.isdir(cache_dir):
+            return
+        now = time.time()
+        for name in os.listdir(cache_dir):
+            path = os.path.join(cache_dir, name)
+            if not (name.startswith("burn_") and name.endswith(".chunks")) or path == keep:
+                continue
+            try:
+                manifest_path = os.path.join(path, "manifest.json")
+                used = os.path.getmtime(manifest_path if os.path.exists(manifest_path) else path)
+            except OSError:
+                continue
+            if now - used > self.chunk_cache_max_age:
+                shutil.rmtree(path, ignore_errors=True)
+                self.log_with_emoji(f"Removed stale burn chunks: {name}", emoji_type='CLEANUP')
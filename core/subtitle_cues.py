@@ -0,0 +1,157 @@
+import re
+from array import array
+
+
+def format_srt_time(seconds):
+    """Formatuje czas w sekundach jako znacznik SRT (HH:MM:SS,mmm)"""
+    ms = max(0, int(round(seconds * 1000)))
+    return f"{ms // 3600000:02d}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d},{ms % 1000:03d}"
+
+
+def format_vtt_time(seconds):
+    """Formatuje czas w sekundach jako znacznik WebVTT (HH:MM:SS.mmm)"""
+    return format_srt_time(seconds).replace(',', '.')
+
+
+_SRT_TIMING = re.compile(
+    r'(\d+):(\d{2}):(\d{2})[,.](\d{1,3})\s*-->\s*(\d+):(\d{2}):(\d{2})[,.](\d{1,3})'
+)
+
+
+class CueTable:
+    """
+    Kompaktowa tabela napisów przekazywana między etapami potoku
+
+    Czasy startu i końca trzymane są w tablicach typu double, a teksty w zwykłej
+    liście, więc 5000 napisów to trzy obiekty zamiast 5000 obiektów SubRipItem.
+    Pliki SRT/VTT zapisywane są tylko jako wyniki, nigdy ponownie parsowane.
+    """
+    __slots__ = ('starts', 'ends', 'texts', 'language', 'words', 'speakers')
+
+    def __init__(self, starts=None, ends=None, texts=None, language=None, words=None, speakers=None):
+        self.starts = array('d', starts or [])
+        self.ends = array('d', ends or [])
+        self.texts = list(texts or [])
+        self.language = language
+        # Opcjonalne znaczniki czasu słów (lista na napis), tylko dla tekstu źródłowego
+        self.words = words
+        # Opcjonalne numery mówców z diaryzacji (jeden na napis)
+        self.speakers = speakers
+
+    @classmethod
+    def from_segments(cls, segments, language=None):
+        """
+        Tworzy tabelę z segmentów zwróconych przez AudioTranscriber
+
+        :param segments: Lista słowników z kluczami start/end/text
+        :param language: Kod języka tekstu (opcjonalny)
+        """
+        words = None
+        if any("words" in segment for segment in segments):
+            words = [segment.get("words", []) for segment in segments]
+        speakers = None
+        if any("speaker" in segment for segment in segments):
+            speakers = [segment.get("speaker", 0) for segment in segments]
+        return cls(
+            [segment["start"] for segment in segments],
+            [segment["end"] for segment in segments],
+            [segment["text"].strip() for segment in segments],
+            language,
+            words,
+            speakers
+        )
+
+    @classmethod
+    def from_srt(cls, path, language=None):
+        """Wczytuje istniejący plik SRT (np. dostarczony przez użytkownika)"""
+        with open(path, encoding='utf-8-sig') as f:
+            content = f.read()
+
+        table = cls(language=language)
+        for block in re.split(r'\r?\n\s*\r?\n', content.strip()):
+            lines = block.splitlines()
+            for i, line in enumerate(lines):
+                match = _SRT_TIMING.search(line)
+                if match:
+                    h1, m1, s1, ms1, h2, m2, s2, ms2 = match.groups()
+                    table.append(
+                        int(h1) * 3600 + int(m1) * 60 + int(s1) + int(ms1.ljust(3, '0')) / 1000.0,
+                        int(h2) * 3600 + int(m2) * 60 + int(s2) + int(ms2.ljust(3, '0')) / 1000.0,
+                        "\n".join(lines[i + 1:])
+                    )
+                    break
+        return table
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __iter__(self):
+        return zip(self.starts, self.ends, self.texts)
+
+    def append(self, start, end, text):
+        self.starts.append(start)
+        self.ends.append(end)
+        self.texts.append(text)
+        if self.words is not None:
+            self.words.append([])
+        if self.speakers is not None:
+            self.speakers.append(self.speakers[-1] if self.speakers else 0)
+
+    def slice(self, start, end):
+        """
+        Napisy widoczne w przedziale [start, end), przesunięte tak, by start był zerem
+
+        Napisy przecinające granice są przycinane do przedziału.
+        """
+        table = CueTable(language=self.language)
+        for cue_start, cue_end, text in self:
+            if cue_end > start and cue_start < end:
+                table.append(max(cue_start, start) - start, min(cue_end, end) - start, text)
+        return table
+
+    def with_texts(self, texts, language=None):
+        """Zwraca nową tabelę z tymi samymi czasami i podmienionym tekstem"""
+        if len(texts) != len(self.texts):
+            raise ValueError(f"Expected {len(self.texts)} texts, got {len(texts)}")
+        # Znaczniki słów dotyczą tekstu źródłowego, więc nie są kopiowane
+        table = CueTable(language=language or self.language)
+        table.starts = array('d', self.starts)
+        table.ends = array('d', self.ends)
+        table.texts = list(texts)
+        # Mówcy są przypisani do czasów napisów, więc przechodzą do tłumaczenia
+        if self.speakers is not None:
+            table.speakers = list(self.speakers)
+        return table
+
+    def to_segments(self):
+        """Konwertuje tabelę z powrotem na listę słowników segmentów"""
+        segments = [
+            {"start": start, "end": end, "text": text}
+            for start, end, text in self
+        ]
+        if self.words is not None:
+            for segment, words in zip(segments, self.words):
+                segment["words"] = words
+        if self.speakers is not None:
+            for segment, speaker in zip(segments, self.speakers):
+                segment["speaker"] = speaker
+        return segments
+
+    def save_srt(self, path):
+        """Zapisuje tabelę jako plik SRT i zwraca ścieżkę"""
+        with open(path, 'w', encoding='utf-8') as f:
+            f.writelines(
+                f"{index}\n{format_srt_time(start)} --> {format_srt_time(end)}\n{text}\n\n"
+                for index, (start, end, text) in enumerate(self, 1)
+            )
+        return path
+
+    def save_vtt(self, path):
+        """Zapisuje tabelę jako plik WebVTT i zwraca ścieżkę"""
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("WEBVTT\n\n")
+            f.writelines(
+                f"{format_vtt_time(start)} --> {format_vtt_time(end)}\n{text}\n\n"
+                for start, end, text in self
+            )
+        return path
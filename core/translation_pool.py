@@ -0,0 +1,111 @@
+import os
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+# Stan procesu roboczego - każdy proces ładuje modele ścieżki tłumaczenia tylko raz
+_worker_router = None
+_worker_route = None
+
+
+def _init_worker(from_code, to_code, inter_threads, intra_threads):
+    """Inicjalizacja procesu roboczego: ustawienia wątków CTranslate2 i modele ścieżki"""
+    global _worker_router, _worker_route
+    os.environ["ARGOS_INTER_THREADS"] = str(inter_threads)
+    os.environ["ARGOS_INTRA_THREADS"] = str(intra_threads)
+
+    import argostranslate.settings
+    argostranslate.settings.inter_threads = inter_threads
+    argostranslate.settings.intra_threads = intra_threads
+
+    from core.translation_router import TranslationRouter
+    # Pakiety instaluje proces główny przed uruchomieniem puli
+    _worker_router = TranslationRouter(auto_install=False)
+    _worker_route = _worker_router.get_route(from_code, to_code)
+
+
+def _translate_batch(texts):
+    texts = _worker_router.translate(_worker_route, texts)
+    return texts, dict(_worker_route.last_hop_seconds)
+
+
+class TranslationPool:
+    """
+    Pula procesów tłumaczących dla jednej pary językowej
+
+    Każdy proces ładuje modele Argos/CTranslate2 (bezpośrednie lub przez język
+    pośredni) raz i dostaje paczki tekstów; wyniki składane są z powrotem
+    w oryginalnej kolejności.
+    """
+
+    def __init__(self, from_code, to_code, workers=2, threads_per_worker=1, batch_size=32, logger=None):
+        """
+        :param from_code: Kod języka źródłowego
+        :param to_code: Kod języka docelowego
+        :param workers: Liczba procesów roboczych
+        :param threads_per_worker: Wątki CTranslate2 (intra_threads) na proces
+        :param batch_size: Liczba tekstów w jednej paczce
+        :param logger: Obiekt loggera
+        """
+        self.from_code = from_code
+        self.to_code = to_code
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker
+        self.batch_size = batch_size
+        self.logger = logger or logging.getLogger(__name__)
+        # Czas rzeczywisty każdego kroku ścieżki (ostatnie wywołanie)
+        self.last_hop_seconds = {}
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(from_code, to_code, 1, threads_per_worker)
+        )
+        self.logger.info(
+            f"Translation pool {from_code}->{to_code}: {workers} workers x {threads_per_worker} threads"
+        )
+
+    def translate(self, texts, progress_callback=None, cancel_check=None):
+        """
+        Tłumaczy listę tekstów równolegle
+
+        :param texts: Lista tekstów
+        :param progress_callback: Funkcja(procent) wywoływana po każdej paczce
+        :param cancel_check: Funkcja zwracająca True, gdy proces należy przerwać
+        :return: Lista przetłumaczonych tekstów w tej samej kolejności
+        """
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        futures = {self.executor.submit(_translate_batch, batch): index for index, batch in enumerate(batches)}
+        results = [None] * len(batches)
+        pending = set(futures)
+        worker_hop_seconds = {}
+        started = time.perf_counter()
+
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                for future in done:
+                    batch_texts, hop_seconds = future.result()
+                    results[futures[future]] = batch_texts
+                    for hop, seconds in hop_seconds.items():
+                        worker_hop_seconds[hop] = worker_hop_seconds.get(hop, 0.0) + seconds
+                if cancel_check and cancel_check():
+                    raise RuntimeError("Translation cancelled by user")
+                if progress_callback and done:
+                    progress_callback((len(futures) - len(pending)) / len(futures) * 100)
+        except Exception:
+            for future in pending:
+                future.cancel()
+            raise
+
+        # Kroki różnych paczek nakładają się w czasie, więc czas rzeczywisty całego
+        # wywołania dzielony jest między kroki w proporcji do czasu procesów roboczych
+        elapsed = time.perf_counter() - started
+        worker_total = sum(worker_hop_seconds.values())
+        self.last_hop_seconds = {
+            hop: elapsed * seconds / worker_total if worker_total else 0.0
+            for hop, seconds in worker_hop_seconds.items()
+        }
+        return [text for batch in results for text in batch]
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
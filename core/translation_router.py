@@ -0,0 +1,194 @@
+import time
+import logging
+import ctranslate2
+import argostranslate.package
+import argostranslate.settings
+import argostranslate.translate
+
+
+class TranslationRoute:
+    """Ścieżka tłumaczenia: jeden krok (bezpośrednio) lub kilka kroków przez język pośredni"""
+    __slots__ = ('hops', 'last_hop_seconds')
+
+    def __init__(self, hops):
+        # Lista krotek (from_code, to_code, obiekt tłumaczenia Argos)
+        self.hops = hops
+        self.last_hop_seconds = {}
+
+    @property
+    def codes(self):
+        return [self.hops[0][0]] + [to_code for _, to_code, _ in self.hops]
+
+    def __str__(self):
+        return " -> ".join(self.codes)
+
+
+class TranslationRouter:
+    """
+    Wyznacza ścieżkę tłumaczenia raz na parę językową i przechowuje ją w pamięci
+
+    Gdy brak bezpośredniego pakietu Argos, tłumaczenie idzie przez język pośredni
+    (domyślnie angielski). Każdy krok przetwarza całą paczkę tekstów, zanim ruszy
+    następny, więc naraz aktywny jest tylko jeden model. Teksty kroku trafiają do
+    CTranslate2 paczkami (translate_batch), a nie po jednym.
+    """
+
+    # Opcje dekodowania jak w Argos translate() (jedna hipoteza)
+    BEAM_SIZE = 4
+    LENGTH_PENALTY = 0.2
+
+    def __init__(self, pivot_languages=("en",), auto_install=True, batch_size=32, logger=None):
+        """
+        :param pivot_languages: Języki pośrednie w kolejności preferencji
+        :param auto_install: Czy instalować brakujące pakiety z indeksu Argos
+        :param batch_size: Liczba tekstów w jednym wywołaniu translate_batch
+        :param logger: Obiekt loggera
+        """
+        self.pivot_languages = pivot_languages
+        self.auto_install = auto_install
+        self.batch_size = batch_size
+        self.logger = logger or logging.getLogger(__name__)
+        self.routes = {}
+        self._index_updated = False
+
+    def _installed_pairs(self):
+        return {(pkg.from_code, pkg.to_code) for pkg in argostranslate.package.get_installed_packages()}
+
+    def _available_packages(self):
+        if not self._index_updated:
+            argostranslate.package.update_package_index()
+            self._index_updated = True
+        return argostranslate.package.get_available_packages()
+
+    def _plan(self, from_code, to_code):
+        """Zwraca listę par (from, to) do zainstalowania/użycia lub None"""
+        installed = self._installed_pairs()
+        if (from_code, to_code) in installed:
+            return [(from_code, to_code)]
+        for pivot in self.pivot_languages:
+            if pivot not in (from_code, to_code) and {(from_code, pivot), (pivot, to_code)} <= installed:
+                return [(from_code, pivot), (pivot, to_code)]
+
+        if not self.auto_install:
+            return None
+
+        available = {(pkg.from_code, pkg.to_code): pkg for pkg in self._available_packages()}
+        candidates = [[(from_code, to_code)]] + [
+            [(from_code, pivot), (pivot, to_code)]
+            for pivot in self.pivot_languages if pivot not in (from_code, to_code)
+        ]
+        for plan in candidates:
+            if all(pair in installed or pair in available for pair in plan):
+                for pair in plan:
+                    if pair not in installed:
+                        self.logger.info(f"Installing translation package: {pair[0]} -> {pair[1]}")
+                        argostranslate.package.install_from_path(available[pair].download())
+                return plan
+        return None
+
+    def get_route(self, from_code, to_code):
+        """
+        Zwraca (z pamięci podręcznej) ścieżkę tłumaczenia dla pary
+
+        :raises RuntimeError: Gdy nie istnieje ani bezpośrednia, ani pośrednia ścieżka
+        """
+        key = (from_code, to_code)
+        route = self.routes.get(key)
+        if route:
+            return route
+
+        plan = self._plan(from_code, to_code)
+        if not plan:
+            raise RuntimeError(f"No translation installed from {from_code} to {to_code}")
+
+        languages = {lang.code: lang for lang in argostranslate.translate.get_installed_languages()}
+        hops = []
+        for hop_from, hop_to in plan:
+            translation = None
+            if hop_from in languages and hop_to in languages:
+                translation = languages[hop_from].get_translation(languages[hop_to])
+            if not translation:
+                raise RuntimeError(f"Could not create translation from {hop_from} to {hop_to}")
+            hops.append((hop_from, hop_to, translation))
+
+        route = TranslationRoute(hops)
+        self.routes[key] = route
+        self.logger.info(f"Translation route resolved: {route}")
+        return route
+
+    def _batch_model(self, translation):
+        """
+        Pakiet Argos i model CTranslate2 kroku do tłumaczenia paczkami
+
+        :return: Krotka (pakiet, translator) lub None, gdy tłumaczenie nie pochodzi
+                 bezpośrednio z pakietu (wtedy teksty tłumaczone są po jednym)
+        """
+        translation = getattr(translation, 'underlying', translation)
+        pkg = getattr(translation, 'pkg', None)
+        if pkg is None or getattr(pkg, 'tokenizer', None) is None or not hasattr(translation, 'translator'):
+            return None
+        if translation.translator is None:
+            # Ten sam model, który Argos utworzyłby przy pierwszym translate()
+            translation.translator = ctranslate2.Translator(
+                str(pkg.package_path / "model"),
+                device=argostranslate.settings.device,
+                inter_threads=argostranslate.settings.inter_threads,
+                intra_threads=argostranslate.settings.intra_threads
+            )
+        return pkg, translation.translator
+
+    def _translate_batch(self, model, texts):
+        """Tłumaczy paczkę tekstów jednym wywołaniem translate_batch"""
+        pkg, translator = model
+        tokenized = [pkg.tokenizer.encode(text) for text in texts]
+        target_prefix = [[pkg.target_prefix]] * len(tokenized) if getattr(pkg, 'target_prefix', '') else None
+        results = translator.translate_batch(
+            tokenized,
+            target_prefix=target_prefix,
+            replace_unknowns=True,
+            max_batch_size=self.batch_size,
+            beam_size=self.BEAM_SIZE,
+            num_hypotheses=1,
+            length_penalty=self.LENGTH_PENALTY
+        )
+        translated = []
+        for text, result in zip(texts, results):
+            if not text.strip():
+                translated.append(text)
+                continue
+            detokenized = pkg.tokenizer.decode(result.hypotheses[0])
+            if target_prefix and detokenized.startswith(pkg.target_prefix):
+                detokenized = detokenized[len(pkg.target_prefix):]
+            translated.append(detokenized.strip())
+        return translated
+
+    def translate(self, route, texts, progress_callback=None, cancel_check=None):
+        """
+        Tłumaczy paczkę tekstów krok po kroku
+
+        :param route: TranslationRoute z get_route()
+        :param texts: Lista tekstów
+        :param progress_callback: Funkcja(procent) raportująca postęp
+        :param cancel_check: Funkcja zwracająca True, gdy proces należy przerwać
+        :return: Lista przetłumaczonych tekstów
+        """
+        route.last_hop_seconds = {}
+        total = max(1, len(texts) * len(route.hops))
+        for hop_index, (hop_from, hop_to, translation) in enumerate(route.hops):
+            started = time.perf_counter()
+            model = self._batch_model(translation)
+            step = self.batch_size if model else 10
+            hop_texts = []
+            for i in range(0, len(texts), step):
+                if cancel_check and cancel_check():
+                    raise RuntimeError("Translation cancelled by user")
+                batch = texts[i:i + step]
+                if model:
+                    hop_texts.extend(self._translate_batch(model, batch))
+                else:
+                    hop_texts.extend(translation.translate(text) for text in batch)
+                if progress_callback:
+                    progress_callback((hop_index * len(texts) + i + len(batch)) / total * 100)
+            route.last_hop_seconds[f"{hop_from}->{hop_to}"] = time.perf_counter() - started
+            texts = hop_texts
+        return texts
@@ -0,0 +1,224 @@
+import os
+import time
+import shutil
+import socket
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+import edge_tts
+
+
+class TTSBackend(ABC):
+    """
+    Bazowa klasa silnika TTS
+
+    Silnik deklaruje, ile zapytań może obsługiwać równolegle (max_concurrency)
+    i w jakim formacie zwraca dźwięk (output_format, np. 'mp3' lub 'wav').
+    Podklasy implementują stream(); pozostałe metody korzystają z niego.
+    """
+    name = "base"
+    max_concurrency = 4
+    output_format = "mp3"
+    # Głos dla języków bez wpisu w voices (None = język nieobsługiwany)
+    fallback_voice = None
+
+    def __init__(self, voices=None, logger=None, speaker_voices=None):
+        """
+        :param voices: Słownik kod języka -> nazwa głosu
+        :param logger: Obiekt loggera
+        :param speaker_voices: Słownik kod języka -> lista głosów dla kolejnych mówców
+        """
+        self.voices = dict(voices or {})
+        self.speaker_voices = dict(speaker_voices or {})
+        self.logger = logger or logging.getLogger(__name__)
+
+    def available(self):
+        """Czy silnik może działać w bieżącym środowisku"""
+        return True
+
+    def voice_for(self, language):
+        """Głos dla języka lub None, gdy silnik go nie obsługuje"""
+        return self.voices.get(language)
+
+    def voices_for(self, language):
+        """Głosy dla kolejnych mówców (pierwszy to głos domyślny języka)"""
+        default = self.voice_for(language)
+        voices = [voice for voice in self.speaker_voices.get(language, []) if voice != default]
+        return [default] + voices if default else voices
+
+    @abstractmethod
+    async def stream(self, text, voice):
+        """Zwraca kolejne fragmenty dźwięku (bytes) w miarę syntezy (generator asynchroniczny)"""
+
+    async def synthesize(self, text, voice):
+        """Syntezuje cały tekst i zwraca dźwięk jako bytes"""
+        chunks = []
+        async for chunk in self.stream(text, voice):
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    async def synthesize_batch(self, texts, voice, progress_callback=None):
+        """
+        Syntezuje listę tekstów z ograniczeniem równoległości silnika
+
+        :param texts: Lista tekstów
+        :param voice: Nazwa głosu lub lista głosów, po jednym na tekst (np. według mówców)
+        :param progress_callback: Funkcja(gotowe, wszystkie) wywoływana po każdym tekście
+        :return: Lista bytes w kolejności tekstów
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        voices = voice if isinstance(voice, list) else [voice] * len(texts)
+        done = 0
+
+        async def run(text, text_voice):
+            nonlocal done
+            async with semaphore:
+                data = await self.synthesize(text, text_voice)
+            done += 1
+            if progress_callback:
+                progress_callback(done, len(texts))
+            return data
+
+        return await asyncio.gather(*(run(text, text_voice) for text, text_voice in zip(texts, voices)))
+
+
+class EdgeTTSBackend(TTSBackend):
+    """Usługa Microsoft Edge TTS (wymaga dostępu do sieci)"""
+    name = "edge"
+    max_concurrency = 8
+    output_format = "mp3"
+    fallback_voice = "en-US-GuyNeural"
+    # Punkt końcowy usługi sprawdzany przed wyborem silnika
+    SERVICE_HOST = ("speech.platform.bing.com", 443)
+
+    DEFAULT_VOICES = {
+        "en": "en-US-GuyNeural",
+        "pl": "pl-PL-MarekNeural",
+        "es": "es-ES-AlvaroNeural",
+        "fr": "fr-FR-HenriNeural",
+        "de": "de-DE-ConradNeural",
+        "it": "it-IT-DiegoNeural",
+        "ja": "ja-JP-NanjoNeural",
+        "ru": "ru-RU-DmitryNeural",
+        "zh": "zh-CN-YunxiNeural",
+        "pt": "pt-BR-AntonioNeural"
+    }
+
+    # Głosy kolejnych mówców, na przemian męskie i żeńskie
+    SPEAKER_VOICES = {
+        "en": ["en-US-GuyNeural", "en-US-JennyNeural", "en-GB-RyanNeural", "en-GB-SoniaNeural"],
+        "pl": ["pl-PL-MarekNeural", "pl-PL-ZofiaNeural"],
+        "es": ["es-ES-AlvaroNeural", "es-ES-ElviraNeural", "es-MX-JorgeNeural", "es-MX-DaliaNeural"],
+        "fr": ["fr-FR-HenriNeural", "fr-FR-DeniseNeural", "fr-CA-AntoineNeural", "fr-CA-SylvieNeural"],
+        "de": ["de-DE-ConradNeural", "de-DE-KatjaNeural", "de-AT-JonasNeural", "de-AT-IngridNeural"],
+        "it": ["it-IT-DiegoNeural", "it-IT-ElsaNeural", "it-IT-IsabellaNeural"],
+        "ja": ["ja-JP-NanjoNeural", "ja-JP-NanamiNeural", "ja-JP-KeitaNeural"],
+        "ru": ["ru-RU-DmitryNeural", "ru-RU-SvetlanaNeural"],
+        "zh": ["zh-CN-YunxiNeural", "zh-CN-XiaoxiaoNeural", "zh-CN-YunjianNeural", "zh-CN-XiaoyiNeural"],
+        "pt": ["pt-BR-AntonioNeural", "pt-BR-FranciscaNeural", "pt-PT-DuarteNeural", "pt-PT-RaquelNeural"]
+    }
+
+    def __init__(self, voices=None, logger=None, speaker_voices=None):
+        super().__init__(voices or self.DEFAULT_VOICES, logger, speaker_voices or self.SPEAKER_VOICES)
+        self.connect_timeout = 3.0
+        # Wynik sprawdzenia sieci jest ważny przez availability_ttl sekund
+        self.availability_ttl = 60.0
+        self._availability = (0.0, None)
+
+    def available(self):
+        """Czy usługa jest osiągalna (połączenie TCP, wynik zapamiętywany na chwilę)"""
+        checked, reachable = self._availability
+        if reachable is None or time.monotonic() - checked > self.availability_ttl:
+            try:
+                socket.create_connection(self.SERVICE_HOST, timeout=self.connect_timeout).close()
+                reachable = True
+            except OSError as e:
+                self.logger.warning(f"Edge TTS service unreachable: {str(e)}")
+                reachable = False
+            self._availability = (time.monotonic(), reachable)
+        return reachable
+
+    async def stream(self, text, voice):
+        communicate = edge_tts.Communicate(text, voice)
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":
+                yield chunk["data"]
+
+
+class CommandTTSBackend(TTSBackend):
+    """
+    Lokalny silnik TTS uruchamiany jako podproces
+
+    Tekst trafia na stdin, dźwięk jest czytany ze stdout. Polecenie to lista
+    argumentów z miejscem {voice} na nazwę głosu, np. dla Piper:
+    ['piper', '--model', '{voice}', '--output_file', '/dev/stdout'].
+    """
+    name = "command"
+    output_format = "wav"
+
+    def __init__(self, command, voices, output_format="wav", max_concurrency=None, logger=None):
+        """
+        :param command: Lista argumentów polecenia z {voice}
+        :param voices: Słownik kod języka -> nazwa głosu / ścieżka modelu
+        :param output_format: Format zwracanego dźwięku
+        :param max_concurrency: Liczba równoległych procesów (domyślnie liczba rdzeni)
+        :param logger: Obiekt loggera
+        """
+        super().__init__(voices, logger)
+        self.command = command
+        self.output_format = output_format
+        self.max_concurrency = max_concurrency or os.cpu_count() or 2
+
+    def available(self):
+        return shutil.which(self.command[0]) is not None
+
+    async def stream(self, text, voice):
+        process = await asyncio.create_subprocess_exec(
+            *[arg.replace("{voice}", voice) for arg in self.command],
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+        process.stdin.write(text.encode("utf-8"))
+        process.stdin.close()
+        while True:
+            chunk = await process.stdout.read(64 * 1024)
+            if not chunk:
+                break
+            yield chunk
+        if await process.wait() != 0:
+            raise RuntimeError(f"{self.name} TTS failed with exit code {process.returncode}")
+
+
+class EspeakTTSBackend(CommandTTSBackend):
+    """Offline eSpeak NG - działa bez sieci, jakość głosu niższa niż usług neuronowych"""
+    name = "espeak"
+
+    DEFAULT_VOICES = {
+        "en": "en-us",
+        "pl": "pl",
+        "es": "es",
+        "fr": "fr-fr",
+        "de": "de",
+        "it": "it",
+        "ja": "ja",
+        "ru": "ru",
+        "zh": "cmn",
+        "pt": "pt-br"
+    }
+
+    # Warianty głosu eSpeak dla kolejnych mówców
+    SPEAKER_VARIANTS = ["", "+f3", "+m3", "+f4", "+m7"]
+
+    def __init__(self, executable="espeak-ng", voices=None, max_concurrency=None, logger=None):
+        super().__init__(
+            [executable, "-v", "{voice}", "--stdin", "--stdout"],
+            voices or self.DEFAULT_VOICES,
+            output_format="wav",
+            max_concurrency=max_concurrency,
+            logger=logger
+        )
+
+    def voices_for(self, language):
+        voice = self.voice_for(language)
+        return [voice + variant for variant in self.SPEAKER_VARIANTS] if voice else []
@@ -2,6 +2,7 @@ import os
 import re
 import yt_dlp
 import logging
+import threading
 
 class YouTubeDownloader:
     def __init__(self, ffmpeg_path=None, logger=None):
@@ -16,6 +17,24 @@ class YouTubeDownloader:
             '240p': 'bestvideo[height<=240][ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
             '144p': 'bestvideo[height<=144][ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best'
         }
+        # Sama ścieżka dźwiękowa dla trybu dwuścieżkowego
+        self.audio_only_format = 'bestaudio[ext=m4a]/bestaudio'
+        
+        # Wspólna sesja yt-dlp do pobierania metadanych (YoutubeDL nie jest bezpieczny wątkowo)
+        self._info_options = {'quiet': True, 'no_warnings': True}
+        self._info_session = None
+        self._info_lock = threading.Lock()
+        
+        self.collection_patterns = [
+            r'(https?://)?(www\.)?youtube\.com/playlist\?list=',
+            r'(https?://)?(www\.)?youtube\.com/(@[^/?#]+|channel/[^/?#]+|c/[^/?#]+|user/[^/?#]+)/?(videos|shorts|streams)?/?$'
+        ]
+
+    def video_only_format(self, quality='best'):
+        """Format selector for the video stream alone (audio is fetched separately)"""
+        height = quality[:-1] if quality.endswith('p') and quality[:-1].isdigit() else None
+        limit = f"[height<={height}]" if height else ""
+        return f"bestvideo{limit}[ext=mp4]/bestvideo{limit}/best{limit}[ext=mp4]/best"
 
     def validate_url(self, url):
         """Validate if URL is a proper YouTube URL"""
@@ -26,11 +45,20 @@ class YouTubeDownloader:
         ]
         return any(re.search(pattern, url) for pattern in patterns)
 
+    def is_collection_url(self, url):
+        """Check if URL points to a playlist or a channel"""
+        return any(re.search(pattern, url) for pattern in self.collection_patterns)
+
+    def _get_info_session(self):
+        if self._info_session is None:
+            self._info_session = yt_dlp.YoutubeDL(self._info_options)
+        return self._info_session
+
     def get_video_info(self, url):
         """Get video information without downloading"""
-        with yt_dlp.YoutubeDL({'quiet': True}) as ydl:
+        with self._info_lock:
             try:
-                info = ydl.extract_info(url, download=False)
+                info = self._get_info_session().extract_info(url, download=False)
                 return {
                     'title': info.get('title', 'Unknown'),
                     'duration': info.get('duration', 0),
@@ -42,7 +70,42 @@ class YouTubeDownloader:
                 self.logger.error(f"Error getting video info: {str(e)}")
                 return None
 
-    def download(self, url, output_dir, quality='best', progress_callback=None):
+    def expand_collection(self, url, limit=None):
+        """
+        Expand a playlist or channel into its video entries with one metadata request
+        
+        Args:
+            url (str): Playlist or channel URL
+            limit (int): Maximum number of entries (None = all)
+            
+        Returns:
+            list: Dicts with id, url, title and duration for every video
+        """
+        if re.search(self.collection_patterns[1], url) and not re.search(r'/(videos|shorts|streams)/?$', url):
+            url = url.rstrip('/') + '/videos'
+
+        # Osobna sesja z kopią opcji - wspólna sesja get_video_info zostaje nietknięta
+        options = dict(self._info_options, extract_flat='in_playlist')
+        if limit:
+            options['playlistend'] = limit
+        info = yt_dlp.YoutubeDL(options).extract_info(url, download=False)
+
+        entries = []
+        for entry in info.get('entries') or []:
+            if not entry or not entry.get('id'):
+                continue
+            entries.append({
+                'id': entry['id'],
+                'url': entry.get('url') if str(entry.get('url', '')).startswith('http')
+                       else f"https://www.youtube.com/watch?v={entry['id']}",
+                'title': entry.get('title', 'Unknown'),
+                'duration': entry.get('duration') or 0
+            })
+        self.logger.info(f"Expanded {info.get('title', url)}: {len(entries)} videos")
+        return entries
+
+    def download(self, url, output_dir, quality='best', progress_callback=None, extra_opts=None,
+                 fmt=None, validate=True):
         """
         Download YouTube video
         
@@ -51,11 +114,14 @@ class YouTubeDownloader:
             output_dir (str): Directory to save the video
             quality (str): Quality setting (best, 1080p, 720p, etc.)
             progress_callback (function): Callback for progress updates
+            extra_opts (dict): Additional yt-dlp options (fragments, resume, rate limit)
+            fmt (str): Custom yt-dlp format selector overriding quality
+            validate (bool): Reject URLs that are not YouTube videos
             
         Returns:
             str: Path to downloaded video file
         """
-        if not self.validate_url(url):
+        if validate and not self.validate_url(url):
             raise ValueError("Invalid YouTube URL")
 
         if not os.path.exists(output_dir):
@@ -67,8 +133,10 @@ class YouTubeDownloader:
             'progress_hooks': [lambda d: self._progress_hook(d, progress_callback)],
             'quiet': True,
             'no_warnings': True,
-            'format': self.quality_options.get(quality, 'best')
+            'format': fmt or self.quality_options.get(quality, 'best')
         }
+        if extra_opts:
+            ydl_opts.update(extra_opts)
 
         try:
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
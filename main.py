@@ -1,9 +1,12 @@
 import os
 import logging
 import contextlib
+import multiprocessing
 from ui.main import VideoTranslatorApp
 
 if __name__ == "__main__":
+    # Procesy robocze tłumaczenia (ProcessPoolExecutor) w spakowanej aplikacji na Windows
+    multiprocessing.freeze_support()
     logging.basicConfig(
         level=logging.CRITICAL,
         handlers=[],
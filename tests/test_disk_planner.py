@@ -0,0 +1,101 @@
+import os
+import shutil
+import tempfile
+import unittest
+from collections import namedtuple
+from unittest import mock
+
+from core.disk_planner import DiskPlanner, MediaEstimate
+
+GB = 1024 ** 3
+Usage = namedtuple('Usage', 'total used free')
+
+
+class TwoDevicePlanner(DiskPlanner):
+    """Planner, dla którego katalogi 'output' i 'scratch' leżą na różnych dyskach"""
+
+    def __init__(self, devices, **kwargs):
+        super().__init__(media_info=None, safety_margin=1.0, min_free_bytes=0, **kwargs)
+        self.devices = devices
+
+    def _device(self, path):
+        return next(device for root, device in self.devices.items() if path.startswith(root))
+
+
+class DiskPlannerDevicesTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.output = os.path.join(self.root, "output")
+        self.scratch = os.path.join(self.root, "scratch")
+        os.makedirs(self.output)
+        os.makedirs(self.scratch)
+        self.planner = TwoDevicePlanner({self.output: "out-dev", self.scratch: "scratch-dev"})
+        # 10 min 1080p, ok. 600 MB
+        self.media = MediaEstimate(600, 8_000_000, 1920, 1080)
+
+    def tearDown(self):
+        DiskPlanner._reservations.clear()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def reserve(self, plan, free=100 * GB):
+        with mock.patch("core.disk_planner.shutil.disk_usage", return_value=Usage(free, 0, free)):
+            return self.planner.reserve(self.output, plan, {
+                DiskPlanner.SCRATCH: self.scratch,
+                DiskPlanner.DOWNLOAD_CACHE: self.scratch,
+                DiskPlanner.CHUNK_CACHE: self.scratch
+            })
+
+    def stage_sizes(self, plan):
+        return {stage[0]: stage[1] for stage in plan.stages}
+
+    def test_renders_and_chunks_are_planned_on_scratch(self):
+        plan = self.planner.plan(self.media, add_subtitles=True, audio_format='flac', chunked_burn=True)
+        sizes = self.stage_sizes(plan)
+        reservation = self.reserve(plan)
+
+        # Wyniki na dysku wyjściowym, rendery przed przeniesieniem i fragmenty wypalania w katalogu roboczym
+        self.assertEqual(reservation.sizes["out-dev"], sizes['replace_audio'] + sizes['burn_subtitles'])
+        self.assertEqual(reservation.sizes["scratch-dev"], plan.peak_bytes)
+
+    def test_same_device_counts_published_renders_once(self):
+        self.planner.devices = {self.root: "dev"}
+        plan = self.planner.plan(self.media, add_subtitles=True, audio_format='flac', chunked_burn=True)
+
+        reservation = self.reserve(plan)
+
+        self.assertEqual(reservation.sizes, {"dev": plan.peak_bytes})
+
+    def test_two_track_audio_is_planned_on_scratch(self):
+        plan = self.planner.plan(self.media, download=True, two_track=True, audio_format='wav')
+        per_device = plan.by_device({
+            DiskPlanner.OUTPUT: "out-dev", DiskPlanner.SCRATCH: "scratch-dev",
+            DiskPlanner.DOWNLOAD_CACHE: "out-dev", DiskPlanner.CHUNK_CACHE: "scratch-dev"
+        })
+
+        self.assertIn('download_audio', [stage[0] for stage in per_device["scratch-dev"].stages])
+        self.assertNotIn('download', [stage[0] for stage in per_device["scratch-dev"].stages])
+
+    def test_low_disk_scratch_switches_mode_and_releases_both_devices(self):
+        plan = self.planner.plan(self.media, add_subtitles=True, audio_format='flac', chunked_burn=True)
+        scratch_plan = plan.by_device({
+            DiskPlanner.OUTPUT: "out-dev", DiskPlanner.SCRATCH: "scratch-dev",
+            DiskPlanner.DOWNLOAD_CACHE: "scratch-dev", DiskPlanner.CHUNK_CACHE: "scratch-dev"
+        })["scratch-dev"]
+
+        reservation = self.reserve(plan, free=scratch_plan.low_disk_peak_bytes + 1)
+
+        self.assertEqual(plan.mode, "low_disk")
+        self.assertEqual(set(DiskPlanner._reservations), {"out-dev", "scratch-dev"})
+        reservation.release()
+        self.assertEqual(DiskPlanner._reservations, {})
+
+    def test_insufficient_scratch_reserves_nothing(self):
+        plan = self.planner.plan(self.media, add_subtitles=True, audio_format='wav')
+
+        with self.assertRaises(RuntimeError):
+            self.reserve(plan, free=1024)
+        self.assertEqual(DiskPlanner._reservations, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
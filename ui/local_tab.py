@@ -61,7 +61,7 @@ class LocalTab:
 
         self.from_lang_combobox = ctk.CTkComboBox(
             lang_frame,
-            values=list(self.app.translator.language_codes.keys()),
+            values=[self.app.translator.auto_detect_label] + list(self.app.translator.language_codes.keys()),
             width=218,
             font=self.app.default_font
         )
@@ -265,7 +265,7 @@ class LocalTab:
 
     def start_process(self):
         file_path = self.local_file_display.cget("text")
-        from_lang = self.app.translator.language_codes[self.from_lang_combobox.get()]
+        from_lang = self.app.translator.language_codes.get(self.from_lang_combobox.get())
         to_lang = self.app.translator.language_codes[self.to_lang_combobox.get()]
         output_dir = self.output_dir_display.cget("text")
         
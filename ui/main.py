@@ -76,6 +76,27 @@ class VideoTranslatorApp(ctk.CTk):
 
     def run_youtube_process(self, youtube_url, from_lang, to_lang, quality, output_dir, progress_callback):
         try:
+            if self.translator.downloader.is_collection_url(youtube_url):
+                results = self.translator.process_collection(
+                    youtube_url,
+                    from_lang,
+                    to_lang,
+                    output_dir,
+                    quality,
+                    progress_callback=progress_callback,
+                    add_subtitles=self.add_subtitles,
+                    subtitle_style=self.subtitle_style
+                )
+                done = [path for _, path, error in results if not error]
+                self.final_video_path = done[-1] if done else None
+                self.youtube_tab.status_label.configure(
+                    text=f"✅ {len(done)}/{len(results)} videos translated", 
+                    text_color="#2ECC71" if len(done) == len(results) else "#F39C12")
+                if self.final_video_path:
+                    self.youtube_tab.open_button.configure(state="normal")
+                messagebox.showinfo("Success", f"Translated {len(done)} of {len(results)} videos")
+                return
+            
             self.final_video_path = self.translator.main(
                 youtube_url,
                 from_lang,
@@ -256,4 +277,6 @@ class VideoTranslatorApp(ctk.CTk):
                     self.translator.clean_temp_files = True
                     self.translator._clean_temp_files()
             
+            self.translator.artifacts.wait()
+            self.translator.shutdown()
             self.destroy()
\ No newline at end of file
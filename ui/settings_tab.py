@@ -1,4 +1,6 @@
+import os
 import customtkinter as ctk
+from tkinter import filedialog
 from ui.subtitle_settings import SubtitleSettings
 
 class SettingsTab:
@@ -18,6 +20,59 @@ class SettingsTab:
         # Subtitle settings
         self.subtitle_settings = SubtitleSettings(scroll_frame, self.app)
         
+        # Transcription settings
+        transcription_frame = ctk.CTkFrame(scroll_frame)
+        transcription_frame.grid(row=3, column=0, padx=(0, 130), pady=10, sticky="w")
+        
+        ctk.CTkLabel(transcription_frame, text="Transcription Settings", text_color="#3a7ebf", 
+                    font=ctk.CTkFont(family="Microsoft Sans Serif", weight="bold", size=15)).grid(
+            row=0, column=0, padx=10, pady=5, sticky="w")
+        
+        self.vad_checkbox = ctk.CTkCheckBox(
+            transcription_frame,
+            text="Skip silence and music (VAD)",
+            command=self.toggle_vad,
+            font=self.app.default_font
+        )
+        self.vad_checkbox.grid(row=1, column=0, padx=10, pady=5, sticky="w")
+        if self.app.translator.vad_filter:
+            self.vad_checkbox.select()
+        
+        self.word_timestamps_checkbox = ctk.CTkCheckBox(
+            transcription_frame,
+            text="Word-level timestamps",
+            command=self.toggle_word_timestamps,
+            font=self.app.default_font
+        )
+        self.word_timestamps_checkbox.grid(row=2, column=0, padx=10, pady=5, sticky="w")
+        if self.app.translator.word_timestamps:
+            self.word_timestamps_checkbox.select()
+        
+        self.diarize_checkbox = ctk.CTkCheckBox(
+            transcription_frame,
+            text="Separate voice per speaker",
+            command=self.toggle_diarize_speakers,
+            font=self.app.default_font
+        )
+        self.diarize_checkbox.grid(row=3, column=0, padx=10, pady=5, sticky="w")
+        if self.app.translator.diarize_speakers:
+            self.diarize_checkbox.select()
+        
+        decoding_frame = ctk.CTkFrame(transcription_frame, fg_color="transparent")
+        decoding_frame.grid(row=4, column=0, padx=10, pady=5, sticky="w")
+        
+        ctk.CTkLabel(decoding_frame, text="Decoding:", font=self.app.default_font).pack(side="left", padx=(0, 8))
+        
+        self.decoding_combobox = ctk.CTkComboBox(
+            decoding_frame,
+            values=["adaptive", "greedy", "beam"],
+            command=self.change_decoding_profile,
+            width=150,
+            font=self.app.default_font
+        )
+        self.decoding_combobox.set(self.app.translator.decoding_profile)
+        self.decoding_combobox.pack(side="left")
+        
         # Advanced settings
         advanced_frame = ctk.CTkFrame(scroll_frame)
         advanced_frame.grid(row=2, column=0, padx=(0, 130), pady=10)
@@ -51,6 +106,82 @@ class SettingsTab:
         )
         self.ffmpeg_path_label.grid(row=2, column=1, padx=10, pady=5, sticky="ew")
         
+        ctk.CTkLabel(advanced_frame, text="Scratch Folder:", font=self.app.default_font).grid(
+            row=3, column=0, padx=10, pady=5, sticky="w")
+        
+        self.scratch_dir_button = ctk.CTkButton(
+            advanced_frame,
+            text=self.app.translator.scratch_dir or "Same as output folder",
+            command=self.choose_scratch_dir,
+            anchor="w",
+            font=self.app.default_font
+        )
+        self.scratch_dir_button.grid(row=3, column=1, padx=10, pady=5, sticky="ew")
+        
+        ctk.CTkLabel(advanced_frame, text="TTS Engine:", font=self.app.default_font).grid(
+            row=4, column=0, padx=10, pady=5, sticky="w")
+        
+        self.tts_backend_combobox = ctk.CTkComboBox(
+            advanced_frame,
+            values=list(self.app.translator.audio_generator.backends),
+            command=self.change_tts_backend,
+            width=150,
+            font=self.app.default_font
+        )
+        self.tts_backend_combobox.set(self.app.translator.audio_generator.default_backend)
+        self.tts_backend_combobox.grid(row=4, column=1, padx=10, pady=5, sticky="w")
+        
+        ctk.CTkLabel(advanced_frame, text="Original Audio:", font=self.app.default_font).grid(
+            row=5, column=0, padx=10, pady=5, sticky="w")
+        
+        self.mix_mode_combobox = ctk.CTkComboBox(
+            advanced_frame,
+            values=["replace", "mix"],
+            command=self.change_mix_mode,
+            width=150,
+            font=self.app.default_font
+        )
+        self.mix_mode_combobox.set(self.app.translator.audio_replacer.mix_mode)
+        self.mix_mode_combobox.grid(row=5, column=1, padx=10, pady=5, sticky="w")
+        
+        self.separate_checkbox = ctk.CTkCheckBox(
+            advanced_frame,
+            text="Keep background music (remove original voice)",
+            command=self.toggle_separate_background,
+            font=self.app.default_font
+        )
+        self.separate_checkbox.grid(row=6, column=0, padx=10, pady=5, sticky="w", columnspan=2)
+        if self.app.translator.separate_background:
+            self.separate_checkbox.select()
+        
+        ctk.CTkLabel(advanced_frame, text="Translation Workers:", font=self.app.default_font).grid(
+            row=7, column=0, padx=10, pady=5, sticky="w")
+        
+        workers_frame = ctk.CTkFrame(advanced_frame, fg_color="transparent")
+        workers_frame.grid(row=7, column=1, padx=10, pady=5, sticky="w")
+        
+        self.translation_workers_combobox = ctk.CTkComboBox(
+            workers_frame,
+            values=[str(count) for count in range(1, max(2, os.cpu_count() or 2) + 1)],
+            command=self.change_translation_workers,
+            width=70,
+            font=self.app.default_font
+        )
+        self.translation_workers_combobox.set(str(self.app.translator.translation_workers))
+        self.translation_workers_combobox.pack(side="left")
+        
+        ctk.CTkLabel(workers_frame, text="Threads each:", font=self.app.default_font).pack(side="left", padx=(12, 8))
+        
+        self.translation_threads_combobox = ctk.CTkComboBox(
+            workers_frame,
+            values=["1", "2", "4"],
+            command=self.change_translation_threads,
+            width=70,
+            font=self.app.default_font
+        )
+        self.translation_threads_combobox.set(str(self.app.translator.translation_threads_per_worker))
+        self.translation_threads_combobox.pack(side="left")
+        
         self.open_logs_button = ctk.CTkButton(
             advanced_frame,
             text="Open Logs Folder",
@@ -58,8 +189,54 @@ class SettingsTab:
             width=150,
             font=self.app.default_font
         )
-        self.open_logs_button.grid(row=3, column=0, padx=10, pady=5, sticky="w")
+        self.open_logs_button.grid(row=8, column=0, padx=10, pady=5, sticky="w")
 
     def toggle_cleanup(self):
         self.app.translator.clean_temp_files = self.cleanup_checkbox.get()
-        self.app.translator.log_with_emoji(f"Automatic cleanup {'enabled' if self.app.translator.clean_temp_files else 'disabled'}", emoji_type='SETTINGS')
\ No newline at end of file
+        self.app.translator.log_with_emoji(f"Automatic cleanup {'enabled' if self.app.translator.clean_temp_files else 'disabled'}", emoji_type='SETTINGS')
+
+    def choose_scratch_dir(self):
+        scratch_dir = filedialog.askdirectory()
+        self.app.translator.scratch_dir = scratch_dir or None
+        self.scratch_dir_button.configure(text=scratch_dir or "Same as output folder")
+        self.app.translator.log_with_emoji(f"Scratch folder for intermediates: {scratch_dir or 'output folder'}", emoji_type='SETTINGS')
+
+    def change_tts_backend(self, backend):
+        self.app.translator.audio_generator.default_backend = backend
+        self.app.translator.log_with_emoji(f"TTS engine set to: {backend}", emoji_type='SETTINGS')
+
+    def change_mix_mode(self, mode):
+        self.app.translator.audio_replacer.mix_mode = mode
+        self.app.translator.log_with_emoji(
+            f"Original audio: {'ducked under the dub' if mode == 'mix' else 'replaced by the dub'}", emoji_type='SETTINGS'
+        )
+
+    def change_translation_workers(self, workers):
+        self.app.translator.translation_workers = int(workers)
+        self.app.translator.log_with_emoji(
+            f"Translation workers: {workers} ({'process pool' if int(workers) > 1 else 'in-process'})", emoji_type='SETTINGS'
+        )
+
+    def change_translation_threads(self, threads):
+        self.app.translator.translation_threads_per_worker = int(threads)
+        self.app.translator.log_with_emoji(f"Translation threads per worker: {threads}", emoji_type='SETTINGS')
+
+    def toggle_separate_background(self):
+        self.app.translator.separate_background = bool(self.separate_checkbox.get())
+        self.app.translator.log_with_emoji(f"Background music separation {'enabled' if self.app.translator.separate_background else 'disabled'}", emoji_type='SETTINGS')
+
+    def toggle_vad(self):
+        self.app.translator.vad_filter = bool(self.vad_checkbox.get())
+        self.app.translator.log_with_emoji(f"VAD silence skipping {'enabled' if self.app.translator.vad_filter else 'disabled'}", emoji_type='SETTINGS')
+
+    def toggle_word_timestamps(self):
+        self.app.translator.word_timestamps = bool(self.word_timestamps_checkbox.get())
+        self.app.translator.log_with_emoji(f"Word-level timestamps {'enabled' if self.app.translator.word_timestamps else 'disabled'}", emoji_type='SETTINGS')
+
+    def toggle_diarize_speakers(self):
+        self.app.translator.diarize_speakers = bool(self.diarize_checkbox.get())
+        self.app.translator.log_with_emoji(f"Per-speaker voices {'enabled' if self.app.translator.diarize_speakers else 'disabled'}", emoji_type='SETTINGS')
+
+    def change_decoding_profile(self, profile):
+        self.app.translator.decoding_profile = profile
+        self.app.translator.log_with_emoji(f"Decoding profile set to: {profile}", emoji_type='SETTINGS')
\ No newline at end of file
@@ -47,7 +47,7 @@ class YouTubeTab:
 
         self.from_lang_combobox = ctk.CTkComboBox(
             lang_frame,
-            values=list(self.app.translator.language_codes.keys()),
+            values=[self.app.translator.auto_detect_label] + list(self.app.translator.language_codes.keys()),
             width=218,
             font=self.app.default_font
         )
@@ -256,7 +256,7 @@ class YouTubeTab:
 
     def start_process(self):
         youtube_url = self.url_entry.get().strip()
-        from_lang = self.app.translator.language_codes[self.from_lang_combobox.get()]
+        from_lang = self.app.translator.language_codes.get(self.from_lang_combobox.get())
         to_lang = self.app.translator.language_codes[self.to_lang_combobox.get()]
         quality = self.quality_combobox.get()
         output_dir = self.output_dir_display.cget("text")